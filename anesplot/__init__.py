@@ -97,10 +97,8 @@ to build a clinical case
 import os
 import logging
 
-import matplotlib.pyplot as plt
-from PyQt5.QtWidgets import QApplication
-
-plt.ion()
+# NB no Qt nor pyplot import here (anesplot.loadrec & anesplot.treatrec
+# have to be importable on a headless machine), cf anesplot.base for plt.ion()
 
 # activate the log file to ~/anesplot_log.log
 logfile = os.path.expanduser(os.path.join("~", "anesplot_log.log"))
@@ -114,10 +112,3 @@ logging.basicConfig(
 )
 logging.getLogger(name="matplotlib").setLevel(logging.WARNING)
 
-app = QApplication.instance()
-logging.info(f"anesplot.__init__.py : {__name__=}")
-if app is None:
-    # app = QApplication([])
-    logging.warning("NO QApplication instance")
-else:
-    logging.warning(f"QApplication instance already exists: {QApplication.instance()}")
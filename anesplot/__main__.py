@@ -5,6 +5,10 @@ Created on 22/04/04 14:47:37
 
 entry point from command line: use  'python -m anesplot'
 
+- 'python -m anesplot [filename]' -> load and plot a recording (GUI)
+- 'python -m anesplot batch <dirname> [--jobs N]' -> process a folder (no GUI)
+- 'python -m anesplot index <dirname> [--year Y]' -> index and query an archive
+
 @author: cdesbois
 """
 
@@ -12,9 +16,20 @@ entry point from command line: use  'python -m anesplot'
 import os
 import sys
 
-import anesplot.record_main
-
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        import anesplot.batch
+
+        anesplot.batch.main(sys.argv[2:])
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == "index":
+        import anesplot.archive_index
+
+        anesplot.archive_index.main(sys.argv[2:])
+        sys.exit(0)
+
+    import anesplot.record_main
+
     IN_NAME = None
     # check if a filename was provided from terminal call
     print(f"{sys.argv=}")
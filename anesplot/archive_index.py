@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+"""
+Created on Sun Oct 18 21:24:09 2026
+
+@author: cdesbois
+
+persistent index of a recordings archive (sqlite):
+    - one row per record (monitor trend, monitor wave, taphonius trend)
+      built from the header (loadmonitor_trendheader, loadmonitor_waveheader,
+      loadtaph_patientfile), the file stats and a few rows at the beginning
+      and at the end of the file (start, end, recorded traces)
+    - the data are never loaded : the cost doesn't depend on the file size
+    - incremental refresh : only the new or modified (size, mtime) files are
+      read, the removed ones are dropped
+    - the index is located in paths['cache'] if defined, else in the archive
+      ('.anesplot_cache/archive_index.sqlite')
+
+use::
+
+    python -m anesplot index <dirname> [--year 2021] [--trace ip1m] [--with-wave]
+
+    with ArchiveIndex(dirname) as index:
+        index.refresh()
+        casesdf = index.query(year=2021, traces=["ip1m"], with_wave=True)
+
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from anesplot.batch import discover_records
+from anesplot.loadrec import cache_load, ctes_load, time_norm
+from anesplot.loadrec.loadmonitor_trendrecord import loadmonitor_trendheader
+from anesplot.loadrec.loadmonitor_waverecord import loadmonitor_waveheader
+from anesplot.loadrec.loadtaph_trendrecord import loadtaph_patientfile
+
+INDEX_NAME = "archive_index.sqlite"
+# bytes read at the beginning and at the end of the data
+SAMPLE_BYTES = 64 * 1024
+
+# the csv layouts (ctes_load.text_layouts), the column names and the headers
+RECORD_LAYOUTS: dict[str, dict[str, Any]] = {
+    kind: {
+        **layout,
+        "row_start": re.compile("^" + layout["row_start"])
+        if layout["row_start"]
+        else None,
+    }
+    for kind, layout in ctes_load.text_layouts.items()
+}
+RECORD_LAYOUTS["monitor_trend"].update(
+    corr_title=ctes_load.mon_corr_title, header=loadmonitor_trendheader
+)
+RECORD_LAYOUTS["monitor_wave"].update(
+    corr_title=ctes_load.monwave_corr_title, header=loadmonitor_waveheader
+)
+RECORD_LAYOUTS["taph_trend"].update(
+    corr_title=ctes_load.taph_corr_title, header=loadtaph_patientfile
+)
+
+# loaded names that are not physiological traces
+NOT_TRACES = {"dtime", "Date", "Time", "events"}
+
+# header fields (monitor and taphonius names) -> index columns
+HEADER_FIELDS = {
+    "Patient Name": "patient_name",
+    "Patient ID": "patient_id",
+    "Species": "species",
+    "Sex": "sex",
+    "Age": "age",
+    "Weight": "weight",
+    "Body weight": "weight",
+    "Height": "height",
+    "Procedure": "procedure",
+    "Equipment": "equipment",
+    "Sampling Rate": "sampling_rate",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    path TEXT PRIMARY KEY,
+    kind TEXT,
+    stem TEXT,
+    size INTEGER,
+    mtime REAL,
+    start TEXT,
+    end TEXT,
+    duration REAL,
+    patient_name TEXT,
+    patient_id TEXT,
+    species TEXT,
+    sex TEXT,
+    age TEXT,
+    weight REAL,
+    height REAL,
+    procedure TEXT,
+    equipment TEXT,
+    sampling_rate REAL,
+    header TEXT,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS traces (
+    path TEXT,
+    trace TEXT,
+    PRIMARY KEY (path, trace)
+);
+CREATE INDEX IF NOT EXISTS records_start ON records (start);
+CREATE INDEX IF NOT EXISTS records_stem ON records (kind, stem);
+CREATE INDEX IF NOT EXISTS traces_trace ON traces (trace, path);
+"""
+
+
+def record_stem(filename: str) -> str:
+    """Return the record name shared by a monitor trend and its wave file."""
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return stem[: -len("Wave")] if stem.endswith("Wave") else stem
+
+
+def _data_offset(filename: str, nlines: int) -> tuple[int, list[str]]:
+    """Return the byte offset of the data and the first lines of the file."""
+    lines = []
+    with open(filename, "rb") as file:
+        for _ in range(nlines):
+            lines.append(file.readline().decode("iso-8859-1"))
+        return file.tell(), lines
+
+
+def _read_block(
+    filename: str, names: list[str], start: int, stop: int, layout: dict[str, Any]
+) -> pd.DataFrame:
+    """Parse the complete rows located between two byte offsets."""
+    with open(filename, "rb") as file:
+        # from the previous byte : is the first line complete ?
+        file.seek(max(0, start - 1))
+        block = file.read(stop - start + min(1, start)).decode("iso-8859-1")
+    lines = block.split("\n")
+    complete = stop >= os.path.getsize(filename)
+    if start > 0:
+        lines = lines[1:]  # partial first line (or empty)
+    if not complete:
+        lines = lines[:-1]  # partial last line
+    row_start = layout["row_start"]
+    if row_start is not None:
+        rows = [i for i, line in enumerate(lines) if row_start.match(line)]
+        if not rows:
+            return pd.DataFrame(columns=names)
+        # complete rows only (a message can be cut)
+        lines = lines[rows[0] :] if complete else lines[rows[0] : rows[-1]]
+    text = "\n".join(line for line in lines if line.strip())
+    if not text:
+        return pd.DataFrame(columns=names)
+    return pd.read_csv(
+        io.StringIO(text), header=None, names=names, index_col=False, dtype=str
+    )
+
+
+def read_record_rows(filename: str, kind: str) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Read a few rows at the beginning and at the end of the data.
+
+    Parameters
+    ----------
+    filename : str
+        the record fullname.
+    kind : str
+        the kind of record (in RECORD_LAYOUTS).
+
+    Returns
+    -------
+    headdf, taildf : pd.DataFrame
+        the first and last rows (str values, file column names).
+    """
+    layout = RECORD_LAYOUTS[kind]
+    offset, lines = _data_offset(filename, layout["data_line"])
+    names = pd.read_csv(io.StringIO(lines[layout["names_line"]]), nrows=0).columns
+    names = [str(_) for _ in names]
+    size = os.path.getsize(filename)
+    headdf = _read_block(
+        filename, names, offset, min(size, offset + SAMPLE_BYTES), layout
+    )
+    taildf = _read_block(
+        filename, names, max(offset, size - SAMPLE_BYTES), size, layout
+    )
+    return headdf, taildf
+
+
+def _record_times(
+    filename: str, kind: str, headdf: pd.DataFrame, taildf: pd.DataFrame
+) -> tuple[Any, Any]:
+    """Return the first and the last datetimes of the data rows."""
+    if kind == "taph_trend":
+        dtimes = [
+            pd.to_datetime(df.Date + " " + df.Time, dayfirst=True).dropna()
+            for df in [headdf, taildf]
+        ]
+        if dtimes[0].empty:
+            return pd.NaT, pd.NaT
+        return dtimes[0].iloc[0], dtimes[1].iloc[-1]
+    timecol = "Time" if kind == "monitor_trend" else "Unnamed: 0"
+    times = pd.concat([headdf[timecol], taildf[timecol]]).dropna()
+    times = times[times.str.match(r"^\d{1,2}:\d{2}:\d{2}")]
+    if times.empty:
+        return pd.NaT, pd.NaT
+    day = record_stem(filename).strip("M").split("-")[0]
+    dtime = time_norm.clock_to_datetime(times.iloc[[0, -1]], day)
+    dtime = time_norm.fix_day_rollover(dtime)
+    return dtime.iloc[0], dtime.iloc[-1]
+
+
+def read_record_info(filename: str, kind: str) -> tuple[dict[str, Any], list[str]]:
+    """
+    Describe a record without loading the data.
+
+    Parameters
+    ----------
+    filename : str
+        the record fullname.
+    kind : str
+        the kind of record (in RECORD_LAYOUTS).
+
+    Returns
+    -------
+    info : dict
+        the 'records' table row.
+    traces : list[str]
+        the traces (loaded names) containing values in the sampled rows.
+    """
+    stat = os.stat(filename)
+    info: dict[str, Any] = {
+        "path": filename,
+        "kind": kind,
+        "stem": record_stem(filename),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+    }
+    layout = RECORD_LAYOUTS[kind]
+    header = layout["header"](filename)
+    for key, field in HEADER_FIELDS.items():
+        value = header.get(key)
+        if value is not None and not pd.isna(value):
+            info[field] = value
+    info["header"] = json.dumps(
+        {key: str(value) for key, value in header.items() if not pd.isna(value)}
+    )
+    headdf, taildf = read_record_rows(filename, kind)
+    start, end = _record_times(filename, kind, headdf, taildf)
+    if not pd.isna(start):
+        info["start"] = start.isoformat(sep=" ")
+        info["end"] = end.isoformat(sep=" ")
+        info["duration"] = (end - start).total_seconds()
+    sampled = pd.concat([headdf, taildf])
+    recorded = sampled.columns[sampled.notna().any()]
+    corr_title = layout["corr_title"]
+    traces = sorted(
+        {corr_title[col] for col in recorded if col in corr_title} - NOT_TRACES
+    )
+    return info, traces
+
+
+def index_filename(dirname: str) -> str:
+    """
+    Return the index file of an archive.
+
+    Parameters
+    ----------
+    dirname : str
+        the archive folder.
+
+    Returns
+    -------
+    str
+        in paths['cache'] if defined (one file per archive), else in the
+        '.anesplot_cache' folder of the archive (cf cache_load.get_cache_dir).
+    """
+    dirname = os.path.abspath(dirname)
+    cache_dir = cache_load.build_paths().get("cache")
+    if cache_dir:
+        hashed = hashlib.sha1(dirname.encode("utf-8")).hexdigest()[:10]
+        name = "_".join([os.path.basename(dirname), hashed, INDEX_NAME])
+        return os.path.join(os.path.expanduser(cache_dir), name)
+    return os.path.join(dirname, cache_load.CACHE_DIRNAME, INDEX_NAME)
+
+
+class ArchiveIndex:
+    """
+    Sqlite index of the records of an archive.
+
+    Attributes
+    ----------
+    dirname : str
+        the archive folder.
+    dbname : str
+        the index file name.
+    """
+
+    def __init__(self, dirname: str, dbname: Optional[str] = None) -> None:
+        self.dirname = os.path.abspath(dirname)
+        if dbname is None:
+            dbname = index_filename(self.dirname)
+        os.makedirs(os.path.dirname(os.path.abspath(dbname)), exist_ok=True)
+        self.dbname = dbname
+        self.connection = sqlite3.connect(dbname)
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self) -> "ArchiveIndex":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        count = self.connection.execute("SELECT COUNT(*) FROM records").fetchone()
+        return int(count[0])
+
+    def __repr__(self) -> str:
+        return f"ArchiveIndex({self.dirname!r}, {len(self)} records)"
+
+    def close(self) -> None:
+        """Close the database."""
+        self.connection.close()
+
+    def refresh(self) -> dict[str, int]:
+        """
+        Index the new or modified records, drop the removed ones.
+
+        Returns
+        -------
+        dict
+            the number of 'added', 'updated', 'removed' and 'unchanged' records.
+        """
+        start = time.perf_counter()
+        known = {
+            path: (size, mtime)
+            for path, size, mtime in self.connection.execute(
+                "SELECT path, size, mtime FROM records"
+            )
+        }
+        counts = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+        found = set()
+        for kind, filename in discover_records(self.dirname):
+            found.add(filename)
+            stat = os.stat(filename)
+            if known.get(filename) == (stat.st_size, stat.st_mtime):
+                counts["unchanged"] += 1
+                continue
+            counts["updated" if filename in known else "added"] += 1
+            self._index_record(filename, kind)
+        removed = [(path,) for path in set(known) - found]
+        with self.connection:
+            self.connection.executemany("DELETE FROM records WHERE path = ?", removed)
+            self.connection.executemany("DELETE FROM traces WHERE path = ?", removed)
+        counts["removed"] = len(removed)
+        logging.info(f"{self} refreshed in {time.perf_counter() - start:.2f} s")
+        return counts
+
+    def _index_record(self, filename: str, kind: str) -> None:
+        """Read the record description and store it."""
+        try:
+            info, traces = read_record_info(filename, kind)
+        except (OSError, ValueError, KeyError, IndexError) as error:
+            # not retried until the file changes
+            logging.warning(f"{os.path.basename(filename)} not indexed ({error!r})")
+            stat = os.stat(filename)
+            info = {
+                "path": filename,
+                "kind": kind,
+                "stem": record_stem(filename),
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "error": repr(error),
+            }
+            traces = []
+        cols = ", ".join(info)
+        marks = ", ".join("?" for _ in info)
+        with self.connection:
+            self.connection.execute("DELETE FROM traces WHERE path = ?", (filename,))
+            self.connection.execute(
+                f"INSERT OR REPLACE INTO records ({cols}) VALUES ({marks})",
+                [_.item() if isinstance(_, np.generic) else _ for _ in info.values()],
+            )
+            self.connection.executemany(
+                "INSERT INTO traces VALUES (?, ?)",
+                [(filename, trace) for trace in traces],
+            )
+
+    def sql(self, query: str, params: Any = ()) -> pd.DataFrame:
+        """Run a sql query on the index ('records' and 'traces' tables)."""
+        return pd.read_sql_query(query, self.connection, params=params)
+
+    def query(
+        self,
+        kind: Optional[str] = "monitor_trend",
+        year: Optional[int] = None,
+        traces: Optional[list[str]] = None,
+        with_wave: Optional[bool] = None,
+        procedure: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """
+        Select the records.
+
+        Parameters
+        ----------
+        kind : str, optional (default is "monitor_trend")
+            the kind of record (None -> all).
+        year : int, optional (default is None)
+            the recording year.
+        traces : list[str], optional (default is None)
+            the traces (loaded names, eg 'ip1m') that have to be recorded.
+        with_wave : bool, optional (default is None)
+            True -> with a wave file (same record name), False -> without.
+        procedure : str, optional (default is None)
+            a part of the procedure (case insensitive).
+
+        Returns
+        -------
+        pd.DataFrame
+            the records table rows (sorted by start), the 'traces' column
+            lists the recorded traces.
+        """
+        where = ["r.error IS NULL"]
+        params: list[Any] = []
+        if kind:
+            where.append("r.kind = ?")
+            params.append(kind)
+        if year:
+            where.append("r.start >= ? AND r.start < ?")
+            params += [f"{year}-01-01", f"{year + 1}-01-01"]
+        for trace in traces or []:
+            where.append(
+                "EXISTS (SELECT 1 FROM traces t WHERE t.trace = ? AND t.path = r.path)"
+            )
+            params.append(trace)
+        if with_wave is not None:
+            where.append(
+                ("" if with_wave else "NOT ")
+                + "EXISTS (SELECT 1 FROM records w"
+                " WHERE w.kind = 'monitor_wave' AND w.stem = r.stem)"
+            )
+        if procedure:
+            where.append("r.procedure LIKE ?")
+            params.append(f"%{procedure}%")
+        query = f"""
+            SELECT r.*, (SELECT GROUP_CONCAT(t.trace, ' ') FROM traces t
+                         WHERE t.path = r.path) AS traces
+            FROM records r WHERE {' AND '.join(where)} ORDER BY r.start
+        """
+        recordsdf = self.sql(query, params)
+        for col in ["start", "end"]:
+            recordsdf[col] = pd.to_datetime(recordsdf[col])
+        recordsdf["traces"] = recordsdf.traces.fillna("").str.split()
+        return recordsdf
+
+
+def main(argv: Optional[list[str]] = None) -> pd.DataFrame:
+    """Refresh the index of an archive and print the selected records."""
+    parser = argparse.ArgumentParser(
+        prog="python -m anesplot index", description=__doc__.split("\n\n")[1]
+    )
+    parser.add_argument("dirname", help="the archive folder")
+    parser.add_argument("--kind", default="monitor_trend", help="kind of record")
+    parser.add_argument("--year", type=int, default=None)
+    parser.add_argument(
+        "--trace", action="append", default=None, help="recorded trace (eg ip1m)"
+    )
+    parser.add_argument("--with-wave", action="store_true", default=None)
+    parser.add_argument("--procedure", default=None)
+    args = parser.parse_args(argv)
+    with ArchiveIndex(args.dirname) as index:
+        counts = index.refresh()
+        print(f"{index} : {counts}")
+        start = time.perf_counter()
+        recordsdf = index.query(
+            kind=args.kind,
+            year=args.year,
+            traces=args.trace,
+            with_wave=args.with_wave,
+            procedure=args.procedure,
+        )
+        duration = time.perf_counter() - start
+    cols = ["stem", "kind", "start", "duration", "procedure", "traces"]
+    print(recordsdf[cols].to_string())
+    print(f"{len(recordsdf)} records selected in {duration * 1000:.1f} ms")
+    return recordsdf
+
+
+if __name__ == "__main__":
+    main()
@@ -15,7 +15,7 @@ import pandas as pd
 from anesplot.loadrec.agg_load import swap_ip
 from anesplot.config.load_recordrc import build_paths
 
-paths = build_paths()
+plt.ion()
 
 
 class Waves:  # pylint: disable=too-few-public-methods
@@ -44,7 +44,7 @@ class Waves:  # pylint: disable=too-few-public-methods
             xmax=None,
             ymin=0,
             ymax=None,
-            path=paths.get("sFig", "~"),
+            path=build_paths().get("sFig", "~"),
             dtime=True,
             unit="dtime",
             save=False,
@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+"""
+Created on Sun Oct 18 11:40:05 2026
+
+@author: cdesbois
+
+headless batch processing of a recordings archive:
+    - scan a folder (and its subfolders) for monitor trends, monitor waves
+      and taphonius trends
+    - load the records in a process pool and apply a pipeline:
+        * 'plot' -> the plot_trenddata figures (png)
+        * 'hypotension' -> the hypotension episodes (csv)
+        * 'export' -> the data (hdf or parquet)
+    - write the outputs and a report (timings, status) in the output folder,
+      a failing record doesn't stop the process
+
+use::
+
+    python -m anesplot batch <dirname> --jobs 4 --pipeline plot
+    python -m anesplot batch <dirname> --pipeline export --format parquet
+
+"""
+
+import argparse
+import logging
+import os
+import re
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Optional
+
+import pandas as pd
+
+RECORD_PATTERNS = {
+    "monitor_trend": re.compile(
+        r"^M\d{4}_\d{1,2}_\d{1,2}-\d{1,2}_\d{1,2}_\d{1,2}\.csv$"
+    ),
+    "monitor_wave": re.compile(
+        r"^M\d{4}_\d{1,2}_\d{1,2}-\d{1,2}_\d{1,2}_\d{1,2}Wave\.csv$"
+    ),
+    "taph_trend": re.compile(
+        r"^SD\d{4}[a-zA-Z]{3}\d{1,2}-\d{1,2}_\d{1,2}_\d{1,2}\.csv$"
+    ),
+}
+
+# the record kinds used by each pipeline
+PIPELINES = {
+    "plot": ["monitor_trend", "taph_trend"],
+    "hypotension": ["monitor_trend", "taph_trend"],
+    "export": ["monitor_trend", "monitor_wave", "taph_trend"],
+}
+
+OUTDIR_NAME = "anesplot_batch"
+REPORT_NAME = "batch_report.csv"
+
+
+def discover_records(
+    dirname: str, kinds: Optional[list[str]] = None
+) -> list[tuple[str, str]]:
+    """
+    List the records present in a folder (and its subfolders).
+
+    Parameters
+    ----------
+    dirname : str
+        the folder to scan.
+    kinds : list[str], optional (default is None -> all RECORD_PATTERNS)
+        the kinds of record to keep.
+
+    Returns
+    -------
+    list[tuple[str, str]]
+        (kind, fullname) sorted by fullname.
+    """
+    if kinds is None:
+        kinds = list(RECORD_PATTERNS)
+    records = []
+    for root, dirs, files in os.walk(dirname):
+        # skip the hidden (eg cache) and the output folders
+        dirs[:] = [_ for _ in dirs if not _.startswith(".") and _ != OUTDIR_NAME]
+        for file in files:
+            for kind in kinds:
+                if RECORD_PATTERNS[kind].match(file):
+                    records.append((kind, os.path.join(root, file)))
+    return sorted(records, key=lambda item: item[1])
+
+
+def load_record(kind: str, filename: str) -> Any:
+    """
+    Load a record as a anesplot object (no dialog).
+
+    Parameters
+    ----------
+    kind : str
+        the kind of record (in RECORD_PATTERNS).
+    filename : str
+        the record fullname.
+
+    Returns
+    -------
+    MonitorTrend, MonitorWave or TaphTrend
+    """
+    # pylint: disable=import-outside-toplevel
+    if kind == "monitor_trend":
+        from anesplot.slow_waves import MonitorTrend
+
+        return MonitorTrend(filename)
+    if kind == "taph_trend":
+        from anesplot.slow_waves import TaphTrend
+
+        return TaphTrend(filename)
+    if kind == "monitor_wave":
+        from anesplot.fast_waves import MonitorWave
+
+        return MonitorWave(filename)
+    raise ValueError(f"unknown record kind : {kind}")
+
+
+def run_plot(record: Any, outdir: str, name: str) -> list[str]:
+    """Save the plot_trenddata figures (png) in outdir/name, return the filenames."""
+    import matplotlib.pyplot as plt  # pylint: disable=import-outside-toplevel
+
+    from anesplot.plot.t_agg_plot import plot_trenddata
+
+    if record.data.empty:
+        raise ValueError("no data in the record")
+    dirname = os.path.join(outdir, name)
+    os.makedirs(dirname, exist_ok=True)
+    outputs = []
+    for title, fig in plot_trenddata(record.data, record.header, record.param).items():
+        if fig is None:
+            continue
+        savename = os.path.join(dirname, title + ".png")
+        fig.savefig(savename)
+        plt.close(fig)
+        outputs.append(savename)
+    return outputs
+
+
+def run_hypotension(record: Any, outdir: str, name: str) -> list[str]:
+    """Save the hypotension episodes (csv), return the filename."""
+    # pylint: disable=import-outside-toplevel
+    from anesplot.extract_hypotension import extract_hypotension
+
+    if record.data.empty:
+        raise ValueError("no data in the record")
+    durdf = extract_hypotension(record.data, record.param)
+    savename = os.path.join(outdir, name + "_hypotension.csv")
+    durdf.insert(0, "file", record.param["file"])
+    durdf.to_csv(savename, index=False)
+    return [savename]
+
+
+def run_export(record: Any, outdir: str, name: str, fmt: str = "hdf") -> list[str]:
+    """Export the record (hdf -> export_reload format, parquet -> data only)."""
+    if fmt == "parquet":
+        savename = os.path.join(outdir, name + ".parquet")
+        record.data.to_parquet(savename)
+        return [savename]
+    # pylint: disable=import-outside-toplevel
+    from anesplot.loadrec.export_reload import export_data_to_hdf
+
+    savename = os.path.join(outdir, name + ".hdf")
+    key = {"MonitorTrend": "mtrend", "TaphTrend": "ttrend", "MonitorWave": "mwave"}[
+        type(record).__name__
+    ]
+    export_data_to_hdf(savename, **{key: record})
+    return [savename]
+
+
+def failed_result(
+    kind: str, filename: str, pipeline: str, error: str = ""
+) -> dict[str, Any]:
+    """Return the report row of a record that was not processed."""
+    return {
+        "file": filename,
+        "kind": kind,
+        "pipeline": pipeline,
+        "status": "failed",
+        "load_sec": None,
+        "process_sec": None,
+        "outputs": "",
+        "error": error,
+    }
+
+
+def process_record(
+    kind: str,
+    filename: str,
+    pipeline: str,
+    outdir: str,
+    fmt: str = "hdf",
+    name: Optional[str] = None,
+) -> dict[str, Any]:
+    """
+    Load a record and apply the pipeline (errors are caught and reported).
+
+    Parameters
+    ----------
+    kind : str
+        the kind of record (in RECORD_PATTERNS).
+    filename : str
+        the record fullname.
+    pipeline : str
+        the pipeline to use (in PIPELINES).
+    outdir : str
+        the output folder.
+    fmt : str, optional (default is "hdf")
+        the export format ('hdf' or 'parquet').
+    name : str, optional (default is None -> the file basename)
+        the basename of the outputs.
+
+    Returns
+    -------
+    dict
+        {file, kind, pipeline, status, load_sec, process_sec, outputs, error}.
+    """
+    result = failed_result(kind, filename, pipeline)
+    if name is None:
+        name = os.path.splitext(os.path.basename(filename))[0]
+    try:
+        start = time.perf_counter()
+        record = load_record(kind, filename)
+        result["load_sec"] = round(time.perf_counter() - start, 3)
+        start = time.perf_counter()
+        if pipeline == "plot":
+            outputs = run_plot(record, outdir, name)
+        elif pipeline == "hypotension":
+            outputs = run_hypotension(record, outdir, name)
+        elif pipeline == "export":
+            outputs = run_export(record, outdir, name, fmt)
+        else:
+            raise ValueError(f"unknown pipeline : {pipeline}")
+        result["process_sec"] = round(time.perf_counter() - start, 3)
+        result["outputs"] = ";".join(outputs)
+        result["status"] = "ok"
+    except Exception as error:  # pylint: disable=broad-except
+        # keep going : the error is reported
+        result["error"] = f"{type(error).__name__}: {error}"
+        logging.warning(f"{os.path.basename(filename)} : {traceback.format_exc()}")
+    return result
+
+
+def init_worker() -> None:
+    """Configure a worker process (no display)."""
+    import matplotlib  # pylint: disable=import-outside-toplevel
+
+    matplotlib.use("Agg")
+
+
+def run_pool(
+    tasks: list[tuple[str, str, str]], jobs: int, pipeline: str, outdir: str, fmt: str
+) -> tuple[list[dict[str, Any]], list[tuple[str, str, str]]]:
+    """
+    Process the records in a pool of processes.
+
+    Parameters
+    ----------
+    tasks : list[tuple[str, str, str]]
+        the (kind, filename, name) of the records.
+    jobs : int
+        number of processes.
+    pipeline, outdir, fmt : str
+        cf process_record.
+
+    Returns
+    -------
+    results : list[dict]
+        the report rows (a worker exception -> a failed row).
+    broken : list[tuple[str, str, str]]
+        the records not processed because a worker died (BrokenProcessPool).
+    """
+    results, broken = [], []
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker) as pool:
+        futures = {
+            pool.submit(
+                process_record, kind, filename, pipeline, outdir, fmt, name
+            ): (kind, filename, name)
+            for kind, filename, name in tasks
+        }
+        for future in as_completed(futures):
+            kind, filename, name = futures[future]
+            try:
+                results.append(future.result())
+            except BrokenProcessPool:
+                broken.append((kind, filename, name))
+                continue
+            except Exception as error:  # pylint: disable=broad-except
+                results.append(
+                    failed_result(
+                        kind, filename, pipeline, f"{type(error).__name__}: {error}"
+                    )
+                )
+            print_result(results[-1])
+    return results, broken
+
+
+def run_batch(
+    dirname: str,
+    pipeline: str = "plot",
+    outdir: Optional[str] = None,
+    jobs: int = 1,
+    kinds: Optional[list[str]] = None,
+    fmt: str = "hdf",
+) -> pd.DataFrame:
+    """
+    Process all the records of a folder.
+
+    Parameters
+    ----------
+    dirname : str
+        the folder to scan.
+    pipeline : str, optional (default is "plot")
+        the pipeline to use (in PIPELINES).
+    outdir : str, optional (default is None -> <dirname>/anesplot_batch/<pipeline>)
+        the output folder.
+    jobs : int, optional (default is 1)
+        number of processes (1 -> in the current process, with the Agg
+        backend, the previous backend is restored at the end).
+    kinds : list[str], optional (default is None -> PIPELINES[pipeline])
+        the kinds of record to process.
+    fmt : str, optional (default is "hdf")
+        the export format ('hdf' or 'parquet').
+
+    Returns
+    -------
+    pd.DataFrame
+        the report (one row per record), also written in outdir.
+    """
+    if pipeline not in PIPELINES:
+        raise ValueError(f"{pipeline=} should be in {list(PIPELINES)}")
+    if kinds is None:
+        kinds = PIPELINES[pipeline]
+    if outdir is None:
+        outdir = os.path.join(dirname, OUTDIR_NAME, pipeline)
+    os.makedirs(outdir, exist_ok=True)
+    records = discover_records(dirname, kinds)
+    print(f"{len(records)} record(s) to process ({pipeline=}, {jobs=})")
+    # the relative path -> no collision between subfolders
+    names = [
+        os.path.splitext(os.path.relpath(filename, dirname))[0].replace(os.sep, "_")
+        for _, filename in records
+    ]
+    results = []
+    start = time.perf_counter()
+    if jobs > 1:
+        tasks = [
+            (kind, filename, name) for (kind, filename), name in zip(records, names)
+        ]
+        isolate = False
+        while tasks:
+            if not isolate:
+                done, broken = run_pool(tasks, jobs, pipeline, outdir, fmt)
+                results.extend(done)
+                # a worker died -> the unprocessed records again,
+                # one process per record if nothing was processed (-> the culprit)
+                isolate = bool(broken) and not done
+                tasks = broken
+                continue
+            for task in tasks:
+                done, broken = run_pool([task], 1, pipeline, outdir, fmt)
+                if broken:
+                    kind, filename, _ = task
+                    done = [
+                        failed_result(
+                            kind, filename, pipeline, "BrokenProcessPool: worker died"
+                        )
+                    ]
+                    print_result(done[0])
+                results.extend(done)
+            tasks = []
+    else:
+        import matplotlib.pyplot as plt  # pylint: disable=import-outside-toplevel
+
+        # no display, the caller backend is restored
+        # (nb switching an interactive backend closes its figures)
+        previous = plt.get_backend()
+        if previous.lower() != "agg":
+            plt.switch_backend("Agg")
+        try:
+            for (kind, filename), name in zip(records, names):
+                results.append(
+                    process_record(kind, filename, pipeline, outdir, fmt, name)
+                )
+                print_result(results[-1])
+        finally:
+            if previous.lower() != "agg":
+                plt.switch_backend(previous)
+    report = pd.DataFrame(
+        results,
+        columns=[
+            "file",
+            "kind",
+            "pipeline",
+            "status",
+            "load_sec",
+            "process_sec",
+            "outputs",
+            "error",
+        ],
+    ).sort_values("file", ignore_index=True)
+    report.to_csv(os.path.join(outdir, REPORT_NAME), index=False)
+    if pipeline == "hypotension" and not report.empty:
+        merge_hypotension(report, outdir)
+    failed = (report.status != "ok").sum()
+    print(
+        f"processed {len(report)} record(s) in {time.perf_counter() - start:.1f} s"
+        f" ({failed} failed), report in {os.path.join(outdir, REPORT_NAME)}"
+    )
+    return report
+
+
+def print_result(result: dict[str, Any]) -> None:
+    """Print a one line summary of a processed record."""
+    timings = f"load {result['load_sec'] or 0:6.2f} s"
+    timings += f" process {result['process_sec'] or 0:6.2f} s"
+    line = f"{result['status']:6} {timings}  {os.path.basename(result['file'])}"
+    if result["error"]:
+        line += f"  ({result['error']})"
+    print(line)
+
+
+def merge_hypotension(report: pd.DataFrame, outdir: str) -> str:
+    """Gather the hypotension episodes of all the records in one csv file."""
+    frames = [
+        pd.read_csv(name)
+        for name in report.loc[report.status == "ok", "outputs"]
+        if name and os.path.getsize(name) > 1
+    ]
+    savename = os.path.join(outdir, "hypotension_episodes.csv")
+    if frames:
+        pd.concat(frames, ignore_index=True).to_csv(savename, index=False)
+    else:
+        pd.DataFrame().to_csv(savename, index=False)
+    return savename
+
+
+def main(argv: Optional[list[str]] = None) -> pd.DataFrame:
+    """Command line entry point ('python -m anesplot batch')."""
+    parser = argparse.ArgumentParser(
+        prog="python -m anesplot batch",
+        description="process all the records of a folder (no display)",
+    )
+    parser.add_argument("dirname", help="the folder to scan (and its subfolders)")
+    parser.add_argument(
+        "-p", "--pipeline", choices=list(PIPELINES), default="plot", help="the process"
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=os.cpu_count() or 1, help="nb of processes"
+    )
+    parser.add_argument("-o", "--outdir", default=None, help="the output folder")
+    parser.add_argument(
+        "-k",
+        "--kinds",
+        nargs="+",
+        choices=list(RECORD_PATTERNS),
+        default=None,
+        help="the kinds of record to process",
+    )
+    parser.add_argument(
+        "-f", "--format", choices=["hdf", "parquet"], default="hdf", dest="fmt"
+    )
+    args = parser.parse_args(argv)
+    if not os.path.isdir(args.dirname):
+        parser.error(f"{args.dirname} is not a directory")
+    return run_batch(
+        args.dirname,
+        pipeline=args.pipeline,
+        outdir=args.outdir,
+        jobs=args.jobs,
+        kinds=args.kinds,
+        fmt=args.fmt,
+    )
+
+
+# %%
+if __name__ == "__main__":
+    main()
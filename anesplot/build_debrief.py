@@ -22,8 +22,6 @@ from anesplot.guides.choose_guide import (  # noqa: F401
     get_basic_debrief_commands,
 )
 
-paths = build_paths()
-
 
 def locate_debriefs_directory(basedir: Optional[str] = None) -> str:
     """
@@ -222,7 +220,7 @@ def fill_csv2hdf(record_name: str, debrief_dirname: str) -> None:
         "from anesplot.config.load_recordrc import build_paths",
         "",
         "paths = build_paths()",
-        f"paths['debriefs'] = '{paths['debriefs']}'",
+        f"paths['debriefs'] = '{build_paths()['debriefs']}'",
         f"dir_name = '{debrief_dirname}'",
         "os.chdir(dir_name)",
         "",
@@ -270,7 +268,7 @@ def fill_work_on(record_name: str, debrief_dirname: str) -> None:
         "from anesplot.config.load_recordrc import build_paths",
         "",
         "paths = build_paths()",
-        f"paths['debriefs'] = '{paths['debriefs']}'",
+        f"paths['debriefs'] = '{build_paths()['debriefs']}'",
         f"dir_name = '{debrief_dirname}'",
         "os.chdir(dir_name)",
         "",
@@ -318,7 +316,7 @@ def fill_ekg2hr(record_name: str, debrief_dirname: str) -> None:
         "from anesplot.treatrec.wave_func import fix_baseline_wander",
         "",
         "paths = build_paths()",
-        f"paths['debriefs'] = '{paths['debriefs']}'",
+        f"paths['debriefs'] = '{build_paths()['debriefs']}'",
         f"dir_name = '{debrief_dirname}'",
         "os.chdir(dir_name)",
         "",
@@ -384,6 +382,7 @@ def fill_ekg2hr(record_name: str, debrief_dirname: str) -> None:
 
 def main() -> None:
     """Build process."""
+    paths = build_paths()
     location = os.path.join(
         os.path.expanduser("~"), "enva", "clinique", "recordings", "debriefs"
     )
@@ -9,13 +9,29 @@
 """
 import os
 import sys
+from typing import Any, Optional
 
 import yaml  # type: ignore
 
 # TODO : move the configuration file to the home dir as .anesplotrc
 
+_RCDICO: Optional[dict[str, str]] = None  # the configuration (read once)
+
 
 def build_paths() -> dict[str, str]:
+    """
+    Return the configuration paths.
+
+    The yaml file is read at the first call only, the same dictionary is then
+    returned (ie a change made by a module is seen by the others).
+    """
+    global _RCDICO  # pylint: disable=global-statement
+    if _RCDICO is None:
+        _RCDICO = read_rcfile()
+    return _RCDICO
+
+
+def read_rcfile() -> dict[str, str]:
     """Read the yaml configuration file."""
     rc_filename = os.path.expanduser("~/.anesplotrc")
     if os.path.isfile(os.path.join(os.path.dirname(__file__), ".anesplotrc")):
@@ -61,7 +77,14 @@ def adapt_with_syspath(path_dico: dict[str, str]) -> None:
 #    adapt_with_syspath(paths)
 # trying to avoid to have a python package in the path
 
-paths = build_paths()
+
+def __getattr__(name: str) -> Any:
+    """Build the module level 'paths' at the first access."""
+    if name == "paths":
+        return build_paths()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 # %%
 if __name__ == "__main__":
     paths = build_paths()
@@ -9,6 +9,7 @@ scan folders and check for hypotension
 """
 import os
 import logging
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from typing import Any, Optional
 
@@ -18,6 +19,7 @@ import numpy as np
 from matplotlib.patches import Rectangle
 
 import anesplot.loadrec.dialogs as dlg
+import anesplot.loadrec.loadmonitor_trendrecord as lmt
 from anesplot.slow_waves import MonitorTrend
 
 # import anesplot.slow_waves
@@ -103,7 +105,11 @@ def list_files(dirname: str) -> list[str]:
             continue
         if os.path.isfile(os.path.join(dirname, file)):
             date = os.path.basename(file).strip(".csv").strip("M")
-            dtime = datetime.strptime(date, "%Y_%m_%d-%H_%M_%S")
+            try:
+                dtime = datetime.strptime(date, "%Y_%m_%d-%H_%M_%S")
+            except ValueError:
+                # not a monitor trend (eg an extracted table)
+                continue
             twodigitmonth_date = dtime.strftime("%Y_%m_%d-%H:%M")
             filedico[twodigitmonth_date] = os.path.join(dirname, file)
     filedico = dict(sorted(filedico.items()))
@@ -145,95 +151,116 @@ def extract_hypotension(
         a pandas dataframe containing the hypotension durations
 
     """
-    # TODO filter the data to remove data below 0 (at least)
     if param is None:
         param = {"file": "toto"}
-    datadf = df.copy()
-    if "ip1m" not in datadf.columns:
+    if "ip1m" not in df.columns:
         print("no ip1m recording in the data")
         return pd.DataFrame()
-    # datadf = pd.DataFrame(datadf.set_index(datadf.etimemin.astype(int))["ip1m"])
-    # datadf["low"] = datadf.ip1m < pamin  # -> True/False
-    # datadf["trans"] = datadf.low - datadf.low.shift(-1)  # -1, 0, 1
-
     datadf = df[["dtime", "etimemin", "ip1m"]]
-    datadf.loc[datadf.ip1m < 0] = np.nan
-    datadf = datadf.dropna()
-    # df = pd.DataFrame(df)
-    datadf["hypo"] = datadf.ip1m < 70
-    datadf["trans"] = datadf.hypo.shift(1) - datadf.hypo
-    if len(datadf.trans.dropna().value_counts()) < 2:
+    # negative values are artefacts
+    datadf = datadf.loc[~(datadf.ip1m < 0)].dropna()
+    dtime = datadf.dtime.to_numpy()
+    etimemin = datadf.etimemin.to_numpy(dtype=float)
+    ip1m = datadf.ip1m.to_numpy(dtype=float)
+
+    # run length encoding of the hypotension state
+    hypo = ip1m < pamin
+    change = hypo[1:] != hypo[:-1]
+    if len(np.unique(hypo[:-1].astype(np.int8) - hypo[1:])) < 2:
         logging.warning(f"no transision detected ({param.get('file')})")
         return pd.DataFrame()
-    # status at begining
-    if datadf.loc[datadf.index[0]]["hypo"]:
-        datadf.loc[datadf.index[0], ["trans"]] = -1
-    else:
-        datadf.loc[datadf.index[0], ["trans"]] = 1
-
-    # extract changes
-    # down = datadf.loc[datadf.trans == -1, ["dtime"]].squeeze().rename("down")
-    # up = datadf.loc[datadf.trans == 1, ["dtime"]].squeeze().rename("up")
-    down = pd.Series(
-        name="down", data=datadf.loc[datadf.trans == -1, ["dtime"]].squeeze()
-    )
-    up = pd.Series(name="up", data=datadf.loc[datadf.trans == 1, ["dtime"]].squeeze())
-    # test up and down matches
-    if (up.iloc[0] - down.iloc[0]).total_seconds() < 0:
-        # up is before down -> higher pressure
-        up.drop(up.index[0], inplace=True)
-        logging.warning(
-            "up transition before the down one, removed the first transision"
-        )
-    while len(up) > len(down):
-        up.drop(up.index[-1], inplace=True)
-        logging.warning(
-            "number of up transitions higher than down, removed the last up detection"
-        )
-    while len(up) < len(down):
-        down.drop(down.index[-1], inplace=True)
+    runs = np.cumsum(np.concatenate(([0], change)))  # run number of each point
+    edges = np.flatnonzero(change) + 1  # first point of each new run
+    starts = edges[hypo[edges]]  # first hypotensive point
+    ends = edges[~hypo[edges]]  # first point back above pamin
+    if hypo[0]:
+        starts = np.concatenate(([0], starts))
+    if len(starts) > len(ends):
         logging.warning(
-            "number of down transitions higher than down ones : removed the last down detection"
+            "hypotension still present at the end of the record : last episode removed"
         )
-    durdf = pd.concat(
-        [up.reset_index(drop=True), down.reset_index(drop=True)],
-        ignore_index=False,
-        axis=1,
-    )
-    if not durdf.empty:
-        # mean duration
-        durdf["hypo_dur"] = durdf.up - durdf.down
-        durdf.hypo_dur = durdf.hypo_dur.apply(lambda x: x.total_seconds() / 60)
-        # mean values
-        # values = pd.DataFrame()
-        indicises = []
-        ip1meds = []
-        mstarts = []
-        mends = []
-        for i, (start, end) in durdf[["down", "up"]].iterrows():
-            indicises.append(i)
-            ip1meds.append(
-                datadf.set_index("dtime").loc[start:end].iloc[:-1].ip1m.median()
-            )
-            mstarts.append(datadf.loc[datadf.dtime == start, "etimemin"].to_list()[0])
-            mends.append(datadf.loc[datadf.dtime == end, "etimemin"].to_list()[0])
-
-        durdf["ip1med"] = ip1meds
-        durdf["mstart"] = mstarts
-        durdf["mend"] = mends
-        #     ip1med = (
-        #         datadf.set_index("dtime").loc[start:end].iloc[:-1].ip1m.median()
-        #         )
-        #     mstart = datadf.loc[datadf.dtime == start, "etimemin"].to_list()[0]
-        #     mend = datadf.loc[datadf.dtime == end, "etimemin"].to_list()[0]
-        #     values[i] = [mstart, mend, ip1med]
-        # values = values.T
-        # values.columns = ["mstart", "mend", "ip1med"]
-        # durdf = pd.concat([durdf, values], axis=1)
+        starts = starts[: len(ends)]
+
+    medians = pd.Series(ip1m[hypo]).groupby(runs[hypo]).median()
+    durdf = pd.DataFrame({"up": dtime[ends], "down": dtime[starts]})
+    durdf["hypo_dur"] = (durdf.up - durdf.down).dt.total_seconds() / 60
+    durdf["ip1med"] = medians.loc[runs[starts]].to_numpy()
+    durdf["mstart"] = etimemin[starts]
+    durdf["mend"] = etimemin[ends]
+    return durdf
 
+
+def file_hypotension(filename: str, pamin: int = 70) -> pd.DataFrame:
+    """
+    Load a monitor trend record and extract the hypotension episodes (no figure).
+
+    Parameters
+    ----------
+    filename : str
+        the monitor trend record (fullname).
+    pamin : int, optional (default is 70)
+        the minimal arterial pressure value
+
+    Returns
+    -------
+    durdf : pd.DataFrame
+        the hypotension episodes (extract_hypotension) with a 'file' column,
+        empty if no data, no ip1m or a loading error.
+    """
+    file = os.path.basename(filename)
+    try:
+        loaded = lmt.loadmonitor_trenddata(filename)
+    except Exception as error:  # pylint: disable=broad-except
+        logging.warning(f"{file} : unable to load the data ({error})")
+        return pd.DataFrame()
+    datadf = loaded[0] if isinstance(loaded, tuple) else loaded
+    if datadf.empty:
+        logging.warning(f"{file} contains no data ")
+        return pd.DataFrame()
+    if "ip1m" not in datadf.columns:
+        logging.warning(f"{file} doesn't contains ip1m")
+        return pd.DataFrame()
+    durdf = extract_hypotension(datadf, {"file": file}, pamin=pamin)
+    if not durdf.empty:
+        durdf.insert(0, "file", file)
     return durdf
 
 
+def extract_folder_hypotension(
+    dirname: str, pamin: int = 70, jobs: Optional[int] = None
+) -> pd.DataFrame:
+    """
+    Extract the hypotension episodes of all the monitor trends of a folder.
+
+    Parameters
+    ----------
+    dirname : str
+        the folder to scan.
+    pamin : int, optional (default is 70)
+        the minimal arterial pressure value
+    jobs : int, optional (default is None -> os.cpu_count())
+        number of processes (1 -> in the current process).
+
+    Returns
+    -------
+    pd.DataFrame
+        one row per episode : file, up, down, hypo_dur, ip1med, mstart, mend
+    """
+    file_list = list_files(dirname)
+    if jobs == 1 or len(file_list) < 2:
+        frames = [file_hypotension(name, pamin) for name in file_list]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            frames = list(
+                pool.map(file_hypotension, file_list, [pamin] * len(file_list))
+            )
+    columns = ["file", "up", "down", "hypo_dur", "ip1med", "mstart", "mend"]
+    frames = [_ for _ in frames if not _.empty]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)[columns]
+
+
 def plot_hypotension(
     atrend: Any, durdf: pd.DataFrame, durmin: int = 15, pamin: int = 70
 ) -> plt.Figure:
@@ -430,12 +457,21 @@ def main(
     folder: bool = True,
     scatter: bool = False,
     dirpath: Optional[str] = None,
+    table: bool = False,
 ) -> str:
-    """Run function."""
+    """Run function (table -> folder episodes saved as a csv file, no figure)."""
     # analyse all the recordings present in a folder
     if dirpath is None:
         dirpath = os.path.expanduser("~")
 
+    if folder and table:
+        dir_name = get_dir(dirpath)
+        durdf = extract_folder_hypotension(dir_name)
+        file_name = os.path.join(dir_name, "hypotension_episodes.csv")
+        durdf.to_csv(file_name, index=False)
+        print(f"{len(durdf)} episode(s) from {durdf.file.nunique()} record(s)")
+        print(f"saved in {file_name}")
+        return file_name
     if folder:
         dir_name = get_dir(dirpath)
         file_list = list_files(dir_name)
@@ -502,5 +538,18 @@ if __name__ == "__main__":
         default=False,
     )
 
+    parser.add_argument(
+        "-t",
+        "--table",
+        help="directory scan : save all the episodes in a table (no figure)",
+        action="store_true",
+        default=False,
+    )
+
     args = parser.parse_args()
-    main(folder=args.directory, scatter=args.scatter, dirpath=paths["mon_data"])
+    main(
+        folder=args.directory,
+        scatter=args.scatter,
+        dirpath=paths["mon_data"],
+        table=args.table,
+    )
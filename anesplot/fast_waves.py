@@ -11,11 +11,11 @@ build the objects or the fast_waves ('waves'):
 """
 import logging
 import os
-from typing import Any, Optional, Tuple, Union
+from typing import Any, Iterator, Optional, Tuple, Union
 
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
-from PyQt5.QtWidgets import QApplication
 
 import anesplot.loadrec.dialogs as dlgs
 import anesplot.plot.t_agg_plot as tagg
@@ -28,23 +28,19 @@ from anesplot.config.load_recordrc import build_paths
 
 # from anesplot.loadrec.agg_load import choosefile_gui
 from anesplot.loadrec.loadmonitor_waverecord import (
+    iter_wave_chunks,
     loadmonitor_wavedata,
     loadmonitor_waveheader,
+    loadmonitor_wavestore,
 )
 from anesplot.loadrec.loadtelevet import loadtelevet
+from anesplot.loadrec.wave_store import WaveStore
 
 # from anesplot.plot.w_agg_plot import select_wave_to_plot
+from anesplot.treatrec.derived_cache import DerivedCache
+from anesplot.treatrec.ekg_to_hr import detect_beats_blocks
 from anesplot.treatrec.wave_func import fix_baseline_wander
-
-paths = build_paths()
-
-app = QApplication.instance()
-logging.info(f"dialogs.py : {__name__=}")
-if app is None:
-    logging.info("N0 QApplication instance - - - - - - - - - - - - - > creating one")
-    app = QApplication([])
-else:
-    logging.warning(f"QApplication instance already exists: {QApplication.instance()}")
+from anesplot.treatrec.wavelet_func import default_frequencies, morlet_cwt
 
 
 # ++++++++
@@ -54,11 +50,325 @@ class _FastWave(Waves):
     def __init__(self) -> None:
         super().__init__()
         self.trace_list: list[plt.Line2D]
+        self.store: Optional[WaveStore] = None
+        self._data: Optional[pd.DataFrame] = None
+        # the derived signals (filtered traces, beats, peaks)
+        self.derived = DerivedCache()
+        self.data_version = 0
+
+    @property
+    def data(self) -> pd.DataFrame:
+        """The recorded data (built from the store at the first access)."""
+        if self._data is None:
+            if self.store is None:
+                return pd.DataFrame()
+            logging.info(f"{'-' * 10} building the full dataframe from the store")
+            self._data = self.store.frame()
+        return self._data
+
+    @data.setter
+    def data(self, datadf: pd.DataFrame) -> None:
+        self._data = datadf
+        self.invalidate_derived()
+
+    def invalidate_derived(self) -> None:
+        """Clear the derived signals (to be called after an inplace data change)."""
+        self.data_version += 1
+        self.derived.clear()
+
+    def get_roi_data(
+        self, keys: list[str], lims: Optional[Tuple[float, float]] = None
+    ) -> pd.DataFrame:
+        """
+        Return the traces between two elapsed times.
+
+        Parameters
+        ----------
+        keys : list[str]
+            the traces to use.
+        lims : tuple, optional (default is None -> self.roi['sec'])
+            the limits (in sec).
+
+        Returns
+        -------
+        pd.DataFrame
+            the traces (index = 'etimesec').
+        """
+        if lims is None:
+            lims = self.roi["sec"]
+        if self._data is None and self.store is not None:
+            start, stop = self.store.sec_to_point(lims)
+            roidf = self.store.frame(keys, start, stop + 1, time_cols=["etimesec"])
+            return roidf.set_index("etimesec")
+        datadf = self.data[["etimesec"] + keys].set_index("etimesec")
+        return datadf.loc[lims[0] : lims[1]]
+
+    def _trace(self, trace: str) -> pd.Series:
+        """Return a trace (index = point location), without building the data."""
+        if self._data is None and self.store is not None:
+            return pd.Series(self.store.view(trace), name=trace)
+        return self.data[trace]
+
+    def _etimesec(self, points: Any) -> np.ndarray:
+        """Return the elapsed times (sec) of point locations."""
+        if self._data is None and self.store is not None:
+            return np.asarray(points) / self.store.sampling_freq
+        return self.data.etimesec.loc[points].to_numpy()
+
+    def _roi_points(self, lims: Tuple[float, float]) -> Tuple[int, int]:
+        """Return the first and last point locations between two elapsed times."""
+        if self._data is None and self.store is not None:
+            return self.store.sec_to_point(lims)
+        # same points as get_roi_data (etimesec between the limits)
+        etimesec = self.data.etimesec
+        points = self.data.index[
+            etimesec.searchsorted(lims[0], side="left") : etimesec.searchsorted(
+                lims[1], side="right"
+            )
+        ]
+        return (points[0], points[-1]) if len(points) else (1, 0)
 
-    def filter_ekg(self) -> None:
-        """Filter the ekg trace -> build 'ekgMovAvg' & 'ekgLowPass'."""
+    def get_filtered(self, trace: str = "wekg", method: str = "ndimage") -> pd.Series:
+        """
+        Return the baseline corrected trace (whole record, cached).
+
+        Parameters
+        ----------
+        trace : str, optional (default is "wekg")
+            the trace name.
+        method : str, optional (default is "ndimage")
+            the running median implementation (cf wave_func.compute_baseline).
+
+        Returns
+        -------
+        pd.Series
+            the filtered trace (index = point location, NaN removed),
+            shared with the cache : don't modify it in place.
+        """
+
+        def compute() -> pd.Series:
+            fs = self.param["sampling_freq"] or 300
+            return fix_baseline_wander(self._trace(trace).dropna(), fs, method)
+
+        key = ("filtered", trace, method, self.data_version)
+        return self.derived.get_or_compute(key, compute)
+
+    def get_roi_filtered(
+        self,
+        trace: str = "wekg",
+        lims: Optional[Tuple[float, float]] = None,
+        method: str = "ndimage",
+    ) -> pd.Series:
+        """
+        Return the baseline corrected trace between two elapsed times.
+
+        the whole trace is filtered once (get_filtered), a ROI is a slice
+
+        Parameters
+        ----------
+        trace : str, optional (default is "wekg")
+            the trace name.
+        lims : tuple, optional (default is None -> self.roi['sec'])
+            the limits (in sec).
+        method : str, optional (default is "ndimage")
+            the running median implementation (cf wave_func.compute_baseline).
+
+        Returns
+        -------
+        pd.Series
+            the filtered trace (index = 'etimesec', as get_roi_data).
+        """
+        if lims is None:
+            lims = self.roi["sec"]
+        filtered = self.get_filtered(trace, method)
+        first, last = self._roi_points(lims)
+        roi = filtered.loc[first:last]
+        return pd.Series(
+            roi.to_numpy(), index=pd.Index(self._etimesec(roi.index), name="etimesec")
+        )
+
+    def get_beats(
+        self, trace: str = "wekg", threshold: float = -1, method: str = "ndimage"
+    ) -> pd.DataFrame:
+        """
+        Return the beats detected on the filtered ekg (whole record, cached).
+
+        Parameters
+        ----------
+        trace : str, optional (default is "wekg")
+            the ekg trace name.
+        threshold : float, optional (default is -1)
+            cf ekg_to_hr.detect_beats.
+        method : str, optional (default is "ndimage")
+            the running median implementation (cf wave_func.compute_baseline).
+
+        Returns
+        -------
+        pd.DataFrame
+            the beats (ekg_to_hr.detect_beats_blocks, x_loc = point location).
+        """
+
+        def compute() -> pd.DataFrame:
+            fs = int(self.param["sampling_freq"] or 300)
+            filtered = self.get_filtered(trace, method)
+            return detect_beats_blocks(filtered, fs=fs, threshold=threshold)
+
+        key = ("beats", trace, threshold, method, self.data_version)
+        return self.derived.get_or_compute(key, compute).copy()
+
+    def get_peaks(
+        self, trace: str = "wap", upp: bool = True, method: str = "ndimage"
+    ) -> pd.DataFrame:
+        """
+        Return the arterial peaks (whole record, cached).
+
+        Parameters
+        ----------
+        trace : str, optional (default is "wap")
+            the arterial trace name.
+        upp : bool, optional (default is True)
+            the 'up' peaks (False -> 'down' peaks).
+        method : str, optional (default is "ndimage")
+            the running median implementation (cf wave_func.compute_baseline).
+
+        Returns
+        -------
+        pd.DataFrame
+            the peaks (arterial_func.get_peaks, sloc in sec).
+        """
+
+        def compute() -> pd.DataFrame:
+            filtered = self.get_filtered(trace, method)
+            times = self._etimesec(filtered.index)
+            ser = self._trace(trace).loc[filtered.index]
+            ser = pd.Series(ser.to_numpy(), index=times)
+            detrended = pd.Series(filtered.to_numpy(), index=times)
+            return anesplot.treatrec.arterial_func.get_peaks(
+                ser, upp=upp, detrended=detrended
+            )
+
+        key = ("peaks", trace, upp, method, self.data_version)
+        return self.derived.get_or_compute(key, compute).copy()
+
+    def get_pressure_beats(
+        self, trace: str = "wap", method: str = "ndimage"
+    ) -> pd.DataFrame:
+        """
+        Return the beat based arterial table (whole record, cached).
+
+        Parameters
+        ----------
+        trace : str, optional (default is "wap")
+            the arterial trace name.
+        method : str, optional (default is "ndimage")
+            the running median implementation (cf wave_func.compute_baseline).
+
+        Returns
+        -------
+        pd.DataFrame
+            arterial_func.systolic_variation_table (systolic peaks paired with
+            the preceding troughs -> pulse_pressure).
+        """
+
+        def compute() -> pd.DataFrame:
+            return anesplot.treatrec.arterial_func.systolic_variation_table(
+                self.get_peaks(trace, upp=True, method=method),
+                self.get_peaks(trace, upp=False, method=method),
+            )
+
+        key = ("pressure_beats", trace, method, self.data_version)
+        return self.derived.get_or_compute(key, compute).copy()
+
+    def get_ppv(
+        self,
+        lims: Optional[Tuple[float, float]] = None,
+        trace: str = "wap",
+        method: str = "ndimage",
+    ) -> pd.DataFrame:
+        """
+        Return the pulse and systolic pressure variations per respiratory cycle.
+
+        the whole record is computed once (cached), lims select the cycles
+
+        Parameters
+        ----------
+        lims : tuple, optional (default is None -> whole record)
+            the limits (in sec).
+        trace : str, optional (default is "wap")
+            the arterial trace name.
+        method : str, optional (default is "ndimage")
+            the running median implementation (cf wave_func.compute_baseline).
+
+        Returns
+        -------
+        pd.DataFrame
+            arterial_func.respiratory_variation_table (one row per cycle :
+            start, end, beats, sys_max, sys_min, spv, sys_var, pp_max, pp_min, ppv).
+        """
+
+        def compute() -> pd.DataFrame:
+            return anesplot.treatrec.arterial_func.respiratory_variation_table(
+                self.get_pressure_beats(trace, method)
+            )
+
+        key = ("ppv", trace, method, self.data_version)
+        cycledf = self.derived.get_or_compute(key, compute)
+        if lims is not None:
+            cycledf = cycledf.loc[(cycledf.start >= lims[0]) & (cycledf.end <= lims[1])]
+        return cycledf.copy()
+
+    def get_cwt(
+        self,
+        trace: str = "wekg",
+        lims: Optional[Tuple[float, float]] = None,
+        frequencies: Any = None,
+        dtype: Any = np.complex64,
+    ) -> pd.DataFrame:
+        """
+        Return the morlet wavelet transform of a trace (cached).
+
+        Parameters
+        ----------
+        trace : str, optional (default is "wekg")
+            the ekg or arterial trace name.
+        lims : tuple, optional (default is None -> whole record)
+            the limits (in sec).
+        frequencies : array like, optional (default is None)
+            the frequencies (Hz), None -> 32 log spaced frequencies
+            (cf wavelet_func.default_frequencies).
+        dtype : optional (default is np.complex64)
+            the coefficients dtype.
+
+        Returns
+        -------
+        pd.DataFrame
+            the complex coefficients (index = 'etimesec', columns = frequencies),
+            shared with the cache : don't modify it in place.
+        """
+        if frequencies is None:
+            frequencies = default_frequencies(trace)
+        frequencies = tuple(np.atleast_1d(frequencies).astype(float))
+        if lims is not None:
+            lims = (lims[0], lims[1])
+
+        def compute() -> pd.DataFrame:
+            fs = self.param["sampling_freq"] or 300
+            ser = self._trace(trace)
+            if lims is not None:
+                first, last = self._roi_points(lims)
+                ser = ser.loc[first:last]
+            # evenly spaced signal required
+            ser = ser.interpolate(limit_direction="both")
+            coefs = morlet_cwt(ser.to_numpy(), frequencies, 1 / fs, dtype=dtype)
+            index = pd.Index(self._etimesec(ser.index), name="etimesec")
+            return pd.DataFrame(coefs.T, index=index, columns=frequencies)
+
+        key = ("cwt", trace, lims, frequencies, np.dtype(dtype).str, self.data_version)
+        return self.derived.get_or_compute(key, compute)
+
+    def filter_ekg(self, method: str = "ndimage") -> None:
+        """Filter the ekg trace -> build 'ekgLowPass' (method cf compute_baseline)."""
         datadf = self.data
-        samplingfreq = self.param["sampling_freq"]
         if "wekg" in datadf.columns:
             item = "wekg"
         elif "d2" in datadf.columns:
@@ -67,7 +377,7 @@ class _FastWave(Waves):
             logging.warning("no ekg trace in the data")
             return
         logging.info(f"{'-' * 10} filtering : builded 'ekgLowPass' ")
-        datadf["ekgLowPass"] = fix_baseline_wander(datadf[item], samplingfreq)
+        datadf["ekgLowPass"] = self.get_filtered(item, method)
 
     def plot_wave(
         self, traces_list: Union[list[str], None] = None
@@ -87,7 +397,15 @@ class _FastWave(Waves):
             lines : [line2D object]
             traces_list : [name of the traces]
         """
-        if self.data.empty:
+        # use the store (if any) until the full dataframe is built
+        store = self.store if self._data is None else None
+        if store is not None:
+            cols = store.columns
+            empty = len(store) == 0
+        else:
+            cols = list(self.data.columns)
+            empty = self.data.empty
+        if empty:
             fig = plt.Figure()
             lines: list[plt.Line2D] = []
             traces_list = []
@@ -95,7 +413,7 @@ class _FastWave(Waves):
         else:
             logging.info(f"{'-' * 20} started FastWave plot_wave)")
             logging.info(f"{'-' * 10}> choose the wave(s)")
-            cols: list[str] = [w for w in self.data.columns if w[0] in ["i", "r", "w"]]
+            cols = [w for w in cols if w[0] in ["i", "r", "w"]]
             if traces_list is None and cols:
                 traces_list = []
                 atrace = dlgs.choose_in_alist(cols, message="choose the wave to plot")
@@ -109,8 +427,19 @@ class _FastWave(Waves):
             if traces_list:
                 logging.info("call wplot.plot_wave")
                 # get segmentation fault if called after a trend.showplots()
+                if store is not None:
+                    # only the traces and the time columns are extracted
+                    maxi = self.param.get("maxi")
+                    datadf = store.frame(
+                        traces_list,
+                        self.param.get("mini"),
+                        None if maxi is None else maxi + 1,
+                        time_cols=["dtime", "etimesec"],
+                    )
+                else:
+                    datadf = self.data
                 fig, lines = wplot.plot_wave(
-                    self.data, keys=traces_list, param=self.param
+                    datadf, keys=traces_list, param=self.param
                 )
                 logging.info("returned from wplot.plot_wave")
                 self.trace_list = traces_list
@@ -149,7 +478,10 @@ class _FastWave(Waves):
         elif self.fig:
             # roidict = wplot.get_wave_roi(self)
             # roidict = wplot.get_wave_roi(self.fig, self.data, self.param)
-            roidict = tagg.get_roi(self.fig, self.data, self.param)
+            if self._data is None and self.store is not None:
+                roidict = tagg.get_store_roi(self.fig, self.store, self.param)
+            else:
+                roidict = tagg.get_roi(self.fig, self.data, self.param)
             roidict.update({"traces": self.trace_list, "fig": self.fig})
         else:
             logging.warning(
@@ -191,8 +523,16 @@ class _FastWave(Waves):
 
         """
         if self.roi:
+            if self._data is None and self.store is not None:
+                # the roi traces only
+                start, stop = self.roi["pt"]
+                datadf = self.store.frame(
+                    self.roi["traces"], start, stop + 1, time_cols=["etimesec"]
+                )
+            else:
+                datadf = self.data
             anim = w2vid.create_video(
-                self.data,
+                datadf,
                 self.param,
                 self.roi,
                 speed=speed,
@@ -264,7 +604,7 @@ class TelevetWave(_FastWave):
     def __init__(self, filename: str):
         super().__init__()
         if filename:
-            dir_path = paths.get("telv_data")
+            dir_path = build_paths().get("telv_data")
             filename = dlgs.choose_file(
                 dirname=dir_path, title="choose televet recording"
             )
@@ -286,6 +626,7 @@ class MonitorWave(_FastWave):
 
     input : filename = path to file
     load = boolean to load data (default is True)
+    mmap = boolean to use a memory mapped float32 store (default is False)
 
     Attributes
     ----------
@@ -294,7 +635,9 @@ class MonitorWave(_FastWave):
     header : dict
         the header data
     data : pd.DataFrame
-        the recorded data
+        the recorded data (built from the store at the first access if mmap)
+    store : WaveStore
+        the float32 traces (if mmap, time columns are computed on request)
     param : dict
         description of data loaded and manipulated
     fig : plt.Figure
@@ -320,12 +663,22 @@ class MonitorWave(_FastWave):
         blood pressure variation
     plot_roi_systolic_variation
         blood pressure variation
+    iter_chunks
+        load the data by chunks (bounded memory)
+    get_filtered, get_roi_filtered
+        baseline corrected trace (computed once, cached in derived)
+    get_beats, get_peaks
+        ekg beats and arterial peaks of the whole record (cached in derived)
+    get_pressure_beats, get_ppv
+        beat based and respiratory cycle based pressure variations (cached)
     """
 
-    def __init__(self, filename: Optional[str] = None, load: bool = True):
+    def __init__(
+        self, filename: Optional[str] = None, load: bool = True, mmap: bool = False
+    ):
         super().__init__()
         if filename is None:
-            dir_path = paths.get("mon_data")
+            dir_path = build_paths().get("mon_data")
             filename = dlgs.choose_file(
                 dirname=dir_path, title="choose monitor wave recording"
             )
@@ -338,7 +691,9 @@ class MonitorWave(_FastWave):
         self.param["file"] = os.path.basename(filename)
         header = loadmonitor_waveheader(filename)
         self.header = header
-        if load and bool(header):
+        if load and bool(header) and mmap:
+            self.store = loadmonitor_wavestore(filename)
+        elif load and bool(header):
             self.data = loadmonitor_wavedata(filename)
         else:
             logging.warning(f"{'-'*5} MonitorWave: didn't load the data ({load=})")
@@ -347,3 +702,23 @@ class MonitorWave(_FastWave):
         # self.param["source_abbr"] = "mw"
         self.param["sampling_freq"] = float(header.get("Data Rate (ms)", 0)) * 60 / 1000
         # usually 300 Hz
+
+    def iter_chunks(self, chunksize: int = 300 * 60 * 10) -> Iterator[pd.DataFrame]:
+        """
+        Iterate over the recorded data by chunks (without loading the whole file).
+
+        typically used with MonitorWave(filename, load=False) for long records,
+        the chunks are indexed by point location
+        (ie can be passed to fix_baseline_wander or detect_beats).
+
+        Parameters
+        ----------
+        chunksize : int, optional (default is 300 * 60 * 10 <-> 10 minutes)
+            number of points per chunk.
+
+        Yields
+        ------
+        pd.DataFrame
+            a chunk of the wave data (scaled and cleaned).
+        """
+        yield from iter_wave_chunks(self.filename, chunksize=chunksize)
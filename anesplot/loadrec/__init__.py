@@ -8,6 +8,8 @@ contains:
     agg.. modules : aggregate basic functions for further use
     load.. modules : script containing the loading functions
     export_reload : functions to interact locally with .hdf files
+    time_norm : vectorized time normalisation (day rollover, elapsed times)
+    follow_load : incremental loading of the records that are still written
 
 load..modules 'global' content:
     - choose file:  GUI -> filename
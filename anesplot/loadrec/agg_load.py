@@ -6,20 +6,11 @@ Created on Thu Apr 28 15:50:27 2022
 """
 import logging
 import os
-import sys
 from typing import Optional, Union
 
-from PyQt5.QtWidgets import QApplication, QFileDialog, QInputDialog, QWidget
-
 import pandas as pd
 
-app = QApplication.instance()
-logging.info(f"agg_load.py : {__name__=}")
-if app is None:
-    logging.info("N0 QApplication instance - - - - - - - - - - - - - > creating one")
-    app = QApplication([])
-else:
-    logging.warning(f"QApplication instance already exists: {QApplication.instance()}")
+from anesplot.loadrec.dialogs import get_app
 
 
 def choosefile_gui(dirname: Optional[str] = None) -> str:
@@ -42,9 +33,10 @@ def choosefile_gui(dirname: Optional[str] = None) -> str:
         )
     # bug un macos : necessity to add a fakename
     dirname = os.path.join(dirname, "fakename.csv")
-    if "app" not in dir():
-        app = QApplication(sys.argv)
-        app.setQuitOnLastWindowClosed(True)
+    from PyQt5.QtWidgets import QFileDialog
+
+    app = get_app()
+    app.setQuitOnLastWindowClosed(True)
     fname = QFileDialog.getOpenFileName(
         None, "Select a file...", dirname, filter="All files (*)"
     )
@@ -81,9 +73,10 @@ def select_type(
         items = ["monitorTrend", "monitorWave", "taphTrend", "telVet"]
     if question is None:
         question = "choose kind of file"
-    if "app" not in dir():
-        app = QApplication([])
-        app.setQuitOnLastWindowClosed(True)
+    from PyQt5.QtWidgets import QInputDialog, QWidget
+
+    app = get_app()
+    app.setQuitOnLastWindowClosed(True)
     widg = QWidget()
     kind, ok_pressed = QInputDialog.getItem(widg, "select", question, items, num, False)
     if ok_pressed and kind:
@@ -127,6 +120,6 @@ def swap_ip(df: pd.DataFrame) -> pd.DataFrame:
 if __name__ == "__main__":
     import anesplot.config.load_recordrc
 
-    paths = anesplot.config.load_recordrc.paths
+    paths = anesplot.config.load_recordrc.build_paths()
     FILENAME = choosefile_gui(paths["data"])
     logging.warning(os.path.basename(FILENAME))
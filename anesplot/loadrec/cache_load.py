@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Created on Sun Oct 18 09:12:40 2026
+
+@author: cdesbois
+
+binary cache for the loaded recordings:
+    - the parsed dataframes are stored as one '.npy' file per column
+      (+ a 'manifest.json' that describes the columns and the index)
+    - no pickle : the text columns are stored as fixed width unicode (+ a NaN
+      mask), everything is loaded with allow_pickle=False (error -> cache miss)
+    - an entry is keyed by the source (full) path, mtime, size and loader version
+    - the cache is located next to the source file ('.anesplot_cache' folder)
+      or in paths['cache'] if defined in the configuration file
+
+typical use (done inside the loaders)::
+
+    frames = load_from_cache(filename, "monitor_trend")
+    if frames is None:
+        datadf = ...  # parse the csv file
+        save_to_cache(filename, "monitor_trend", [datadf])
+
+    invalidate_cache(filename)  # remove the cached entries of a record
+
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from anesplot.config.load_recordrc import build_paths
+
+CACHE_DIRNAME = ".anesplot_cache"
+
+# increment the version when the output of a loader is changed
+LOADER_VERSIONS = {
+    "monitor_trend": 3,
+    "monitor_wave": 1,
+    "monitor_wave_store": 1,
+    "taph_trend": 2,
+}
+
+
+def get_cache_dir(filename: str) -> str:
+    """
+    Return the cache directory to use for a record.
+
+    Parameters
+    ----------
+    filename : str
+        the record (full) name.
+
+    Returns
+    -------
+    str
+        paths['cache'] if defined, else a '.anesplot_cache' folder
+        located next to the record.
+    """
+    cache_dir = build_paths().get("cache")
+    if cache_dir:
+        return os.path.expanduser(cache_dir)
+    return os.path.join(os.path.dirname(os.path.abspath(filename)), CACHE_DIRNAME)
+
+
+def get_entry_dir(filename: str, loader: str) -> str:
+    """Return the directory of the cached entry (one per record and loader)."""
+    fullname = os.path.abspath(filename)
+    hashed = hashlib.sha1(fullname.encode("utf-8")).hexdigest()[:10]
+    record_dir = "_".join([os.path.basename(fullname), hashed])
+    return os.path.join(get_cache_dir(fullname), record_dir, loader)
+
+
+def build_cache_key(filename: str, loader: str) -> dict[str, Any]:
+    """
+    Build the key that identify a parsed record.
+
+    Parameters
+    ----------
+    filename : str
+        the record (full) name.
+    loader : str
+        the loader name (in LOADER_VERSIONS).
+
+    Returns
+    -------
+    dict
+        {path, mtime, size, loader, version}.
+    """
+    stat = os.stat(filename)
+    return {
+        "path": os.path.abspath(filename),
+        "mtime": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "loader": loader,
+        "version": LOADER_VERSIONS.get(loader, 0),
+    }
+
+
+def _save_values(values: Any, basename: str) -> bool:
+    """
+    Save a column or an index as .npy files (no pickle).
+
+    The text values are stored as fixed width unicode with a NaN mask
+    ('<basename>_na.npy'), the other objects can't be cached.
+
+    Returns
+    -------
+    bool
+        True if the values were stored as text.
+    """
+    array = np.asarray(values)
+    if array.dtype.kind in "biufcmM":
+        np.save(basename + ".npy", array, allow_pickle=False)
+        return False
+    ser = pd.Series(np.asarray(values, dtype=object))
+    isna = ser.isna().to_numpy()
+    if not ser[~isna].map(lambda value: isinstance(value, str)).all():
+        raise TypeError(f"non text objects in {os.path.basename(basename)}")
+    np.save(basename + ".npy", ser.fillna("").to_numpy(dtype=str), allow_pickle=False)
+    np.save(basename + "_na.npy", isna, allow_pickle=False)
+    return True
+
+
+def _load_values(basename: str, text: bool) -> np.ndarray:
+    """Load the values saved by _save_values (NaN restored for the text)."""
+    values = np.load(basename + ".npy", allow_pickle=False)
+    if not text:
+        return values
+    isna = np.load(basename + "_na.npy", allow_pickle=False)
+    values = values.astype(object)
+    values[isna] = np.nan
+    return values
+
+
+def _save_frame(datadf: pd.DataFrame, dirname: str) -> dict[str, Any]:
+    """Save a dataframe as .npy columns, return its description."""
+    os.makedirs(dirname, exist_ok=True)
+    columns = []
+    for i, col in enumerate(datadf.columns):
+        ser = datadf.iloc[:, i]
+        text = _save_values(ser.to_numpy(), os.path.join(dirname, f"col_{i}"))
+        columns.append({"name": col, "dtype": str(ser.dtype), "text": text})
+        if isinstance(ser.dtype, pd.CategoricalDtype):
+            categories = ser.cat.categories.tolist()
+            if not all(isinstance(_, str) for _ in categories):
+                raise TypeError(f"non text categories in {col}")
+            columns[-1]["categories"] = categories
+    index = datadf.index
+    if isinstance(index, pd.RangeIndex):
+        index_desc = {"range": [index.start, index.stop, index.step]}
+    else:
+        text = _save_values(index.to_numpy(), os.path.join(dirname, "index"))
+        index_desc = {"name": index.name, "dtype": str(index.dtype), "text": text}
+    return {"columns": columns, "index": index_desc}
+
+
+def _load_frame(desc: dict[str, Any], dirname: str) -> pd.DataFrame:
+    """Rebuild a dataframe from the .npy columns."""
+    index_desc = desc["index"]
+    if "range" in index_desc:
+        index = pd.RangeIndex(*index_desc["range"])
+    else:
+        values = _load_values(os.path.join(dirname, "index"), index_desc["text"])
+        index = pd.Index(values, name=index_desc["name"])
+        if str(index.dtype) != index_desc["dtype"]:
+            index = index.astype(index_desc["dtype"])
+    data = {}
+    for i, col in enumerate(desc["columns"]):
+        values = _load_values(os.path.join(dirname, f"col_{i}"), col["text"])
+        ser = pd.Series(values, index=index, copy=False)
+        if "categories" in col:
+            ser = ser.astype(pd.CategoricalDtype(col["categories"]))
+        elif str(ser.dtype) != col["dtype"]:
+            ser = ser.astype(col["dtype"])
+        data[i] = ser
+    datadf = pd.DataFrame(data, index=index)
+    datadf.columns = pd.Index([col["name"] for col in desc["columns"]])
+    return datadf
+
+
+def save_to_cache(filename: str, loader: str, frames: list[pd.DataFrame]) -> bool:
+    """
+    Store the parsed dataframes of a record.
+
+    Parameters
+    ----------
+    filename : str
+        the record (full) name.
+    loader : str
+        the loader name (in LOADER_VERSIONS).
+    frames : list[pd.DataFrame]
+        the loader output.
+
+    Returns
+    -------
+    bool
+        True if the entry was written.
+    """
+    entry_dir = get_entry_dir(filename, loader)
+    tmp_dir = entry_dir + ".tmp"
+    try:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        descs = [
+            _save_frame(frame, os.path.join(tmp_dir, f"frame_{i}"))
+            for i, frame in enumerate(frames)
+        ]
+        manifest = {"key": build_cache_key(filename, loader), "frames": descs}
+        with open(
+            os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8"
+        ) as file:
+            json.dump(manifest, file, default=str)
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.replace(tmp_dir, entry_dir)
+    except (OSError, TypeError, ValueError) as error:
+        logging.warning(f"unable to cache {os.path.basename(filename)} ({error})")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return False
+    logging.info(f"cached {os.path.basename(filename)} ({loader})")
+    return True
+
+
+def load_from_cache(filename: str, loader: str) -> Optional[list[pd.DataFrame]]:
+    """
+    Return the cached dataframes of a record (None if absent or outdated).
+
+    Parameters
+    ----------
+    filename : str
+        the record (full) name.
+    loader : str
+        the loader name (in LOADER_VERSIONS).
+
+    Returns
+    -------
+    list[pd.DataFrame] or None
+        the loader output.
+    """
+    entry_dir = get_entry_dir(filename, loader)
+    manifest_name = os.path.join(entry_dir, "manifest.json")
+    if not os.path.isfile(manifest_name):
+        return None
+    try:
+        with open(manifest_name, encoding="utf-8") as file:
+            manifest = json.load(file)
+        if manifest["key"] != build_cache_key(filename, loader):
+            logging.info(f"outdated cache for {os.path.basename(filename)}")
+            return None
+        frames = [
+            _load_frame(desc, os.path.join(entry_dir, f"frame_{i}"))
+            for i, desc in enumerate(manifest["frames"])
+        ]
+    except (OSError, KeyError, TypeError, ValueError, EOFError) as error:
+        # eg a pickled (object) array -> not loaded, cache miss
+        logging.warning(f"unable to read the cache ({error})")
+        return None
+    logging.info(f"loaded {os.path.basename(filename)} from cache ({loader})")
+    return frames
+
+
+def invalidate_cache(filename: str, loader: Optional[str] = None) -> None:
+    """
+    Remove the cached entries of a record.
+
+    Parameters
+    ----------
+    filename : str
+        the record (full) name.
+    loader : str, optional (default is None -> all loaders)
+        the loader name (in LOADER_VERSIONS).
+    """
+    entry_dir = get_entry_dir(filename, loader or "")
+    if loader is None:
+        entry_dir = os.path.dirname(entry_dir)
+    if os.path.isdir(entry_dir):
+        shutil.rmtree(entry_dir)
+        logging.info(f"removed cache for {os.path.basename(filename)}")
@@ -7,6 +7,8 @@ constants to use in the loading process
 @author: cdesbois
 """
 
+import pandas as pd
+
 mon_corr_title = {
     "AA  LB": "aaLabel",
     "AA_Insp": "aaInsp",
@@ -118,3 +120,48 @@ monwave_corr_title = {
 }
 
 ctes_load = mon_corr_title | taph_corr_title | monwave_corr_title
+
+
+# anesthetic agent ('AA  LB' monitor codes)
+anesth_code = {0: "0", 1: "", 2: "", 4: "iso", 6: "sevo"}
+
+# compact dtypes of the loaded trends (loaded names):
+# - the numerical columns are float32 (physiological values, etimemin)
+#   except the ones listed here
+# - category for the anesthetic agent, pandas string for the taphonius events
+default_float = "float32"
+mon_trend_schema = {
+    "etimesec": "float64",
+    "aaLabel": pd.CategoricalDtype(sorted(set(anesth_code.values()))),
+}
+taph_trend_schema = {
+    "etimesec": "float64",
+    "events": "string",
+}
+
+# read_csv dtypes (raw names), the remaining columns are cast after the parsing
+mon_trend_read_dtypes = {
+    raw: default_float for raw, name in mon_corr_title.items() if name != "dtime"
+}
+taph_trend_read_dtypes = {
+    raw: default_float
+    for raw in taph_corr_title
+    if raw not in ["Date", "Time", "Events"]
+}
+taph_trend_read_dtypes["Events"] = "string"
+
+# csv layouts : line numbers of the column names and of the first data row,
+# beginning of a data row (the taphonius messages can span several lines)
+text_layouts = {
+    "monitor_trend": {
+        "names_line": 12,
+        "data_line": 14,
+        "row_start": r"\d{1,2}:\d{2}:\d{2},",
+    },
+    "monitor_wave": {"names_line": 13, "data_line": 15, "row_start": None},
+    "taph_trend": {
+        "names_line": 1,
+        "data_line": 3,
+        "row_start": r"\d{1,2}/\d{1,2}/\d{4},",
+    },
+}
@@ -8,17 +8,27 @@ import logging
 import os
 
 # import sys
-from typing import Optional
+from typing import Any, Optional
 
-from PyQt5.QtWidgets import QApplication, QFileDialog, QInputDialog  # , QWidget
+# NB Qt is imported (and the QApplication created) only when a dialog is shown
 
-app = QApplication.instance()
-logging.info(f"dialogs.py : {__name__=}")
-if app is None:
-    logging.info("No QApplication instance - - - - - - - - - - - - - > creating one")
-    app = QApplication([])
-else:
-    logging.warning(f"QApplication instance already exists: {QApplication.instance()}")
+
+def get_app() -> Any:
+    """
+    Return the QApplication instance (created at the first call).
+
+    Returns
+    -------
+    QApplication
+        the running application.
+    """
+    from PyQt5.QtWidgets import QApplication
+
+    app = QApplication.instance()
+    if app is None:
+        logging.info("No QApplication instance - - - - - - - - - - - - - > creating one")
+        app = QApplication([])
+    return app
 
 
 def choose_file(
@@ -45,6 +55,9 @@ def choose_file(
         dirname = os.path.join(os.path.expanduser("~"))
         # NB  a fake name has to bee added for the procedure to work on macos
     # dirname = os.path.join(dirname, "fakename.csv")
+    from PyQt5.QtWidgets import QFileDialog
+
+    get_app()
     if filtre is None:
         filtre = "CSV Files (*.csv);;All Files (*)"
         # filtre = ''
@@ -88,6 +101,9 @@ def choose_directory(
         dirname = os.path.join(os.path.expanduser("~"))
         # NB  a fake name has to bee added for the procedure to work on macos
     # dirname = os.path.join(dirname, "fakename.csv")
+    from PyQt5.QtWidgets import QFileDialog
+
+    get_app()
     options = QFileDialog.Options()
     if see_question:
         options |= QFileDialog.DontUseNativeDialog
@@ -123,6 +139,9 @@ def choose_in_alist(
         the selected item.
 
     """
+    from PyQt5.QtWidgets import QInputDialog
+
+    get_app()
     if message is None:
         message = "select the item to use"
     # widg = QWidget()
@@ -136,6 +155,9 @@ def choose_in_alist(
 
 def get_name() -> str:
     """Test."""
+    from PyQt5.QtWidgets import QFileDialog
+
+    get_app()
     return str(QFileDialog.getOpenFileName())
 
 
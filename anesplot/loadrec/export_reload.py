@@ -58,10 +58,15 @@ def export_data_to_hdf(
                 dataframe[col] = dataframe[col].astype(str)
         return dataframe
 
+    def to_fixed_format(dataframe: pd.DataFrame) -> pd.DataFrame:
+        """Category and string columns -> object (hdf fixed format)."""
+        cols = dataframe.select_dtypes(include=["category", "string"]).columns
+        return dataframe.astype({col: object for col in cols})
+
     exported = []
     # monitor trends
     if mtrend:
-        mtrend.data.to_hdf(savename, key="mtrends_data")
+        to_fixed_format(mtrend.data).to_hdf(savename, key="mtrends_data")
         dicodf = pd.DataFrame.from_dict({k: [v] for k, v in mtrend.header.items()})
         fix_dtypes(dicodf).to_hdf(savename, key="mtrends_header")
         dicodf = pd.DataFrame.from_dict({k: [v] for k, v in mtrend.param.items()})
@@ -71,7 +76,7 @@ def export_data_to_hdf(
         exported.append("monitor_trend")
     # taph trends
     if ttrend:
-        ttrend.data.to_hdf(savename, key="ttrends_data")
+        to_fixed_format(ttrend.data).to_hdf(savename, key="ttrends_data")
         dicodf = pd.DataFrame.from_dict({k: [v] for k, v in ttrend.header.items()})
         fix_dtypes(dicodf).to_hdf(savename, key="ttrends_header")
         dicodf = pd.DataFrame.from_dict({k: [v] for k, v in ttrend.param.items()})
@@ -81,7 +86,7 @@ def export_data_to_hdf(
         exported.append("taph_trend")
     # waves
     if mwave:
-        mwave.data.to_hdf(savename, key="mwaves_data")
+        to_fixed_format(mwave.data).to_hdf(savename, key="mwaves_data")
         dicodf = pd.DataFrame.from_dict({k: [v] for k, v in mwave.header.items()})
         fix_dtypes(dicodf).to_hdf(savename, key="mwaves_header")
         dicodf = pd.DataFrame.from_dict({k: [v] for k, v in mwave.param.items()})
@@ -147,7 +152,7 @@ def build_obj_from_hdf(savedname: str) -> tuple[Any, Any, Any]:
             new_ttrends.header = df_to_dico_with_none(store.get("ttrends_header").T)
             new_ttrends.param = df_to_dico_with_none(store.get("ttrends_param").T)
             new_ttrends.filename = new_ttrends.param["filename"]
-            new_ttrends.extract_events()
+            # (the events are extracted on first access)
             messages.append(f"{'-'*10} loaded ttrends from hdf {'-'*10}")
 
         new_mwaves = MonitorWave(filename="", load=False)
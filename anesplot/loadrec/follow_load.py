@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Created on Sun Oct 18 22:52:18 2026
+
+@author: cdesbois
+
+incremental loading of the trend files that are still being written
+(monitor 'M*.csv' and taphonius 'SD*.csv' during a live session):
+    - the byte offset of the first unparsed row, the number of parsed rows,
+      the last datetime and the last agent code are kept
+    - only the complete appended rows are parsed (a taphonius message
+      can span several lines), with the loaders processing
+      (remove_txt_messages, agent names, units, time normalisation)
+    - the cost of a refresh depends on the appended rows, not on the file size
+
+typical use (cf _SlowWave.follow, refresh)::
+
+    follower = TrendFollower(filename)
+    datadf, anotdf = follower.read_new()  # all the present rows
+    ...
+    newdf, newanotdf = follower.read_new()  # the appended rows
+    datadf = follower.append(datadf, newdf)
+
+"""
+
+import io
+import logging
+import os
+import re
+from typing import Any, Optional
+
+import pandas as pd
+
+from anesplot.loadrec import ctes_load, time_norm
+from anesplot.loadrec import loadmonitor_trendrecord as lmt
+from anesplot.loadrec import loadtaph_trendrecord as ltt
+
+
+def record_kind(filename: str) -> str:
+    """Return the kind of trend record ('monitor_trend' or 'taph_trend')."""
+    if os.path.basename(filename).startswith("SD"):
+        return "taph_trend"
+    return "monitor_trend"
+
+
+class TrendFollower:
+    """
+    Tail-follow reading of a trend file.
+
+    Attributes
+    ----------
+    filename : str
+        the trend file fullname.
+    kind : str
+        'monitor_trend' or 'taph_trend'.
+    offset : int
+        byte offset of the first unparsed row.
+    nrows : int
+        number of data rows already parsed (-> index of the new rows).
+    last_dtime : pd.Timestamp
+        the datetime of the last parsed row (None if nothing parsed).
+    origin : pd.Timestamp
+        the datetime of the first row (etimesec origin).
+    """
+
+    def __init__(self, filename: str, kind: Optional[str] = None) -> None:
+        self.filename = filename
+        self.kind = kind or record_kind(filename)
+        layout = ctes_load.text_layouts[self.kind]
+        self._row_start = re.compile(
+            ("\n" + layout["row_start"]).encode("ascii"), re.MULTILINE
+        )
+        with open(filename, "rb") as file:
+            lines = [file.readline() for _ in range(layout["data_line"])]
+            self.offset = file.tell()
+        self.names = [
+            str(_)
+            for _ in pd.read_csv(io.BytesIO(lines[layout["names_line"]]), nrows=0)
+        ]
+        self.nrows = 0
+        self.last_dtime: Optional[pd.Timestamp] = None
+        self.origin: Optional[pd.Timestamp] = None
+        self._last_aa: Optional[float] = None
+        # loaded names in the file order (cf append)
+        corr_title = (
+            ctes_load.taph_corr_title
+            if self.kind == "taph_trend"
+            else ctes_load.mon_corr_title
+        )
+        self.columns = ["dtime"] + [corr_title.get(_, _) for _ in self.names]
+        self.columns += ["etimesec", "etimemin"]
+
+    def __repr__(self) -> str:
+        return (
+            f"TrendFollower({os.path.basename(self.filename)!r}, {self.offset=},"
+            f" {self.nrows=})"
+        )
+
+    def _read_complete_rows(self) -> bytes:
+        """Return the appended complete rows, move the offset after them."""
+        with open(self.filename, "rb") as file:
+            file.seek(self.offset)
+            block = file.read()
+        # complete lines
+        block = block[: block.rfind(b"\n") + 1]
+        if self.kind == "taph_trend":
+            # a message can be still open -> stop before its row
+            while block.count(b'"') % 2:
+                starts = list(self._row_start.finditer(block))
+                if not starts:
+                    return b""
+                block = block[: starts[-1].start() + 1]
+        self.offset += len(block)
+        return block
+
+    def _parse(self, block: bytes, **kwargs: Any) -> pd.DataFrame:
+        """Parse the rows (utf8 else ISO-8859-1)."""
+        read_kwargs = dict(header=None, names=self.names, index_col=False, **kwargs)
+        try:
+            return pd.read_csv(io.BytesIO(block), **read_kwargs)
+        except UnicodeDecodeError:
+            return pd.read_csv(io.BytesIO(block), encoding="ISO-8859-1", **read_kwargs)
+
+    def read_new(self) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Parse the rows appended since the previous call.
+
+        Returns
+        -------
+        datadf : pd.DataFrame
+            the new rows (processed as loadmonitor_trenddata or
+            loadtaph_trenddata, index = row number in the file).
+        anotdf : pd.DataFrame
+            the new annotations (monitor trends, cf remove_txt_messages).
+        """
+        block = self._read_complete_rows()
+        if not block.strip():
+            return pd.DataFrame(), pd.DataFrame(columns=["dtime", "text"])
+        if self.kind == "taph_trend":
+            try:
+                rawdf = self._parse(block, dtype=ctes_load.taph_trend_read_dtypes)
+            except ValueError:
+                rawdf = self._parse(block)
+        else:
+            try:
+                rawdf = self._parse(block, dtype=ctes_load.mon_trend_read_dtypes)
+            except ValueError:
+                # annotations in the numerical columns (cf remove_txt_messages)
+                rawdf = self._parse(block)
+        # the empty columns are dropped in the first rows only (cf append)
+        first = self.nrows == 0
+        rawdf.index = pd.RangeIndex(self.nrows, self.nrows + len(rawdf))
+        self.nrows += len(rawdf)
+        if self.kind == "taph_trend":
+            datadf, anotdf = self._process_taph(rawdf, first)
+        else:
+            datadf, anotdf = self._process_monitor(rawdf, first)
+        if datadf.empty:
+            return datadf, anotdf
+        if self.origin is None:
+            self.origin = datadf.dtime.iloc[0]
+        etimedf = time_norm.elapsed_times(datadf.dtime, origin=self.origin)
+        for col in etimedf.columns:
+            datadf[col] = etimedf[col]
+        self.last_dtime = datadf.dtime.iloc[-1]
+        schema = (
+            ctes_load.taph_trend_schema
+            if self.kind == "taph_trend"
+            else ctes_load.mon_trend_schema
+        )
+        logging.info(f"{self} : {len(datadf)} new rows")
+        return lmt.apply_dtype_schema(datadf, schema), anotdf
+
+    def _fix_times(self, dtime: pd.Series) -> pd.Series:
+        """Add the day rollovers (since the previous rows)."""
+        if self.last_dtime is None:
+            return time_norm.fix_day_rollover(dtime)
+        previous = pd.Series([self.last_dtime])
+        fixed = time_norm.fix_day_rollover(pd.concat([previous, dtime]))
+        return pd.Series(fixed.iloc[1:].to_numpy(), index=dtime.index, name="dtime")
+
+    def _process_monitor(
+        self, rawdf: pd.DataFrame, first: bool
+    ) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """Process the monitor rows (cf loadmonitor_trenddata)."""
+        datadf = lmt.remove_empty_rows(rawdf)
+        datadf = datadf.drop([_ for _ in datadf.columns if _.startswith("~")], axis=1)
+        datadf, anotdf = lmt.remove_txt_messages(datadf)
+        datadf = datadf.rename(columns=ctes_load.mon_corr_title)
+        datadf = datadf.dropna(axis=0, how="all")
+        if first:
+            datadf = datadf.dropna(axis=1, how="all")
+        if datadf.empty:
+            return datadf, anotdf
+        previous_aa = self._last_aa
+        if "aaLabel" in datadf.columns:
+            codes = datadf.aaLabel.dropna()
+            if not codes.empty:
+                self._last_aa = codes.iloc[-1]
+        datadf = lmt.convert_trend_values(datadf, previous_aa)
+        if self.last_dtime is None:
+            day = os.path.basename(self.filename).strip("M").split("-")[0]
+        else:
+            day = self.last_dtime.strftime("%Y_%m_%d")
+        datadf.dtime = self._fix_times(time_norm.clock_to_datetime(datadf.dtime, day))
+        return datadf, anotdf
+
+    def _process_taph(
+        self, rawdf: pd.DataFrame, first: bool
+    ) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """Process the taphonius rows (cf loadtaph_trenddata)."""
+        datadf = rawdf.rename(columns=ctes_load.taph_corr_title)
+        datadf = datadf.dropna(axis=0, how="all")
+        if first:
+            datadf = datadf.dropna(axis=1, how="all")
+        anotdf = pd.DataFrame(columns=["dtime", "text"])
+        if datadf.empty:
+            return datadf, anotdf
+        ser = pd.to_datetime(datadf.Date + ";" + datadf.Time, dayfirst=True)
+        datadf.insert(0, "dtime", ser)
+        datadf = datadf.drop(["Date", "Time"], axis=1)
+        datadf = ltt.convert_taph_values(datadf)
+        return datadf, anotdf
+
+    def append(self, datadf: pd.DataFrame, newdf: pd.DataFrame) -> pd.DataFrame:
+        """
+        Append the new rows to the data.
+
+        Parameters
+        ----------
+        datadf : pd.DataFrame
+            the data (previous read_new results).
+        newdf : pd.DataFrame
+            the new rows.
+
+        Returns
+        -------
+        pd.DataFrame
+            the concatenated data (a new trace -> a new column at its
+            file location, the previous rows are NaN).
+        """
+        if datadf.empty:
+            return newdf
+        if newdf.empty:
+            return datadf
+        # the traces that are still not recorded
+        empty = [
+            col
+            for col in newdf.columns
+            if col not in datadf.columns and newdf[col].isna().all()
+        ]
+        merged = pd.concat([datadf, newdf.drop(columns=empty)])
+        if list(merged.columns) != list(datadf.columns):
+            merged = merged[[_ for _ in self.columns if _ in merged.columns]]
+        changed = [
+            col
+            for col in merged.columns
+            if col in datadf.columns and merged[col].dtype != datadf[col].dtype
+        ]
+        if changed:
+            merged = merged.astype({col: datadf[col].dtype for col in changed})
+        return merged
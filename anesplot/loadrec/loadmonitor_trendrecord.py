@@ -13,24 +13,13 @@ import logging
 import os
 
 # import sys
-from datetime import timedelta
 from typing import Any, Optional
 
 import numpy as np
 import pandas as pd
 
-# import numpy as np
-from PyQt5.QtWidgets import QApplication, QFileDialog
-
-from anesplot.loadrec import ctes_load
-
-app = QApplication.instance()
-logging.info(f"loadmonitor_trendrecord.py : {__name__=}")
-if app is None:
-    logging.info("N0 QApplication instance - - - - - - - - - - - - - > creating one")
-    app = QApplication([])
-else:
-    logging.warning(f"QApplication instance already exists: {QApplication.instance()}")
+from anesplot.loadrec import cache_load, ctes_load, time_norm
+from anesplot.loadrec.dialogs import get_app
 
 
 def choosefile_gui(dirname: Optional[str] = None) -> str:
@@ -55,6 +44,9 @@ def choosefile_gui(dirname: Optional[str] = None) -> str:
         )
     # bug in macos : add fake name
     # dirname = os.path.join(dirname, "fakename.csv")
+    from PyQt5.QtWidgets import QFileDialog
+
+    get_app()
     fname = QFileDialog.getOpenFileName(
         None, "Select a file...", dirname, filter="All files (*)"
     )
@@ -133,7 +125,7 @@ def loadmonitor_trendheader(filename: str) -> dict["str", Any]:
 
 def remove_txt_messages(recorddf: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
     """
-    Extract and remove the annotion in a monitor record.
+    Extract and remove the annotations in a monitor record.
 
     Parameters
     ----------
@@ -143,45 +135,133 @@ def remove_txt_messages(recorddf: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFr
     Returns
     -------
     recorddf : pd.DataFrame
-        same data but with anoration replace by np.Nan.
-
+        same data but with the annotation rows replaced by np.nan.
+    messagesdf : pd.DataFrame
+        the annotations (index = row in the record, columns = ['dtime', 'text']).
     """
-    to_fix = []
-    messagesdf = pd.DataFrame()
-    for col in recorddf.columns:
-        if recorddf[col].dtype != "float64":
-            if col != "Time":
-                to_fix.append(col)
-    if to_fix:
-        logging.warning("there are non numericals values:")
-        for line, ser in recorddf[to_fix].iterrows():
-            try:
-                pd.to_numeric(ser)
-            except ValueError:
-                message = recorddf.loc[line].dropna()
-                txt = " ".join([str(_) for _ in message.to_list()])
-                print(f"(replaced by NaN) -> {txt}")
-                messagesdf[line] = message
-                recorddf.loc[line] = np.nan
-        for col in to_fix:
-            recorddf[col] = pd.to_numeric(recorddf[col])
+    to_fix = [
+        col
+        for col in recorddf.columns
+        if col != "Time" and not pd.api.types.is_float_dtype(recorddf[col])
+    ]
+    messagesdf = pd.DataFrame(columns=["dtime", "text"])
+    if not to_fix:
+        return recorddf, messagesdf
+    logging.warning("there are non numericals values:")
+    # the not numerical values -> NaN created by the coercion
+    numericdf = recorddf[to_fix].apply(pd.to_numeric, errors="coerce")
+    istext = (numericdf.isna() & recorddf[to_fix].notna()).any(axis=1)
+    texts = (
+        recorddf.loc[istext]
+        .drop(columns="Time", errors="ignore")
+        .stack()
+        .astype(str)
+        .groupby(level=0)
+        .agg(" ".join)
+    )
+    messagesdf = pd.DataFrame(
+        {"dtime": recorddf.loc[istext, "Time"], "text": texts},
+        columns=messagesdf.columns,
+    )
+    for line in messagesdf.itertuples():
+        print(f"(replaced by NaN) -> {line.dtime} {line.text}")
+    recorddf[to_fix] = numericdf
+    recorddf.loc[istext] = np.nan
     return recorddf, messagesdf
 
 
+def apply_dtype_schema(datadf: pd.DataFrame, schema: dict[str, Any]) -> pd.DataFrame:
+    """
+    Cast the loaded data to the compact dtypes.
+
+    Parameters
+    ----------
+    datadf : pd.DataFrame
+        the loaded data.
+    schema : dict
+        the dtypes of the special columns (cf ctes_load.mon_trend_schema),
+        the other numerical columns -> ctes_load.default_float.
+
+    Returns
+    -------
+    pd.DataFrame
+        the data with the compact dtypes.
+    """
+    dtypes = {
+        col: ctes_load.default_float
+        for col in datadf.select_dtypes("number").columns
+    }
+    dtypes.update({col: dtype for col, dtype in schema.items() if col in datadf})
+    dtypes = {col: dtype for col, dtype in dtypes.items() if datadf[col].dtype != dtype}
+    return datadf.astype(dtypes) if dtypes else datadf
+
+
+def read_trend_csv(filename: str, **kwargs: Any) -> pd.DataFrame:
+    """Read a monitor trend csv file (ISO-8859-1 if not utf8)."""
+    try:
+        return pd.read_csv(filename, sep=",", skiprows=[13], header=12, **kwargs)
+    except UnicodeDecodeError:
+        return pd.read_csv(
+            filename,
+            sep=",",
+            skiprows=[13],
+            header=12,
+            encoding="ISO-8859-1",
+            **kwargs,
+        )
+
+
+def anesth_labels(codes: pd.Series, previous: Optional[float] = None) -> pd.Series:
+    """
+    Convert the anesthetic agent codes ('AA  LB') to names.
+
+    Parameters
+    ----------
+    codes : pd.Series
+        the recorded codes (NaN -> previous value).
+    previous : float, optional (default is None)
+        the code preceding the series (appended rows, cf follow_load).
+
+    Returns
+    -------
+    pd.Series
+        the agent names (cf ctes_load.anesth_code).
+    """
+    codes = codes.fillna(method="ffill")
+    if previous is not None:
+        codes = codes.fillna(previous)
+    # TODO fix the code for 1 and 2
+    codes = codes.fillna(0).astype(int)
+    return codes.map(ctes_load.anesth_code).fillna("")
+
+
+def convert_trend_values(
+    datadf: pd.DataFrame, previous_aa: Optional[float] = None
+) -> pd.DataFrame:
+    """Convert the agent codes to names and the CO2 from % to mmHg."""
+    if "aaLabel" in datadf.columns:
+        datadf.aaLabel = anesth_labels(datadf.aaLabel, previous_aa)
+        # aa = datadf.aaLabel.value_counts().index[0]
+
+    # CO2: from % to mmHg
+    try:
+        datadf[["co2exp", "co2insp"]] *= 760 / 100
+    except KeyError:
+        logging.warning("no capnographic recording")
+    return datadf
+
+
 def remove_empty_rows(df: pd.DataFrame) -> pd.DataFrame:
     """Remove the empty rows based on data columns."""
-    # find
-    duplicate = df.duplicated(subset=["Time"])
-    if duplicate.any():
-        logging.warning("duplicated time value exists")
-        logging.warning(df.loc[~duplicate])
-    # clean
+    # NB the duplicated time values are reported by time_norm.normalize_time
     datacols = [_ for _ in df.columns[2:] if not _.startswith("~")]
     emptyrows = df.index[df[datacols].isna().all(axis=1)]
     return df.drop(emptyrows)
 
 
-def loadmonitor_trenddata(filename: str) -> tuple[pd.DataFrame, pd.DataFrame]:
+def loadmonitor_trenddata(
+    filename: str, use_cache: bool = True
+) -> tuple[pd.DataFrame, pd.DataFrame]:
     """
     Load the monitor trend data.
 
@@ -189,6 +269,8 @@ def loadmonitor_trenddata(filename: str) -> tuple[pd.DataFrame, pd.DataFrame]:
     ----------
     filename : str
         full name of the datafile.
+    use_cache : bool, optional (default is True)
+        use (and fill) the binary cache of the parsed data (cf cache_load).
 
     Returns
     -------
@@ -205,13 +287,15 @@ def loadmonitor_trenddata(filename: str) -> tuple[pd.DataFrame, pd.DataFrame]:
         print(f"file not found : {filename}")
         return pd.DataFrame()
 
+    if use_cache:
+        frames = cache_load.load_from_cache(filename, "monitor_trend")
+        if frames is not None:
+            print(f"loaded {os.path.basename(filename)} (cache)")
+            datadf, anotdf = frames
+            return datadf, anotdf
     logging.info(f"{'.' * 10} loading trenddata {os.path.basename(filename)}")
     try:
-        datadf = pd.read_csv(filename, sep=",", skiprows=[13], header=12)
-    except UnicodeDecodeError:
-        datadf = pd.read_csv(
-            filename, sep=",", skiprows=[13], header=12, encoding="ISO-8859-1"
-        )
+        datadf = read_trend_csv(filename, dtype=ctes_load.mon_trend_read_dtypes)
     except pd.errors.EmptyDataError:
         logging.warning(f"{'!' * 10}  {os.path.basename(filename)} contains no data !")
         print(f"empty recording for {os.path.basename(filename)}")
@@ -220,6 +304,9 @@ def loadmonitor_trenddata(filename: str) -> tuple[pd.DataFrame, pd.DataFrame]:
         breakpoint()
         logging.warning(f"{'!' * 10}  {os.path.basename(filename)} is not a valid file")
         return pd.DataFrame(), pd.DataFrame()
+    except ValueError:
+        # annotations in the numerical columns (cf remove_txt_messages)
+        datadf = read_trend_csv(filename)
 
     datadf = pd.DataFrame(datadf)
     datadf = remove_empty_rows(datadf)
@@ -241,38 +328,13 @@ def loadmonitor_trenddata(filename: str) -> tuple[pd.DataFrame, pd.DataFrame]:
     datadf.dropna(axis=0, how="all", inplace=True)
     datadf.dropna(axis=1, how="all", inplace=True)
 
-    # TODO fix the code for 1 and 2
-    if "aaLabel" in datadf.columns:
-
-        anesth_code = {0: "0", 1: "", 2: "", 4: "iso", 6: "sevo"}
-        datadf.aaLabel = datadf.aaLabel.fillna(method="ffill")
-        datadf.aaLabel = datadf.aaLabel.fillna(0)
-        datadf.aaLabel = datadf.aaLabel.apply(lambda x: anesth_code.get(int(x), ""))
-        # aa = datadf.aaLabel.value_counts().index[0]
-
-    # CO2: from % to mmHg
-    try:
-        datadf[["co2exp", "co2insp"]] *= 760 / 100
-    except KeyError:
-        logging.warning("no capnographic recording")
+    datadf = convert_trend_values(datadf)
 
     day = os.path.basename(filename).strip("M").split("-")[0]
-    datadf.dtime = datadf.dtime.astype(str)
-    datadf.dtime = datadf.dtime.apply(lambda st: day + "-" + st)
-    datadf.dtime = pd.to_datetime(datadf.dtime, format="%Y_%m_%d-%H:%M:%S")
-    # overmidnight ? -> append a day after midnight
-    overmidnight = (datadf.dtime.iloc[-1] - datadf.dtime.iloc[0]).days
-    if overmidnight:
-        last_index = datadf.dtime[datadf.dtime == datadf.dtime.max()].index[-1]
-        dtime_ser = datadf.dtime.copy()
-        dtime_ser.loc[dtime_ser.index > last_index] = dtime_ser.loc[
-            dtime_ser.index > last_index
-        ].apply(lambda dt: dt + timedelta(days=1))
-        datadf.dtime = dtime_ser
-    # elapsed time(in seconds)
-    datadf["etimesec"] = datadf.dtime - datadf.dtime.iloc[0]
-    datadf.etimesec = datadf.etimesec.apply(lambda dt: dt.total_seconds())
-    datadf["etimemin"] = datadf.etimesec / 60
+    datadf.dtime = time_norm.clock_to_datetime(datadf.dtime, day)
+    # overmidnight -> one day added, elapsed time (etimesec, etimemin)
+    datadf = time_norm.normalize_time(datadf)
+    datadf = apply_dtype_schema(datadf, ctes_load.mon_trend_schema)
     # remove irrelevant measures
     # df.co2exp.loc[data.co2exp < 30] = np.nan
 
@@ -282,6 +344,8 @@ def loadmonitor_trenddata(filename: str) -> tuple[pd.DataFrame, pd.DataFrame]:
     # )
     # logging.info(f"{sampling=}, header_sampling={headerdico['Sampling Rate']}")
 
+    if use_cache:
+        cache_load.save_to_cache(filename, "monitor_trend", [datadf, anotdf])
     logging.info(f"{'-' * 20} loaded trenddata >")
     print(f"loaded {os.path.basename(filename)}")
     return datadf, anotdf
@@ -338,13 +402,15 @@ def concat_data(
     df1 = datadf1.copy()
     df2 = datadf2.copy()
 
-    delta_sec = (df2.iloc[0].dtime - df1.iloc[-1].dtime).total_seconds()
-    df2.etimesec += df1.iloc[-1].etimesec + delta_sec
-    df2.etimemin += df1.iloc[-1].etimemin + delta_sec / 60
+    # elapsed time continued from the end of the first recording
+    etimedf = time_norm.elapsed_times(
+        df2.dtime, origin=df1.dtime.iloc[-1], offset=df1.etimesec.iloc[-1]
+    )
+    df2[etimedf.columns] = etimedf.astype(df2[etimedf.columns].dtypes)
 
     # fill last line with nan (to avoid a continuous line in the plotting process)
     df1_newline = df1.iloc[-1].copy()
-    delta_break = timedelta(seconds=1 / sampling_freq)
+    delta_break = pd.Timedelta(seconds=1 / sampling_freq)
     df1_newline.dtime += delta_break
     cols = df1.columns.tolist()
     cols.remove("dtime")
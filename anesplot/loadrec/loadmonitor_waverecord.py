@@ -14,22 +14,18 @@ import logging
 import os
 
 # import sys
-from datetime import timedelta
-from typing import Any, Optional
+from typing import Any, Iterator, Optional
 
 import numpy as np
 import pandas as pd
-from PyQt5.QtWidgets import QApplication, QFileDialog
 
+from anesplot.loadrec import cache_load
 from anesplot.loadrec.ctes_load import ctes_load
+from anesplot.loadrec.dialogs import get_app
+from anesplot.loadrec.wave_store import WaveStore
 
-app = QApplication.instance()
-logging.info(f"loadmonitor_waverecord.py : {__name__=}")
-if app is None:
-    logging.info("N0 QApplication instance - - - - - - - - - - - - - > creating one")
-    app = QApplication([])
-else:
-    logging.warning(f"QApplication instance already exists: {QApplication.instance()}")
+SAMPLING_FR = 300  # sampling rate
+CO2_LAG = 480  # wco2 time lag (in points)
 
 
 def choosefile_gui(dirname: Optional[str] = None) -> str:
@@ -50,6 +46,9 @@ def choosefile_gui(dirname: Optional[str] = None) -> str:
         dirname = os.path.expanduser("~")
     # bug in macos : neccessity to add a fakename
     # dirname = os.path.join(dirname, "fakename.csv")
+    from PyQt5.QtWidgets import QFileDialog
+
+    get_app()
     fname = QFileDialog.getOpenFileName(
         None, "Select a file...", dirname, filter="All files (*)"
     )
@@ -113,37 +112,128 @@ def loadmonitor_waveheader(filename: Optional[str] = None) -> dict[str, Any]:
     return header
 
 
-def loadmonitor_wavedata(filename: str) -> pd.DataFrame:
+def wave_time_base(
+    anchors: pd.Series, date: str, first_point: int = 0
+) -> tuple[pd.Timestamp, pd.Timedelta]:
     """
-    Load the monitor wave csvDataFile.
+    Compute the time base (start time and sampling interval) of a wave record.
+
+    Only the non null 'HH:MM:SS' stamps are parsed (in one vectorized call)
+    and the over midnight rollover is detected on these anchors.
 
     Parameters
     ----------
-    filename : str, optional
-        full name of the file (default is None).
+    anchors : pd.Series
+        the non null time stamps ('HH:MM:SS' strings, index = point location).
+    date : str
+        the recording date (as written in the file header).
+    first_point : int, optional (default is 0)
+        the location of the first point of the record.
 
     Returns
     -------
-    pandas.Dataframe
-        the recorded wave data
+    start_time : pd.Timestamp
+        datetime of the first point (NaT if the first point is not stamped).
+    time_delta : pd.Timedelta
+        the mean interval between two points.
     """
-    logging.info(f"{'-' * 20} < loadmonitor_wavedata")
-    if not os.path.isfile(filename):
-        logging.warning(f"{'!' * 10} file not found")
-        logging.warning("f{filename}")
-        logging.warning(f"{'!' * 10} file not found")
-        return pd.DataFrame()
-    if filename:
-        logging.info(f"{'.' * 10} loading wavedata {os.path.basename(filename)}")
-    sampling_fr = 300  # sampling rate
+    if anchors.empty:
+        logging.warning("no time stamp in the wave recording")
+        return pd.NaT, pd.NaT
+    # the date is decoded once (same decoding as the full 'date-time' string)
+    day = pd.to_datetime(date + "-" + anchors.iloc[0]).normalize()
+    anchor_dt = day + pd.to_timedelta(anchors.values)
+    anchor_loc = anchors.index.values
+    # correct date time if over midnight -> check location of mini dtime value
+    min_time_iloc = anchor_loc[anchor_dt.argmin()]
+    if min_time_iloc > first_point:
+        logging.info("recording was performed during two days")
+        anchor_dt = anchor_dt + pd.to_timedelta(
+            np.where(anchor_loc >= min_time_iloc, 1, 0), unit="D"
+        )
+    # interpolate time values (fill the gaps)
+    time_delta = (anchor_dt[-1] - anchor_dt[0]) / (anchor_loc[-1] - anchor_loc[0] - 1)
+    if anchor_loc[0] != first_point:
+        # no time stamp on the first point
+        return pd.NaT, time_delta
+    return anchor_dt[0], time_delta
+
+
+def build_wave_dtime(time_ser: pd.Series, date: str) -> pd.Series:
+    """
+    Build an evenly spaced datetime series from the sparse wave time stamps.
+
+    Parameters
+    ----------
+    time_ser : pd.Series
+        the raw time column ('HH:MM:SS' strings, NaN between the stamps).
+    date : str
+        the recording date (as written in the file header).
+
+    Returns
+    -------
+    pd.Series
+        datetime of every point (same index as time_ser).
+    """
+    start_time, time_delta = wave_time_base(
+        time_ser.dropna(), date, first_point=time_ser.index.min()
+    )
+    return points_to_dtime(time_ser.index.values, start_time, time_delta)
+
+
+def points_to_dtime(
+    points: np.ndarray, start_time: pd.Timestamp, time_delta: pd.Timedelta
+) -> pd.Series:
+    """
+    Convert point locations to datetime (integer arithmetic).
+
+    Parameters
+    ----------
+    points : np.ndarray
+        the point locations.
+    start_time : pd.Timestamp
+        datetime of the point 0.
+    time_delta : pd.Timedelta
+        the interval between two points.
+
+    Returns
+    -------
+    pd.Series
+        the datetime values (index = points).
+    """
+    if pd.isna(start_time) or pd.isna(time_delta):
+        return pd.Series(pd.NaT, index=points, dtype="datetime64[ns]", name="dtime")
+    dtime_ns = start_time.value + points.astype("int64") * time_delta.value
+    return pd.Series(pd.to_datetime(dtime_ns), index=points, name="dtime")
+
+
+def read_wave_date(filename: str) -> str:
+    """Read the recording date in the wave file header."""
     try:
         date = pd.read_csv(filename, nrows=1, header=None).iloc[0][1]
     except UnicodeDecodeError:
         date = pd.read_csv(filename, nrows=1, header=None, encoding="iso-8859-1").iloc[
             0
         ][1]
-    datadf = pd.read_csv(
-        filename,
+    return str(date)
+
+
+def read_wave_csv(filename: str, **kwargs: Any) -> Any:
+    """
+    Read the data part of a monitor wave file.
+
+    Parameters
+    ----------
+    filename : str
+        full name of the file.
+    **kwargs : Any
+        extra pd.read_csv arguments (eg chunksize, usecols).
+
+    Returns
+    -------
+    pd.DataFrame (or a TextFileReader if chunksize is provided)
+    """
+    read_kwargs = dict(
         sep=",",
         skiprows=[14],
         header=13,
@@ -151,7 +241,61 @@ def loadmonitor_wavedata(filename: str) -> pd.DataFrame:
         encoding="iso-8859-1",
         usecols=[0, 2, 3, 4, 5, 6],
         dtype={"Unnamed: 0": str},
-    )  # , nrows=200000) #NB for development
+    )
+    read_kwargs.update(kwargs)
+    return pd.read_csv(filename, **read_kwargs)
+
+
+def scale_wavedata(datadf: pd.DataFrame) -> pd.DataFrame:
+    """Rescale the wave data (co2 -> mmHg, ekg -> mV, awp -> cmH2O)."""
+    if "wco2" in datadf.columns:
+        datadf["wco2"] *= 7.6  # CO2 % -> mmHg
+    datadf["wekg"] /= 100  # tranform EKG in mVolts
+    datadf["wawp"] *= 10  # mmH2O -> cmH2O
+    return datadf
+
+
+def clean_wavedata(datadf: pd.DataFrame) -> pd.DataFrame:
+    """Remove the irrelevant values (arterial and co2 traces)."""
+    # params = ['wekg', 'wap', 'wco2', 'wawp', 'wflow']
+    datadf.loc[datadf.wap < -100, "wap"] = np.nan
+    datadf.loc[datadf.wap > 200, "wap"] = np.nan
+    if "wco2" in datadf.columns:
+        datadf.loc[datadf.wco2 < 0, "wco2"] = 0
+    return datadf
+
+
+def loadmonitor_wavedata(filename: str, use_cache: bool = True) -> pd.DataFrame:
+    """
+    Load the monitor wave csvDataFile.
+
+    Parameters
+    ----------
+    filename : str, optional
+        full name of the file (default is None).
+    use_cache : bool, optional (default is True)
+        use (and fill) the binary cache of the parsed data (cf cache_load).
+
+    Returns
+    -------
+    pandas.Dataframe
+        the recorded wave data
+    """
+    logging.info(f"{'-' * 20} < loadmonitor_wavedata")
+    if not os.path.isfile(filename):
+        logging.warning(f"{'!' * 10} file not found")
+        logging.warning("f{filename}")
+        logging.warning(f"{'!' * 10} file not found")
+        return pd.DataFrame()
+    if use_cache:
+        frames = cache_load.load_from_cache(filename, "monitor_wave")
+        if frames is not None:
+            print(f"loaded {os.path.basename(filename)} (cache)")
+            return frames[0]
+    if filename:
+        logging.info(f"{'.' * 10} loading wavedata {os.path.basename(filename)}")
+    date = read_wave_date(filename)
+    datadf = read_wave_csv(filename)  # , nrows=200000) #NB for development
     datadf = pd.DataFrame(datadf)
     if datadf.empty:
         logging.warning(
@@ -163,33 +307,13 @@ def loadmonitor_wavedata(filename: str) -> pd.DataFrame:
     datadf = datadf.rename(columns=ctes_load)
     # scaling correction
     if "wco2" in datadf.columns:
-        datadf.wco2 = datadf.wco2.shift(-480)  # time lag correction
-        datadf["wco2"] *= 7.6  # CO2 % -> mmHg
-    datadf["wekg"] /= 100  # tranform EKG in mVolts
-    datadf["wawp"] *= 10  # mmH2O -> cmH2O
+        datadf.wco2 = datadf.wco2.shift(-CO2_LAG)  # time lag correction
+    datadf = scale_wavedata(datadf)
 
-    datadf.dtime = datadf.dtime.apply(
-        lambda x: pd.to_datetime(date + "-" + x) if not pd.isna(x) else x
-    )
-    # correct date time if over midnight -> check location of mini dtime value
-    min_time_iloc = datadf.loc[datadf.dtime == datadf.dtime.min()].index.values[0]
-    if min_time_iloc > datadf.index.min():
-        logging.info("recording was performed during two days")
-        datetime_series = datadf.dtime.copy()
-        datetime_series.iloc[min_time_iloc:] = datetime_series.iloc[
-            min_time_iloc:
-        ].apply(lambda x: x + timedelta(days=1) if not pd.isna(x) else x)
-        datadf.dtime = datetime_series
-    # interpolate time values (fill the gaps)
-    dt_df = datadf.dtime[datadf.dtime.notnull()]
-    time_delta = (dt_df.iloc[-1] - dt_df.iloc[0]) / (
-        dt_df.index[-1] - dt_df.index[0] - 1
-    )
-    start_time = datadf.dtime.iloc[0]
     datadf["point"] = datadf.index  # point location
-    datadf["dtime"] = start_time + datadf.index * time_delta
+    datadf["dtime"] = build_wave_dtime(datadf.dtime, date)
     # add a 'sec'
-    datadf["etimesec"] = datadf.index / sampling_fr
+    datadf["etimesec"] = datadf.index / SAMPLING_FR
     # TODO test and choose (method applied to monitor trend)
     # elapsed time(in seconds)
     # datadf["etimesec"] = datadf.dtime - datadf.dtime.iloc[0]
@@ -197,19 +321,130 @@ def loadmonitor_wavedata(filename: str) -> pd.DataFrame:
     datadf["etimemin"] = datadf.etimesec / 60
 
     # clean data
-    # params = ['wekg', 'wap', 'wco2', 'wawp', 'wflow']
-
-    # wData.wap.value_counts().sort_index()
-    datadf.loc[datadf.wap < -100, "wap"] = np.nan
-    datadf.loc[datadf.wap > 200, "wap"] = np.nan
-    if "wco2" in datadf.columns:
-        datadf.loc[datadf.wco2 < 0, "wco2"] = 0
+    datadf = clean_wavedata(datadf)
 
+    if use_cache:
+        cache_load.save_to_cache(filename, "monitor_wave", [datadf])
     logging.info(f"{'-' * 20} loaded wavedata >")
     print(f"loaded {os.path.basename(filename)}")
     return datadf
 
 
+def iter_wave_chunks(
+    filename: str, chunksize: int = 300 * 60 * 10
+) -> Iterator[pd.DataFrame]:
+    """
+    Load the monitor wave csvDataFile by chunks (bounded memory).
+
+    The chunks are scaled and cleaned as in loadmonitor_wavedata,
+    the index, 'point', 'dtime', 'etimesec' & 'etimemin' are continuous
+    and the wco2 time lag correction is carried over the chunk boundaries
+    (ie pd.concat(iter_wave_chunks(filename)) == loadmonitor_wavedata(filename)).
+
+    Parameters
+    ----------
+    filename : str
+        full name of the file.
+    chunksize : int, optional (default is 300 * 60 * 10 <-> 10 minutes)
+        number of points to read at once.
+
+    Yields
+    ------
+    pd.DataFrame
+        a chunk of the recorded wave data (index = point location).
+    """
+    logging.info(f"{'-' * 20} < iter_wave_chunks")
+    if not os.path.isfile(filename):
+        logging.warning(f"{'!' * 10} file not found : {filename}")
+        return
+    date = read_wave_date(filename)
+    # first pass : time stamps only -> time base
+    anchors = pd.concat(
+        [
+            chunk.iloc[:, 0].dropna()
+            for chunk in read_wave_csv(filename, usecols=[0], chunksize=chunksize)
+        ]
+    )
+    start_time, time_delta = wave_time_base(anchors, date)
+
+    def build_chunk(rawdf: pd.DataFrame, co2: Optional[np.ndarray]) -> pd.DataFrame:
+        """Build a chunk from the raw data and the (lag corrected) co2 values."""
+        datadf = rawdf.copy()
+        if co2 is not None:
+            datadf["wco2"] = co2
+        datadf = scale_wavedata(datadf)
+        datadf["point"] = datadf.index
+        datadf["dtime"] = points_to_dtime(
+            datadf.index.values, start_time, time_delta
+        ).values
+        datadf["etimesec"] = datadf.index / SAMPLING_FR
+        datadf["etimemin"] = datadf.etimesec / 60
+        return clean_wavedata(datadf)
+
+    # second pass : the data, delay the last CO2_LAG points for the wco2 lag
+    pending = pd.DataFrame()
+    for chunk in read_wave_csv(filename, chunksize=chunksize):
+        chunk = chunk.rename(columns=ctes_load)
+        pending = pd.concat([pending, chunk]) if not pending.empty else chunk
+        if "wco2" not in pending.columns:
+            yield build_chunk(pending, None)
+            pending = pd.DataFrame()
+            continue
+        ready = len(pending) - CO2_LAG
+        if ready <= 0:
+            continue
+        co2 = pending.wco2.values[CO2_LAG:]
+        yield build_chunk(pending.iloc[:ready], co2)
+        pending = pending.iloc[ready:]
+    if not pending.empty:
+        co2 = None
+        if "wco2" in pending.columns:
+            co2 = np.full(len(pending), np.nan)
+        yield build_chunk(pending, co2)
+    logging.info(f"{'-' * 20} iter_wave_chunks >")
+
+
+def loadmonitor_wavestore(
+    filename: str, chunksize: int = 300 * 60 * 10
+) -> Optional[WaveStore]:
+    """
+    Load the monitor wave csvDataFile as a memory mapped float32 store.
+
+    The store is written (chunk by chunk) in the cache directory at the first
+    call (cf cache_load.get_entry_dir) and reopened if the file is unchanged.
+
+    Parameters
+    ----------
+    filename : str
+        full name of the file.
+    chunksize : int, optional (default is 300 * 60 * 10 <-> 10 minutes)
+        number of points to parse at once when the store is built.
+
+    Returns
+    -------
+    WaveStore (or None if the file is not found)
+        the traces (float32) and the time base of the record.
+    """
+    if not os.path.isfile(filename):
+        logging.warning(f"{'!' * 10} file not found : {filename}")
+        return None
+    store_dir = cache_load.get_entry_dir(filename, "monitor_wave_store")
+    key = cache_load.build_cache_key(filename, "monitor_wave_store")
+    meta = WaveStore.read_meta(store_dir)
+    if meta is not None and meta.get("key") == key:
+        print(f"loaded {os.path.basename(filename)} (store)")
+        return WaveStore.open(store_dir)
+    logging.info(f"{'.' * 10} building the wave store {os.path.basename(filename)}")
+    store = WaveStore.write(
+        iter_wave_chunks(filename, chunksize=chunksize),
+        store_dir,
+        sampling_freq=SAMPLING_FR,
+        key=key,
+    )
+    print(f"loaded {os.path.basename(filename)} (store)")
+    return store
+
+
 def main_chooseload_monitorwave(
     dir_name: Optional[str] = None,
 ) -> tuple[pd.DataFrame, pd.DataFrame]:
@@ -259,7 +494,4 @@ def main_chooseload_monitorwave(
 
 # %%
 if __name__ == "__main__":
-    # app = QApplication.instance()
-    if QApplication.instance() is None:
-        app = QApplication([])
     main_chooseload_monitorwave()
@@ -28,27 +28,15 @@ from typing import Any, Optional
 import numpy as np
 import pandas as pd
 
-# import numpy as np
-from PyQt5.QtWidgets import QApplication
-
 from anesplot.config.load_recordrc import build_paths
-from anesplot.loadrec import ctes_load
+from anesplot.loadrec import cache_load, ctes_load, time_norm
 
 # from anesplot.record_main import build_paths
 from anesplot.loadrec.dialogs import choose_directory, choose_in_alist
+from anesplot.loadrec.loadmonitor_trendrecord import apply_dtype_schema
 
-if "paths" not in dir():
-    paths = build_paths()
 # paths["taph"] = "/Users/cdesbois/enva/clinique/recordings/anesthRecords/onTaphRecorded"
 
-app = QApplication.instance()
-logging.info(f"loadtaph_trendrecord.py : {__name__=}")
-if app is None:
-    logging.info("N0 QApplication instance - - - - - - - - - - - - - > creating one")
-    app = QApplication([])
-else:
-    logging.warning(f"QApplication instance already exists: {QApplication.instance()}")
-
 
 def get_taph_filelocation(paths_torecords: Optional[dict[str, str]] = None) -> str:
     """
@@ -216,7 +204,35 @@ def choose_taph_record(
     return filename
 
 
-def loadtaph_trenddata(filename: str) -> pd.DataFrame:
+def read_taph_csv(filename: str, **kwargs: Any) -> pd.DataFrame:
+    """Read a taphonius trend csv file."""
+    # row 0 -> groups
+    # row 1 -> header
+    # row 2 -> units
+    return pd.read_csv(
+        filename, sep=",", header=1, skiprows=[2], index_col=False, **kwargs
+    )
+
+
+def convert_taph_values(datadf: pd.DataFrame) -> pd.DataFrame:
+    """Fix the events dtype, convert the units (tv_spont in liters, CO2 in mmHg)."""
+    # (no message -> 'nan')
+    datadf.events = datadf.events.astype("string").fillna("nan")
+    # to remove the zero values :
+    # OK for histograms, but induce a bug in plotting
+    #    data.ip1m = data.ip1m.replace([0], [None])
+    #    data = data.replace([0], [None])
+    # CO2: from % to mmHg
+    if "tv_spont" in datadf.columns:
+        datadf["tv_spont"] /= 1000  # ml to liters
+    try:
+        datadf[["co2exp", "co2insp"]] *= 760 / 100
+    except KeyError:
+        logging.warning("no capnographic recording")
+    return datadf
+
+
+def loadtaph_trenddata(filename: str, use_cache: bool = True) -> pd.DataFrame:
     """
     Load the taphoniusData trends data.
 
@@ -224,6 +240,8 @@ def loadtaph_trenddata(filename: str) -> pd.DataFrame:
     ----------
     filename : str
         selected file (full) name.
+    use_cache : bool, optional (default is True)
+        use (and fill) the binary cache of the parsed data (cf cache_load).
 
     Returns
     -------
@@ -239,6 +257,11 @@ def loadtaph_trenddata(filename: str) -> pd.DataFrame:
         logging.warning(f"{filename}")
         logging.warning(f"{'!' * 10} datafile not found")
         return pd.DataFrame()
+    if use_cache:
+        frames = cache_load.load_from_cache(filename, "taph_trend")
+        if frames is not None:
+            logging.info(f"{'-' * 10} loaded taph_datafile from cache")
+            return frames[0]
     logging.info(f"{'-' * 10} loading taph_datafile {os.path.basename(filename)}")
 
     try:
@@ -246,13 +269,7 @@ def loadtaph_trenddata(filename: str) -> pd.DataFrame:
         # row 0 -> groups
         # row 1 -> header
         # row 2 -> units
-        datadf = pd.read_csv(
-            filename,
-            sep=",",
-            header=1,
-            skiprows=[2],
-            index_col=False,
-        )
+        datadf = read_taph_csv(filename, dtype=ctes_load.taph_trend_read_dtypes)
     except pd.errors.ParserError:
         logging.warning(f"corrupted file ({os.path.basename(filename)})")
         # generally related to pb with the auxillary controler
@@ -266,6 +283,9 @@ def loadtaph_trenddata(filename: str) -> pd.DataFrame:
         #     index_col=False,
         # )
         return pd.DataFrame()
+    except ValueError:
+        # not numerical values in a numerical column -> cast after the parsing
+        datadf = read_taph_csv(filename)
 
     corr_title = ctes_load.taph_corr_title
     datadf.rename(columns=corr_title, inplace=True)
@@ -283,22 +303,12 @@ def loadtaph_trenddata(filename: str) -> pd.DataFrame:
     datadf.insert(0, "dtime", ser)
     datadf = datadf.drop(["Date", "Time"], axis=1)
 
-    datadf["etimesec"] = datadf.dtime - datadf.dtime.iloc[0]
-    datadf.etimesec = datadf.etimesec.apply(lambda dt: dt.total_seconds())
-    datadf["etimemin"] = datadf.etimesec / 60
+    datadf = time_norm.normalize_time(datadf)
 
-    datadf.events = datadf.events.astype(str)
-    # to remove the zero values :
-    # OK for histograms, but induce a bug in plotting
-    #    data.ip1m = data.ip1m.replace([0], [None])
-    #    data = data.replace([0], [None])
-    # CO2: from % to mmHg
-    if "tv_spont" in datadf.columns:
-        datadf["tv_spont"] /= 1000  # ml to liters
-    try:
-        datadf[["co2exp", "co2insp"]] *= 760 / 100
-    except KeyError:
-        logging.warning("no capnographic recording")
+    datadf = convert_taph_values(datadf)
+    datadf = apply_dtype_schema(datadf, ctes_load.taph_trend_schema)
+    if use_cache:
+        cache_load.save_to_cache(filename, "taph_trend", [datadf])
     logging.info(f"{'-' * 20} loaded taph_datafile ({os.path.basename(filename)}) >")
     return datadf
 
@@ -470,4 +480,4 @@ def main_chooseload_taphtrend(
 
 # %%
 if __name__ == "__main__":
-    t_header_dico, t_data_df = main_chooseload_taphtrend(paths)
+    t_header_dico, t_data_df = main_chooseload_taphtrend(build_paths())
@@ -16,16 +16,10 @@ import os
 from typing import Optional
 
 import pandas as pd
-from PyQt5.QtWidgets import QApplication, QFileDialog
+
+from anesplot.loadrec.dialogs import get_app
 
 # %%
-app = QApplication.instance()
-logging.info(f"load_televet.py : {__name__=}")
-if app is None:
-    logging.info("N0 QApplication instance - - - - - - - - - - - - - > creating one")
-    app = QApplication([])
-else:
-    logging.warning(f"QApplication instance already exists: {QApplication.instance()}")
 
 
 def choosefile_gui(dirpath: Optional[str] = None) -> str:
@@ -46,6 +40,9 @@ def choosefile_gui(dirpath: Optional[str] = None) -> str:
         dirpath = os.path.expanduser("~")
     # bug in macos  necessity to add a filename
     dirpath = os.path.join(dirpath, "fakename.csv")
+    from PyQt5.QtWidgets import QFileDialog
+
+    get_app()
     fname = QFileDialog.getOpenFileName(
         None, "Select a file...", dirpath, filter="csv (*.csv)"
     )
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Created on Sun Oct 18 20:48:37 2026
+
+@author: cdesbois
+
+time normalisation of the trend recordings (timedelta64 arithmetic):
+    - 'hh:mm:ss' clock times + record day -> datetime
+    - over midnight records -> one day added after each rollover
+    - duplicated time stamps -> kept (warning) or dropped
+    - elapsed time (etimesec, etimemin) from the first point (or an origin)
+
+used by loadmonitor_trenddata, loadtaph_trenddata and concat_data::
+
+    datadf.dtime = time_norm.clock_to_datetime(datadf.dtime, "2021_4_16")
+    datadf = time_norm.normalize_time(datadf)
+
+"""
+
+import logging
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from anesplot.loadrec import ctes_load
+
+# a backward jump larger than this -> the clock went over midnight
+ROLLOVER_GAP = pd.Timedelta(hours=12)
+
+
+def clock_to_datetime(times: pd.Series, day: str, fmt: str = "%Y_%m_%d") -> pd.Series:
+    """
+    Combine the clock times with the record day.
+
+    Parameters
+    ----------
+    times : pd.Series
+        'hh:mm:ss' clock times.
+    day : str
+        the record day (eg '2021_4_16' from a monitor file name).
+    fmt : str, optional (default is "%Y_%m_%d")
+        the day format.
+
+    Returns
+    -------
+    pd.Series
+        the datetimes (same index, without any rollover correction).
+    """
+    origin = pd.to_datetime(day, format=fmt)
+    return origin + pd.to_timedelta(times.astype(str))
+
+
+def fix_day_rollover(dtime: pd.Series) -> pd.Series:
+    """
+    Add one day after each midnight crossing.
+
+    Parameters
+    ----------
+    dtime : pd.Series
+        the datetimes (built with the record day only).
+
+    Returns
+    -------
+    pd.Series
+        the monotonic datetimes.
+    """
+    rollovers = (dtime.diff() < -ROLLOVER_GAP).cumsum()
+    if not rollovers.any():
+        return dtime
+    return dtime + pd.to_timedelta(rollovers.to_numpy(), unit="D")
+
+
+def elapsed_times(
+    dtime: pd.Series, origin: Any = None, offset: float = 0.0
+) -> pd.DataFrame:
+    """
+    Compute the elapsed times.
+
+    Parameters
+    ----------
+    dtime : pd.Series
+        the datetimes.
+    origin : datetime like, optional (default is None -> the first datetime)
+        the time zero.
+    offset : float, optional (default is 0)
+        the elapsed time (sec) at the origin.
+
+    Returns
+    -------
+    pd.DataFrame
+        'etimesec' (float64) and 'etimemin' (ctes_load.default_float) columns.
+    """
+    values = dtime.to_numpy(dtype="datetime64[ns]")
+    origin = values[0] if origin is None else pd.Timestamp(origin).to_datetime64()
+    nanosec = (values - origin).astype("timedelta64[ns]").astype(np.int64)
+    etimesec = nanosec / 1e9 + offset
+    etimesec[np.isnat(values)] = np.nan
+    return pd.DataFrame(
+        {
+            "etimesec": etimesec,
+            "etimemin": (etimesec / 60).astype(ctes_load.default_float),
+        },
+        index=dtime.index,
+    )
+
+
+def normalize_time(
+    datadf: pd.DataFrame, duplicates: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    Fix the day rollovers and append the elapsed times.
+
+    Parameters
+    ----------
+    datadf : pd.DataFrame
+        the data, with a 'dtime' column.
+    duplicates : str, optional (default is None)
+        the duplicated datetimes : None -> kept (warning),
+        'first' or 'last' -> the other ones are dropped.
+
+    Returns
+    -------
+    pd.DataFrame
+        the data with fixed dtime and (appended or updated) 'etimesec',
+        'etimemin' columns.
+    """
+    datadf = datadf.copy()
+    datadf["dtime"] = fix_day_rollover(datadf.dtime)
+    duplicated = datadf.dtime.duplicated(keep=duplicates or "first")
+    if duplicated.any():
+        times = datadf.dtime[duplicated].dt.time.astype(str).tolist()
+        if duplicates is None:
+            logging.warning(f"duplicated time values ({times})")
+        else:
+            logging.warning(f"duplicated time values dropped ({times})")
+            datadf = datadf.loc[~duplicated]
+    etimedf = elapsed_times(datadf.dtime)
+    for col in etimedf.columns:
+        datadf[col] = etimedf[col]
+    return datadf
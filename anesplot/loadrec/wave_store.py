@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Created on Sun Oct 18 10:05:12 2026
+
+@author: cdesbois
+
+compact storage of the wave recordings:
+    - one contiguous float32 array per trace (memory mapped '.f32' files)
+    - the time base (start time, interval between two points, sampling rate)
+    - 'point', 'dtime', 'etimesec' & 'etimemin' are computed on request
+
+typical use::
+
+    store = WaveStore.open(dirname)
+    ekg = store.view("wekg", 3000, 6000)  # zero copy (numpy view)
+    roidf = store.frame(["wekg", "wap"], 3000, 6000)  # the ROI only
+
+"""
+
+import json
+import logging
+import os
+import shutil
+from typing import Any, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+TIME_COLUMNS = ["point", "dtime", "etimesec", "etimemin"]
+META_NAME = "meta.json"
+
+
+class WaveStore:
+    """
+    Float32 storage of a wave recording.
+
+    Attributes
+    ----------
+    traces : dict[str, np.ndarray]
+        {trace_name : float32 array (or np.memmap)}.
+    start_time : pd.Timestamp
+        datetime of the point 0 (NaT if unknown).
+    time_delta : pd.Timedelta
+        interval between two points (used for the 'dtime' values).
+    sampling_freq : float
+        the sampling rate (used for the 'etimesec' values).
+    """
+
+    def __init__(
+        self,
+        traces: dict[str, np.ndarray],
+        start_time: pd.Timestamp,
+        time_delta: pd.Timedelta,
+        sampling_freq: float,
+    ):
+        self.traces = traces
+        self.start_time = pd.Timestamp(start_time)
+        self.time_delta = pd.Timedelta(time_delta)
+        self.sampling_freq = sampling_freq
+        lengths = {len(arr) for arr in traces.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"the traces have different lengths ({lengths})")
+        self.length = lengths.pop() if lengths else 0
+
+    def __len__(self) -> int:
+        return self.length
+
+    @property
+    def columns(self) -> list[str]:
+        """The trace names (the time columns are not stored)."""
+        return list(self.traces)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the stored traces (bytes)."""
+        return sum(arr.nbytes for arr in self.traces.values())
+
+    @classmethod
+    def from_frame(cls, datadf: pd.DataFrame, sampling_freq: float) -> "WaveStore":
+        """
+        Build an (in memory) store from a wave dataframe.
+
+        Parameters
+        ----------
+        datadf : pd.DataFrame
+            the wave data (index = point location, cf loadmonitor_wavedata).
+        sampling_freq : float
+            the sampling rate.
+
+        Returns
+        -------
+        WaveStore
+        """
+        traces = {
+            col: np.ascontiguousarray(datadf[col].to_numpy(dtype="float32"))
+            for col in datadf.columns
+            if col not in TIME_COLUMNS
+        }
+        start_time, time_delta = pd.NaT, pd.NaT
+        if "dtime" in datadf.columns and len(datadf) > 1:
+            start_time = datadf.dtime.iloc[0]
+            time_delta = datadf.dtime.iloc[1] - datadf.dtime.iloc[0]
+        return cls(traces, start_time, time_delta, sampling_freq)
+
+    @classmethod
+    def write(
+        cls,
+        chunks: Iterable[pd.DataFrame],
+        dirname: str,
+        sampling_freq: float,
+        key: Optional[dict[str, Any]] = None,
+    ) -> "WaveStore":
+        """
+        Write the wave data chunk by chunk and return the memory mapped store.
+
+        Parameters
+        ----------
+        chunks : Iterable[pd.DataFrame]
+            the successive parts of the record (cf iter_wave_chunks).
+        dirname : str
+            the store directory (replaced if it exists).
+        sampling_freq : float
+            the sampling rate.
+        key : dict, optional (default is None)
+            an identifier of the source, stored in the meta data.
+
+        Returns
+        -------
+        WaveStore
+        """
+        tmp_dir = dirname + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        files: dict[str, Any] = {}
+        start_time, time_delta = pd.NaT, pd.NaT
+        length = 0
+        try:
+            for chunk in chunks:
+                if not files:
+                    names = [_ for _ in chunk.columns if _ not in TIME_COLUMNS]
+                    files = {
+                        name: open(os.path.join(tmp_dir, f"trace_{i}.f32"), "wb")
+                        for i, name in enumerate(names)
+                    }
+                    if "dtime" in chunk.columns and len(chunk) > 1:
+                        start_time = chunk.dtime.iloc[0]
+                        time_delta = chunk.dtime.iloc[1] - chunk.dtime.iloc[0]
+                for name, file in files.items():
+                    chunk[name].to_numpy(dtype="float32").tofile(file)
+                length += len(chunk)
+        finally:
+            for file in files.values():
+                file.close()
+        meta = {
+            "key": key,
+            "traces": list(files),
+            "length": length,
+            "start_time": None if pd.isna(start_time) else start_time.value,
+            "time_delta": None if pd.isna(time_delta) else time_delta.value,
+            "sampling_freq": sampling_freq,
+        }
+        with open(os.path.join(tmp_dir, META_NAME), "w", encoding="utf-8") as file:
+            json.dump(meta, file, default=str)
+        shutil.rmtree(dirname, ignore_errors=True)
+        os.replace(tmp_dir, dirname)
+        logging.info(f"wrote wave store ({length} points) in {dirname}")
+        return cls.open(dirname)
+
+    @classmethod
+    def read_meta(cls, dirname: str) -> Optional[dict[str, Any]]:
+        """Return the store meta data (None if absent)."""
+        meta_name = os.path.join(dirname, META_NAME)
+        if not os.path.isfile(meta_name):
+            return None
+        with open(meta_name, encoding="utf-8") as file:
+            meta: dict[str, Any] = json.load(file)
+        return meta
+
+    @classmethod
+    def open(cls, dirname: str) -> "WaveStore":
+        """
+        Open a written store (the traces are memory mapped, read only).
+
+        Parameters
+        ----------
+        dirname : str
+            the store directory.
+
+        Returns
+        -------
+        WaveStore
+        """
+        meta = cls.read_meta(dirname)
+        if meta is None:
+            raise FileNotFoundError(f"no wave store in {dirname}")
+        traces = {}
+        for i, name in enumerate(meta["traces"]):
+            if meta["length"]:
+                traces[name] = np.memmap(
+                    os.path.join(dirname, f"trace_{i}.f32"),
+                    dtype="float32",
+                    mode="r",
+                    shape=(meta["length"],),
+                )
+            else:
+                traces[name] = np.empty(0, dtype="float32")
+        start_time = pd.NaT if meta["start_time"] is None else meta["start_time"]
+        time_delta = pd.NaT if meta["time_delta"] is None else meta["time_delta"]
+        return cls(traces, start_time, time_delta, meta["sampling_freq"])
+
+    def _bounds(self, start: Optional[int], stop: Optional[int]) -> tuple[int, int]:
+        """Clip the point limits to the record (stop excluded)."""
+        start = 0 if start is None else max(int(start), 0)
+        stop = self.length if stop is None else min(int(stop), self.length)
+        return start, max(start, stop)
+
+    def view(
+        self, trace: str, start: Optional[int] = None, stop: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        Return the values of a trace between two points (zero copy).
+
+        Parameters
+        ----------
+        trace : str
+            the trace name.
+        start : int, optional (default is None -> first point)
+            first point location.
+        stop : int, optional (default is None -> end of the record)
+            last point location (excluded).
+
+        Returns
+        -------
+        np.ndarray
+            a (read only) view on the stored float32 values.
+        """
+        start, stop = self._bounds(start, stop)
+        return self.traces[trace][start:stop]
+
+    def time_column(
+        self, name: str, start: Optional[int] = None, stop: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        Compute a time column ('point', 'dtime', 'etimesec' or 'etimemin').
+
+        Parameters
+        ----------
+        name : str
+            the column name (in TIME_COLUMNS).
+        start : int, optional (default is None -> first point)
+            first point location.
+        stop : int, optional (default is None -> end of the record)
+            last point location (excluded).
+
+        Returns
+        -------
+        np.ndarray
+            the values for the required points.
+        """
+        start, stop = self._bounds(start, stop)
+        points = np.arange(start, stop, dtype="int64")
+        if name == "point":
+            return points
+        if name == "etimesec":
+            return points / self.sampling_freq
+        if name == "etimemin":
+            return points / self.sampling_freq / 60
+        if name == "dtime":
+            if pd.isna(self.start_time) or pd.isna(self.time_delta):
+                return np.full(len(points), np.datetime64("NaT"), dtype="M8[ns]")
+            dtime_ns = self.start_time.value + points * self.time_delta.value
+            return dtime_ns.astype("M8[ns]")
+        raise KeyError(f"{name} is not a time column ({TIME_COLUMNS})")
+
+    def frame(
+        self,
+        keys: Optional[list[str]] = None,
+        start: Optional[int] = None,
+        stop: Optional[int] = None,
+        time_cols: Optional[list[str]] = None,
+    ) -> pd.DataFrame:
+        """
+        Build a dataframe for a part of the record.
+
+        Parameters
+        ----------
+        keys : list[str], optional (default is None -> all the traces)
+            the traces to use.
+        start : int, optional (default is None -> first point)
+            first point location.
+        stop : int, optional (default is None -> end of the record)
+            last point location (excluded).
+        time_cols : list[str], optional (default is None -> all TIME_COLUMNS)
+            the time columns to compute.
+
+        Returns
+        -------
+        pd.DataFrame
+            index = point location, columns = traces (float32) and time columns.
+        """
+        if keys is None:
+            keys = self.columns
+        if time_cols is None:
+            time_cols = TIME_COLUMNS
+        start, stop = self._bounds(start, stop)
+        data: dict[str, Any] = {}
+        # same columns order as loadmonitor_wavedata
+        if "dtime" in time_cols:
+            data["dtime"] = self.time_column("dtime", start, stop)
+        for key in keys:
+            data[key] = self.view(key, start, stop)
+        for col in time_cols:
+            if col != "dtime":
+                data[col] = self.time_column(col, start, stop)
+        return pd.DataFrame(data, index=pd.RangeIndex(start, stop))
+
+    def sec_to_point(self, secs: Iterable[float]) -> list[int]:
+        """Convert elapsed times (sec) to (nearest) point locations."""
+        return [
+            int(np.clip(round(sec * self.sampling_freq), 0, max(self.length - 1, 0)))
+            for sec in secs
+        ]
+
+    def dtime_to_point(self, dtimes: Iterable[pd.Timestamp]) -> list[int]:
+        """Convert datetimes to (nearest) point locations."""
+        if pd.isna(self.start_time) or pd.isna(self.time_delta):
+            logging.warning("no time base in the wave store")
+            return [0 for _ in dtimes]
+        return [
+            int(
+                np.clip(
+                    round((pd.Timestamp(dtime) - self.start_time) / self.time_delta),
+                    0,
+                    max(self.length - 1, 0),
+                )
+            )
+            for dtime in dtimes
+        ]
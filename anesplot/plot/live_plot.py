@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+Created on Sun Oct 18 23:41:05 2026
+
+@author: cdesbois
+
+live update of the trend plots (record still written, cf _SlowWave.refresh):
+    - the figures are built once (trend_plot functions)
+    - the data artists (gid set in t_axplot : column name, 'col1/col2' for
+      the fills, 'hist:col' and 'median:col' for the histograms) are bound
+      to the data columns
+    - the new rows are appended to the bound artists, the limits only grow
+      (with a headroom -> few full redraws)
+    - the refresh uses blitting : restore the background, draw the data
+      artists, blit (full draw only if the limits changed)
+
+use::
+
+    live = LivePlot(mtrends, interval=5)
+    live.start()  # a canvas timer calls mtrends.refresh()
+    ...
+    live.stop()
+
+"""
+
+import logging
+import time
+from typing import Any, Callable, Optional
+
+import matplotlib.dates as mdates
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from matplotlib.collections import PolyCollection
+
+import anesplot.plot.trend_plot as tplot
+from anesplot.plot import pfunc
+
+LIVE_FIGURES: dict[str, Callable[[pd.DataFrame, dict[str, Any]], plt.Figure]] = {
+    "plot_ventil": tplot.plot_ventil,
+    "plot_co2o2": tplot.plot_co2o2,
+    "plot_co2aa": tplot.plot_co2aa,
+    "plot_cardiovasc": tplot.plot_cardiovasc,
+    "hist_co2aa": tplot.hist_co2aa,
+    "hist_cardio": tplot.hist_cardio,
+}
+
+
+def line_scale(line: plt.Line2D, values: np.ndarray) -> float:
+    """Return the factor applied to the column when plotted (eg tvInsp / calib)."""
+    ydata = np.asarray(line.get_ydata(), dtype=float)
+    if len(ydata) != len(values):
+        return 1.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratios = ydata / values
+    ratios = ratios[np.isfinite(ratios) & (ratios != 0)]
+    return float(np.median(ratios)) if len(ratios) else 1.0
+
+
+def bar_verts(edges: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Return the rectangles (nbins, 4, 2) of a histogram."""
+    verts = np.zeros((len(counts), 4, 2))
+    verts[:, :2, 0] = edges[:-1, np.newaxis]
+    verts[:, 2:, 0] = edges[1:, np.newaxis]
+    verts[:, 1:3, 1] = counts[:, np.newaxis]
+    return verts
+
+
+def hist_collection(ax: plt.Axes, patches: list[Any]) -> tuple[Any, np.ndarray]:
+    """Replace the histogram patches by one collection (-> one draw call)."""
+    edges = np.array(
+        [patch.get_x() for patch in patches]
+        + [patches[-1].get_x() + patches[-1].get_width()]
+    )
+    counts = np.array([patch.get_height() for patch in patches])
+    coll = PolyCollection(
+        bar_verts(edges, counts),
+        facecolors=patches[0].get_facecolor(),
+        edgecolors=patches[0].get_edgecolor(),
+        linewidths=patches[0].get_linewidth(),
+        gid=patches[0].get_gid(),
+        zorder=patches[0].get_zorder(),
+    )
+    for patch in patches:
+        patch.remove()
+    ax.add_collection(coll, autolim=False)
+    return coll, edges
+
+
+class LivePlot:
+    """
+    Live updated trend figures.
+
+    Attributes
+    ----------
+    trends : _SlowWave
+        the followed record (MonitorTrend or TaphTrend).
+    figures : dict[str, plt.Figure]
+        the figures (built once).
+    interval : float
+        the refresh period (sec).
+    headroom : float
+        the fraction of the time range added when the time axis is extended.
+    ymargin : float
+        the fraction of the data range added when a y axis is extended.
+    blit : bool
+        use blitting (if the backend supports it).
+    """
+
+    def __init__(
+        self,
+        trends: Any,
+        names: Optional[list[str]] = None,
+        interval: float = 5.0,
+        headroom: float = 0.25,
+        ymargin: float = 0.05,
+        blit: bool = True,
+    ) -> None:
+        self.trends = trends
+        self.names = names or self.default_names(trends)
+        self.interval = interval
+        self.headroom = headroom
+        self.ymargin = ymargin
+        self.blit = blit
+        self.figures: dict[str, plt.Figure] = {}
+        self.timer: Any = None
+        self.last_duration = 0.0
+        self._x: np.ndarray = np.array([])
+        self._values: dict[str, np.ndarray] = {}
+        self._lines: dict[str, list[tuple[plt.Line2D, str, float]]] = {}
+        self._fills: dict[str, list[tuple[PolyCollection, str, str]]] = {}
+        self._hists: dict[str, list[tuple[PolyCollection, np.ndarray, str]]] = {}
+        self._medians: dict[str, list[tuple[plt.Line2D, str]]] = {}
+        self._backgrounds: dict[str, Any] = {}
+        if trends.follower is None:
+            trends.follow()
+        self.build()
+        trends.register_callback(self.update)
+
+    @staticmethod
+    def default_names(trends: Any) -> list[str]:
+        """Return the plot_trenddata figures (sathr for a taphonius record)."""
+        names = list(LIVE_FIGURES)
+        if trends.param.get("source") == "taphTrend":
+            names.insert(0, "plot_sathr")
+        return names
+
+    @property
+    def timebase(self) -> str:
+        """The x column ('dtime' or 'etimemin', cf restrict_trenddf)."""
+        return "dtime" if self.trends.param.get("dtime") else "etimemin"
+
+    def build(self) -> None:
+        """Build the figures and bind their data artists to the data columns."""
+        for fig in self.figures.values():
+            plt.close(fig)
+        datadf = self.trends.data
+        # the whole record (no xmin, xmax restriction)
+        param = dict(self.trends.param, xmin=None, xmax=None)
+        self._x = datadf[self.timebase].to_numpy() if not datadf.empty else np.array([])
+        self._values = {
+            col: datadf[col].to_numpy(dtype=float)
+            for col in datadf.select_dtypes("number").columns
+        }
+        self.figures = {}
+        self._backgrounds = {}
+        for name in self.names:
+            func = LIVE_FIGURES.get(name, getattr(tplot, name, None))
+            if func is None:
+                logging.warning(f"{name} is not a trend_plot function")
+                continue
+            fig = func(datadf, param)
+            self.figures[name] = fig
+            self._bind(name, fig)
+            fig.canvas.mpl_connect(
+                "draw_event", lambda event, name=name: self._on_draw(name)
+            )
+
+    def _bind(self, name: str, fig: plt.Figure) -> None:
+        """Find the data artists (gid) of a figure."""
+        lines, fills, hists, medians = [], [], [], []
+        for ax in fig.get_axes():
+            # no autoscale (cf _extend)
+            ax.set_xlim(ax.get_xlim())
+            ax.set_ylim(ax.get_ylim())
+            for line in ax.get_lines():
+                gid = line.get_gid() or ""
+                if gid.startswith("median:") and gid[7:] in self._values:
+                    medians.append((line, gid[7:]))
+                elif gid in self._values:
+                    scale = line_scale(line, self._values[gid])
+                    lines.append((line, gid, scale))
+            for coll in ax.collections:
+                cols = (coll.get_gid() or "").split("/")
+                if len(cols) == 2 and set(cols) <= set(self._values):
+                    fills.append((coll, cols[0], cols[1]))
+            patches = [
+                patch
+                for patch in ax.patches
+                if (patch.get_gid() or "").startswith("hist:")
+            ]
+            if patches and patches[0].get_gid()[5:] in self._values:
+                coll, edges = hist_collection(ax, patches)
+                hists.append((coll, edges, coll.get_gid()[5:]))
+        self._lines[name] = lines
+        self._fills[name] = fills
+        self._hists[name] = hists
+        self._medians[name] = medians
+        if self.blit and fig.canvas.supports_blit:
+            for artist in self._artists(name):
+                artist.set_animated(True)
+
+    def _artists(self, name: str) -> list[Any]:
+        """Return the data artists of a figure (drawing order)."""
+        artists: list[Any] = [coll for coll, _, _ in self._fills[name]]
+        artists.extend(coll for coll, _, _ in self._hists[name])
+        artists.extend(line for line, _ in self._medians[name])
+        artists.extend(line for line, _, _ in self._lines[name])
+        return artists
+
+    def _on_draw(self, name: str) -> None:
+        """Store the background (without the data) and draw the data artists."""
+        fig = self.figures.get(name)
+        if fig is None or not (self.blit and fig.canvas.supports_blit):
+            return
+        self._backgrounds[name] = fig.canvas.copy_from_bbox(fig.bbox)
+        for artist in self._artists(name):
+            fig.draw_artist(artist)
+
+    def _xnum(self, xvalues: np.ndarray) -> np.ndarray:
+        """Return the x values in axis units."""
+        if np.issubdtype(xvalues.dtype, np.datetime64):
+            return mdates.date2num(xvalues)
+        return xvalues.astype(float)
+
+    @staticmethod
+    def _extend(
+        lims: tuple[float, float], low: float, high: float, headroom: float
+    ) -> Any:
+        """Return the extended limits (None if the values are inside)."""
+        if not (np.isfinite(low) and np.isfinite(high)):
+            return None
+        if low >= lims[0] and high <= lims[1]:
+            return None
+        low, high = min(low, lims[0]), max(high, lims[1])
+        margin = headroom * (high - low)
+        return (
+            low - margin if low < lims[0] else lims[0],
+            high + margin if high > lims[1] else lims[1],
+        )
+
+    def update(self, newdf: pd.DataFrame) -> None:
+        """
+        Append the new rows to the figures and redraw them.
+
+        Parameters
+        ----------
+        newdf : pd.DataFrame
+            the rows appended to trends.data (cf _SlowWave.refresh).
+        """
+        if newdf.empty:
+            return
+        start = time.perf_counter()
+        traces = [
+            col
+            for col in newdf.select_dtypes("number").columns
+            if col not in self._values and newdf[col].notna().any()
+        ]
+        if traces:
+            # a new trace -> the figures have to be built again
+            logging.info(f"new traces {traces} : rebuild")
+            self.build()
+            for fig in self.figures.values():
+                fig.canvas.draw_idle()
+            self.last_duration = time.perf_counter() - start
+            return
+        newx = newdf[self.timebase].to_numpy()
+        self._x = np.concatenate([self._x, newx])
+        newvalues = {}
+        for col, values in self._values.items():
+            if col in newdf:
+                newvalues[col] = newdf[col].to_numpy(dtype=float)
+            else:
+                newvalues[col] = np.full(len(newdf), np.nan)
+            self._values[col] = np.concatenate([values, newvalues[col]])
+        for name in self.figures:
+            self._update_figure(name, self._xnum(newx), newvalues)
+        self.last_duration = time.perf_counter() - start
+
+    def _update_figure(
+        self, name: str, newx: np.ndarray, newvalues: dict[str, np.ndarray]
+    ) -> None:
+        """Update the data artists and the limits of a figure, then draw it."""
+        fig = self.figures[name]
+        redraw = False
+        ybounds: dict[Any, list[float]] = {}
+        for line, col, scale in self._lines[name]:
+            line.set_data(self._x, self._values[col] * scale)
+            bounds = ybounds.setdefault(line.axes, [np.inf, -np.inf])
+            if np.isfinite(newvalues[col]).any():
+                bounds[0] = min(bounds[0], np.nanmin(newvalues[col]) * scale)
+                bounds[1] = max(bounds[1], np.nanmax(newvalues[col]) * scale)
+        for i, (coll, col1, col2) in enumerate(self._fills[name]):
+            if hasattr(coll, "set_data"):
+                # matplotlib >= 3.10 : FillBetweenPolyCollection
+                coll.set_data(self._x, self._values[col1], self._values[col2])
+                continue
+            ax = coll.axes
+            newcoll = ax.fill_between(
+                self._x,
+                self._values[col1],
+                self._values[col2],
+                facecolor=coll.get_facecolor(),
+                edgecolor=coll.get_edgecolor(),
+                alpha=coll.get_alpha(),
+                gid=coll.get_gid(),
+                animated=coll.get_animated(),
+                zorder=coll.get_zorder(),
+            )
+            coll.remove()
+            self._fills[name][i] = (newcoll, col1, col2)
+        for coll, edges, col in self._hists[name]:
+            ser = pfunc.remove_outliers(pd.DataFrame({col: self._values[col]}), col)
+            counts, _ = np.histogram(ser, bins=edges)
+            coll.set_verts(bar_verts(edges, counts))
+            ax = coll.axes
+            lims = self._extend(ax.get_ylim(), 0, counts.max(), self.ymargin)
+            if lims:
+                ax.set_ylim(*lims)
+                # hidden y axis -> the background doesn't change
+                redraw = redraw or ax.get_yaxis().get_visible()
+            for line, median_col in self._medians[name]:
+                if median_col == col and len(ser):
+                    line.set_xdata([ser.median()] * 2)
+        # the limits only grow
+        if self._lines[name] and len(newx):
+            ax = self._lines[name][0][0].axes
+            xlims = self._extend(
+                ax.get_xlim(), ax.get_xlim()[0], np.nanmax(newx), self.headroom
+            )
+            if xlims:
+                for ax in fig.get_axes():
+                    ax.set_xlim(*xlims)
+                redraw = True
+        for ax, (low, high) in ybounds.items():
+            ylims = self._extend(ax.get_ylim(), low, high, self.ymargin)
+            if ylims:
+                ax.set_ylim(*ylims)
+                redraw = True
+        self._draw(name, redraw)
+
+    def _draw(self, name: str, redraw: bool) -> None:
+        """Blit the data artists (full draw if the limits changed)."""
+        fig = self.figures[name]
+        canvas = fig.canvas
+        if not (self.blit and canvas.supports_blit):
+            canvas.draw_idle()
+            return
+        if redraw or name not in self._backgrounds:
+            # -> _on_draw : background and data artists
+            canvas.draw()
+        else:
+            canvas.restore_region(self._backgrounds[name])
+            for artist in self._artists(name):
+                fig.draw_artist(artist)
+        canvas.blit(fig.bbox)
+        canvas.flush_events()
+
+    def start(self) -> None:
+        """Start the periodic refresh of the record (and of the figures)."""
+        if not self.figures:
+            logging.warning("no live figure to refresh")
+            return
+        canvas = next(iter(self.figures.values())).canvas
+        self.timer = canvas.new_timer(interval=int(self.interval * 1000))
+        self.timer.add_callback(self.trends.refresh)
+        self.timer.start()
+
+    def stop(self) -> None:
+        """Stop the refresh, the figures become static (eg to save them)."""
+        if self.timer is not None:
+            self.timer.stop()
+            self.timer = None
+        if self.update in self.trends.callbacks:
+            self.trends.callbacks.remove(self.update)
+        for name, fig in self.figures.items():
+            for artist in self._artists(name):
+                artist.set_animated(False)
+            fig.canvas.draw_idle()
@@ -31,6 +31,34 @@ import anesplot.loadrec.dialogs as dlg
 
 
 # %%
+def get_fig_lims(fig: plt.Figure, dtime: bool) -> tuple[list[Any], tuple[Any, ...]]:
+    """
+    Return the x limits (datetime or sec) and the y limits of a figure.
+
+    Parameters
+    ----------
+    fig : plt.Figure
+        the figure to get data from.
+    dtime : bool
+        datetime (or elapsed time) in the x axis.
+
+    Returns
+    -------
+    xlims : list
+        the x limits of the first axis (pd.Timestamp or sec).
+    ylims : tuple
+        the y limits of all the axes.
+    """
+    ylims = tuple(_.get_ylim() for _ in fig.get_axes())
+    ax = fig.get_axes()[0]
+    if dtime:  # datetime in the x axis
+        xlims = [pd.to_datetime(mdates.num2date(_)) for _ in ax.get_xlim()]
+        xlims = [_.tz_localize(None) for _ in xlims]
+    else:  # index = sec
+        xlims = list(ax.get_xlim())
+    return xlims, ylims
+
+
 def get_roi(
     fig: plt.Figure, datadf: pd.DataFrame, params: dict[str, Any]
 ) -> dict[str, Any]:
@@ -50,23 +78,13 @@ def get_roi(
     dict :
         containing ylims, xlims(point, dtime and sec)
     """
-    ylims = tuple(_.get_ylim() for _ in fig.get_axes())
-    # xlims
-    ax = fig.get_axes()[0]
-    if params["dtime"]:  # datetime in the x axis
-        dtime_lims = [pd.to_datetime(mdates.num2date(_)) for _ in ax.get_xlim()]
-        dtime_lims = [_.tz_localize(None) for _ in dtime_lims]
-        # i_lims = [bisect(datadf.datetime, _) for _ in dtime_lims]fig
-        i_lims = [
-            datadf.set_index("dtime").index.get_indexer([_], method="nearest")
-            for _ in dtime_lims
-        ]
-    else:  # index = sec
-        sec_lims = ax.get_xlim()
-        i_lims = [
-            datadf.set_index("etimesec").index.get_indexer([_], method="nearest")
-            for _ in sec_lims
-        ]
+    xlims, ylims = get_fig_lims(fig, params["dtime"])
+    timebase = "dtime" if params["dtime"] else "etimesec"
+    # i_lims = [bisect(datadf.datetime, _) for _ in dtime_lims]fig
+    i_lims = [
+        datadf.set_index(timebase).index.get_indexer([_], method="nearest")
+        for _ in xlims
+    ]
     i_lims = [i_lims[0][0], i_lims[1][-1]]
     if "point" not in datadf.columns:
         datadf["point"] = datadf.index
@@ -84,6 +102,37 @@ def get_roi(
     return roidict
 
 
+def get_store_roi(fig: plt.Figure, store: Any, params: dict[str, Any]) -> dict[str, Any]:
+    """
+    Use the drawn figure to extract the x and x limits (WaveStore based).
+
+    Parameters
+    ----------
+    fig : plt.Figure
+        the figure to get data from.
+    store : anesplot.loadrec.wave_store.WaveStore
+        waves recording.
+    params : dict of parameters
+
+    Returns
+    -------
+    dict :
+        containing ylims, xlims(point, dtime and sec)
+    """
+    xlims, ylims = get_fig_lims(fig, params["dtime"])
+    if params["dtime"]:
+        i_lims = store.dtime_to_point(xlims)
+    else:
+        i_lims = store.sec_to_point(xlims)
+    roidict: dict[str, Any] = {}
+    for abbr, col in {"dt": "dtime", "pt": "point", "sec": "etimesec"}.items():
+        roidict[abbr] = tuple(store.time_column(col, _, _ + 1)[0] for _ in i_lims)
+    roidict["dt"] = tuple(pd.Timestamp(_) for _ in roidict["dt"])
+    logging.info(f"{'-' * 10} defined a trend_roi")
+    roidict["ylims"] = ylims
+    return roidict
+
+
 # %% build half white
 
 
@@ -7,6 +7,8 @@ Created on Mon Jun 20 14:44:08 2022
 trend_axis_plot :
     a series of functions taking plt.axes and pd.dataframe as argument
     and append the plot to the provided axes
+    (the data artists gid is the column name, 'col1/col2' for the fills,
+    cf live_plot)
 """
 import logging
 from types import SimpleNamespace as sn
@@ -48,10 +50,22 @@ def axplot_hist(ax: plt.axes, ser: pd.Series, key: str = "ip1") -> None:
     ax.set_title(ctes.label, color=ctes.color)
     if len(ser) > 0:
         ax.hist(
-            ser.dropna(), bins=30, color=ctes.color, edgecolor=ctes.edgecolor, alpha=0.7
+            ser.dropna(),
+            bins=30,
+            color=ctes.color,
+            edgecolor=ctes.edgecolor,
+            alpha=0.7,
+            gid=f"hist:{ser.name}",
         )
         q50 = np.percentile(ser, [50])
-        ax.axvline(q50, linestyle="dashed", linewidth=2, color="k", alpha=0.8)
+        ax.axvline(
+            q50,
+            linestyle="dashed",
+            linewidth=2,
+            color="k",
+            alpha=0.8,
+            gid=f"median:{ser.name}",
+        )
         for goal in ctes.goals:
             ax.axvline(goal, color="tab:grey", alpha=1)
         if ctes.goals:
@@ -96,7 +110,13 @@ def axplot_ventiltidal(ax: plt.axes, df: pd.DataFrame) -> None:
         # ax.plot(df.tvInsp / calib, color="tab:orange", linewidth=2, label="tvInsp")
         ctes = sn(**ctes_dico["tvinsp"])
         calib = ctes.calib
-        ax.plot(df.tvInsp / calib, color=ctes.color, linewidth=2, label=ctes.label)
+        ax.plot(
+            df.tvInsp / calib,
+            color=ctes.color,
+            linewidth=2,
+            label=ctes.label,
+            gid="tvInsp",
+        )
     elif "tv_spont" in df.columns:  # taph
         ctes = sn(**ctes_dico["tvspont"])
         ax.plot(
@@ -105,10 +125,17 @@ def axplot_ventiltidal(ax: plt.axes, df: pd.DataFrame) -> None:
             linewidth=1,
             linestyle="-",
             label=ctes.label,
+            gid="tv_spont",
         )
         try:
             ctes = sn(**ctes_dico["tvcontrol"])
-            ax.plot(df.tv_control, color=ctes.color, linewidth=2, label=ctes.label)
+            ax.plot(
+                df.tv_control,
+                color=ctes.color,
+                linewidth=2,
+                label=ctes.label,
+                gid="tv_control",
+            )
             ctes = sn(**ctes_dico["settv"])
             ax.plot(
                 df.set_tv,
@@ -116,6 +143,7 @@ def axplot_ventiltidal(ax: plt.axes, df: pd.DataFrame) -> None:
                 linewidth=1,
                 linestyle=ctes.style,
                 label=ctes.label,
+                gid="set_tv",
             )
         except AttributeError:
             logging.warning("no ventilation started")
@@ -176,6 +204,7 @@ def axplot_ventilpressure(ax: plt.axes, df: pd.DataFrame) -> None:
                 linewidth=1,
                 linestyle=ctes.style,
                 label=ctes.label,
+                gid=key,
             )
         ax.fill_between(
             df.index,
@@ -183,6 +212,7 @@ def axplot_ventilpressure(ax: plt.axes, df: pd.DataFrame) -> None:
             df[keys[-1]],
             color="tab:red",
             alpha=0.2,
+            gid=f"{keys[0]}/{keys[-1]}",
         )
         try:
             ctes = sn(**ctes_dico["setpeep"])
@@ -192,6 +222,7 @@ def axplot_ventilpressure(ax: plt.axes, df: pd.DataFrame) -> None:
                 linewidth=1,
                 linestyle=ctes.style,
                 label=ctes.label,
+                gid="set_peep",
             )
         except AttributeError:
             logging.warning("not on the taph")
@@ -223,9 +254,16 @@ def axplot_minvol_rr(ax: plt.axes, df: pd.DataFrame) -> None:
             linewidth=2,
             linestyle=co2rr.style,
             label=co2rr.label,
+            gid="co2_rr",
         )
     if "minVexp" in df.columns:  # monitor
-        ax.plot(df.minVexp, color=minvol.color, linewidth=2, label=minvol.label)
+        ax.plot(
+            df.minVexp,
+            color=minvol.color,
+            linewidth=2,
+            label=minvol.label,
+            gid="minVexp",
+        )
     if "set_rr" in df.columns:  # taph
         setrr = sn(**ctes_dico["setrr"])
         ax.plot(
@@ -234,6 +272,7 @@ def axplot_minvol_rr(ax: plt.axes, df: pd.DataFrame) -> None:
             linewidth=1,
             linestyle=setrr.style,
             label=setrr.label,
+            gid="set_rr",
         )
     if "calc_minVol" in df.columns:  # taph
         ax.plot(
@@ -242,6 +281,7 @@ def axplot_minvol_rr(ax: plt.axes, df: pd.DataFrame) -> None:
             linewidth=2,
             linestyle=minvol.style,
             label=minvol.label,
+            gid="calc_minVol",
         )
     else:
         logging.warning("no spirometry data recorded")
@@ -266,14 +306,15 @@ def axplot_co2(ax: plt.axes, df: pd.DataFrame) -> None:
     co2 = sn(**ctes_dico["co2"])  # get the drawing constants
     ax.set_ylabel(co2.label)
     try:
-        ax.plot(df.co2exp, color=co2.color, linewidth=2, linestyle="-")
-        ax.plot(df.co2insp, color=co2.color, linewidth=1, linestyle="-")
+        ax.plot(df.co2exp, color=co2.color, linewidth=2, linestyle="-", gid="co2exp")
+        ax.plot(df.co2insp, color=co2.color, linewidth=1, linestyle="-", gid="co2insp")
         ax.fill_between(
             df.index,
             df.co2exp,
             df.co2insp,
             color=co2.color,
             alpha=co2.fillalpha,
+            gid="co2exp/co2insp",
         )
     # except KeyError:
     #     logging.warning("")
@@ -317,14 +358,15 @@ def axplot_aa(ax: plt.axes, df: pd.DataFrame, key: str = "iso") -> None:
         aa = sn(**(ctes_dico["default"]))  # get the drawing constants
     ax.set_ylabel(aa.label)
     try:
-        ax.plot(df.aaExp, color=aa.color, linewidth=2, linestyle="-")
-        ax.plot(df.aaInsp, color=aa.color, linewidth=2, linestyle="-")
+        ax.plot(df.aaExp, color=aa.color, linewidth=2, linestyle="-", gid="aaExp")
+        ax.plot(df.aaInsp, color=aa.color, linewidth=2, linestyle="-", gid="aaInsp")
         ax.fill_between(
             df.index,
             df.aaExp,
             df.aaInsp,
             color=aa.color,
             alpha=aa.fillalpha,
+            gid="aaExp/aaInsp",
         )
         if aa.ylims:
             ax.set_ylim(aa.ylims)
@@ -363,14 +405,15 @@ def axplot_o2(ax: plt.axes, df: pd.DataFrame) -> None:
     oxy = sn(**ctes_dico["o2"])  # get the drawing constants
     ax.set_ylabel(oxy.label)
     try:
-        ax.plot(df.o2insp, color=oxy.color, linewidth=2, linestyle="-")
-        ax.plot(df.o2exp, color=oxy.color, linewidth=2, linestyle="-")
+        ax.plot(df.o2insp, color=oxy.color, linewidth=2, linestyle="-", gid="o2insp")
+        ax.plot(df.o2exp, color=oxy.color, linewidth=2, linestyle="-", gid="o2exp")
         ax.fill_between(
             df.index,
             df.o2insp,
             df.o2exp,
             color=oxy.color,
             alpha=oxy.fillalpha,
+            gid="o2insp/o2exp",
         )
         ax.set_ylim(*oxy.ylims)
         ax.axhline(oxy.ylims[0], linestyle="dashed", linewidth=3, color=oxy.color)
@@ -411,13 +454,20 @@ def axplot_arterialpressure(ax: plt.axes, df: pd.DataFrame, key: str = "ip1") ->
         ax.text(0.5, 0.5, txt)
         return
     try:
-        ax.plot(df[press.traces[0]], color=press.color, label=press.label, linewidth=2)
+        ax.plot(
+            df[press.traces[0]],
+            color=press.color,
+            label=press.label,
+            linewidth=2,
+            gid=press.traces[0],
+        )
         ax.fill_between(
             df.index,
             df[press.traces[1]],
             df[press.traces[2]],
             color=press.color,
             alpha=press.fillalpha,
+            gid=f"{press.traces[1]}/{press.traces[2]}",
         )
         ax.set_ylim(*press.ylims)
         ax.axhline(press.goals[0], linewidth=1, linestyle="dashed", color=press.color)
@@ -452,7 +502,7 @@ def axplot_sat(ax: plt.axes, df: pd.DataFrame) -> None:
 
     """
     sat = sn(**ctes_dico["sat"])  # get the drawing constants
-    ax.plot(df.sat, color=sat.color, label=sat.label, linewidth=2)
+    ax.plot(df.sat, color=sat.color, label=sat.label, linewidth=2, gid="sat")
     ax.set_ylabel(sat.label)
     ax.set_ylim(*sat.ylims)
     ax.axhline(
@@ -488,6 +538,7 @@ def axplot_hr(ax: plt.axes, df: pd.DataFrame) -> None:
             label=hrate.label,
             linewidth=2,
             linestyle=hrate.style,
+            gid="hr",
         )
         ax.set_ylabel(hrate.label)
         ax.set_ylim(*hrate.ylims)
@@ -529,6 +580,7 @@ def axplot_sathr(ax: plt.axes, df: pd.DataFrame) -> None:
         label=sathrate.label,
         linewidth=2,
         linestyle=sathrate.style,
+        gid="spo2Hr",
     )
     ax.set_ylabel(sathrate.label)
     ax.set_ylim(*sathrate.ylims)
@@ -9,18 +9,11 @@ list of function to choose, manipulate and combine the wave plot functions
 
 """
 import logging
-import sys
 from typing import Optional
 
-from PyQt5.QtWidgets import QApplication, QInputDialog, QWidget
+from PyQt5.QtWidgets import QInputDialog, QWidget
 
-app = QApplication.instance()
-logging.info(f"w_agg_plot.py : {__name__=}")
-if app is None:
-    logging.info("N0 QApplication instance - - - - - - - - - - - - - > creating one")
-    app = QApplication([])
-else:
-    logging.warning(f"QApplication instance already exists: {QApplication.instance()}")
+from anesplot.loadrec.dialogs import get_app
 
 
 class ChooseWave(QWidget):  # type: ignore
@@ -65,7 +58,7 @@ def select_wave_to_plot(waves: list[str]) -> list[str]:
     """Select the wave(s)."""
     # waves = ["wekg", "wap", "wco2"]
     selected_waves = []
-    app = QApplication(sys.argv)
+    app = get_app()
     app.setQuitOnLastWindowClosed(True)
     for num in [1, 2]:
         dial = ChooseWave(waves, num)
@@ -9,15 +9,12 @@ import os
 from math import ceil, floor
 from typing import Any, Union
 
-import matplotlib
 import matplotlib.pyplot as plt
 import pandas as pd
 from matplotlib import animation
 
 import anesplot.plot.wave_plot
 
-matplotlib.use("qt5Agg")
-
 
 def create_video(
     data: pd.DataFrame,
@@ -98,15 +98,15 @@ def restrict_wavedf(
         dtime = False
         parm["dtime"] = False
     cols = list(set(keys))
+    # point values -> positions (the index may not start at 0, eg a roi)
+    ilims = list(datadf.index.searchsorted(ilims))
     if dtime:
         cols.insert(0, "dtime")
-        plotdf = datadf[cols].copy()
-        plotdf = plotdf.iloc[ilims[0] : ilims[1]].set_index("dtime")
+        plotdf = datadf[cols].iloc[ilims[0] : ilims[1]].set_index("dtime")
         parm["unit"] = "dtime"
     else:
         cols.insert(0, "etimesec")
-        plotdf = datadf[cols].copy()
-        plotdf = plotdf.iloc[ilims[0] : ilims[1]].set_index("etimesec")
+        plotdf = datadf[cols].iloc[ilims[0] : ilims[1]].set_index("etimesec")
         parm["unit"] = "sec"
     return plotdf
 
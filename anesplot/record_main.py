@@ -28,15 +28,12 @@ import logging
 import os
 
 from types import SimpleNamespace
-from typing import Optional
+from typing import Any, Optional
 
-import matplotlib
 import matplotlib.pyplot as plt
 import pyperclip
 from matplotlib import rcParams
-from PyQt5.QtWidgets import QApplication
 
-# from PyQt5.QtWidgets import QApplication
 import anesplot.loadrec.dialogs as dlgs
 from anesplot.config.load_recordrc import build_paths
 from anesplot.fast_waves import (  # noqa: F401
@@ -50,8 +47,7 @@ from anesplot.guides.choose_guide import (  # noqa: F401
 from anesplot.slow_waves import MonitorTrend, TaphTrend
 
 
-paths = build_paths()
-matplotlib.use("Qt5Agg")  # NB required for the dialogs
+# NB the backend is not forced (the dialogs create the QApplication when needed)
 # to have the display beginning from 0
 rcParams["axes.xmargin"] = 0
 rcParams["axes.ymargin"] = 0
@@ -59,13 +55,11 @@ rcParams["axes.ymargin"] = 0
 faulthandler.enable()
 
 
-app = QApplication.instance()
-logging.info(f"record_main.py : {__name__=}")
-if app is None:
-    logging.info("N0 QApplication instance - - - - - - - - - - - - - > creating one")
-    app = QApplication([])
-else:
-    logging.warning(f"QApplication instance already exists: {QApplication.instance()}")
+def __getattr__(name: str) -> Any:
+    """Return the configuration paths for 'rec.paths' (read at the first access)."""
+    if name == "paths":
+        return build_paths()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # fig_group = SimpleNamespace()
@@ -160,7 +154,7 @@ def main(file_name: Optional[str] = None) -> str:
     logging.debug(f"{file_name=}")
     if file_name is None:
         # file_name = loadagg.choosefile_gui(paths["data"])
-        file_name = dlgs.choose_file(paths["data"], "", "*.csv")
+        file_name = dlgs.choose_file(build_paths()["data"], "", "*.csv")
     if not file_name:
         return ""
     kinds = ["monitorTrend", "monitorWave", "taphTrend", "telVet"]
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Created on Sun Oct 18 22:10:46 2026
+
+@author: cdesbois
+
+pairing of the monitor trend, monitor wave and taphonius records of a case:
+    - the start and end times come from the archive index (headers and
+      first/last data rows, cf archive_index), no data is loaded
+    - the records are sorted by start : the records overlapping a time
+      interval are found by binary search (start < end and
+      start > begin - longest record), then filtered on their end
+    - for each monitor trend : the wave and the taphonius records with the
+      largest overlap, and their time offsets (sec from the trend start)
+
+use::
+
+    with ArchiveIndex(dirname) as index:
+        index.refresh()
+        pairsdf = pair_records(index.query(kind=None))
+
+"""
+
+import os
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from anesplot.archive_index import ArchiveIndex
+
+PAIRED_KINDS = ["monitor_wave", "taph_trend"]
+
+
+class RecordIntervals:
+    """
+    Sorted time intervals of the records of an archive.
+
+    Attributes
+    ----------
+    records : pd.DataFrame
+        the records (sorted by start, with 'path', 'kind', 'stem', 'start', 'end').
+    starts, ends : np.ndarray
+        the start and end times (int64 ns).
+    longest : int
+        the longest record duration (ns).
+    """
+
+    def __init__(self, recordsdf: pd.DataFrame) -> None:
+        recordsdf = recordsdf.dropna(subset=["start", "end"])
+        self.records = recordsdf.sort_values("start").reset_index(drop=True)
+        self.starts = self.records.start.to_numpy(dtype="datetime64[ns]").astype(
+            np.int64
+        )
+        self.ends = self.records.end.to_numpy(dtype="datetime64[ns]").astype(np.int64)
+        self.longest = int((self.ends - self.starts).max()) if len(self.records) else 0
+        self._kinds = self.records.kind.to_numpy()
+        self._stems = self.records.stem.to_numpy()
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def locate(
+        self, start: Any, end: Any, kind: Optional[str] = None, margin: float = 0
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Return the positions and the overlaps (ns) of the overlapping records."""
+        begin = pd.Timestamp(start).value
+        stop = pd.Timestamp(end).value
+        extend = int(margin * 1e9)
+        first = np.searchsorted(self.starts, begin - extend - self.longest)
+        last = np.searchsorted(self.starts, stop + extend, side="right")
+        positions = np.arange(first, last)
+        keep = self.ends[positions] >= begin - extend
+        if kind:
+            keep &= self._kinds[positions] == kind
+        positions = positions[keep]
+        overlaps = np.minimum(self.ends[positions], stop) - np.maximum(
+            self.starts[positions], begin
+        )
+        return positions, np.maximum(overlaps, 0)
+
+    def overlapping(
+        self, start: Any, end: Any, kind: Optional[str] = None, margin: float = 0
+    ) -> pd.DataFrame:
+        """
+        Return the records overlapping a time interval.
+
+        Parameters
+        ----------
+        start, end : datetime like
+            the time interval.
+        kind : str, optional (default is None -> all)
+            the kind of record.
+        margin : float, optional (default is 0)
+            extension (sec) of the interval on both sides.
+
+        Returns
+        -------
+        pd.DataFrame
+            the records with an 'overlap' (sec) column (margin not included).
+        """
+        positions, overlaps = self.locate(start, end, kind, margin)
+        return self.records.iloc[positions].assign(overlap=overlaps / 1e9)
+
+    def best_match(
+        self, record: Any, kind: str, margin: float = 0
+    ) -> tuple[Optional[int], float]:
+        """
+        Return the record of a kind that matches a monitor trend record.
+
+        Parameters
+        ----------
+        record : namedtuple or pd.Series
+            the monitor trend record ('start', 'end', 'stem').
+        kind : str
+            the kind of the paired record.
+        margin : float, optional (default is 0)
+            time tolerance (sec).
+
+        Returns
+        -------
+        position : int or None
+            the same record name (wave file) or the largest overlap.
+        overlap : float
+            the overlap (sec).
+        """
+        positions, overlaps = self.locate(record.start, record.end, kind, margin)
+        if not len(positions):
+            return None, 0.0
+        samename = np.flatnonzero(self._stems[positions] == record.stem)
+        best = samename[0] if len(samename) else np.argmax(overlaps)
+        return int(positions[best]), overlaps[best] / 1e9
+
+
+def pair_record(
+    intervals: RecordIntervals, record: Any, kinds: list[str], margin: float = 0
+) -> dict[str, Any]:
+    """Return the records paired with a monitor trend (cf pair_records)."""
+    pairs: dict[str, Any] = {
+        "monitor_trend": record.path,
+        "start": record.start,
+        "end": record.end,
+    }
+    for kind in kinds:
+        position, overlap = intervals.best_match(record, kind, margin)
+        if position is None:
+            pairs.update({kind: None, f"{kind}_offset": np.nan, f"{kind}_overlap": 0.0})
+            continue
+        offset = intervals.starts[position] - pd.Timestamp(record.start).value
+        pairs[kind] = intervals.records.path.iat[position]
+        pairs[f"{kind}_offset"] = offset / 1e9
+        pairs[f"{kind}_overlap"] = overlap
+    return pairs
+
+
+def pair_records(
+    recordsdf: pd.DataFrame, margin: float = 0, kinds: Optional[list[str]] = None
+) -> pd.DataFrame:
+    """
+    Pair each monitor trend with its wave and taphonius records.
+
+    Parameters
+    ----------
+    recordsdf : pd.DataFrame
+        the archive records (ArchiveIndex.query(kind=None)).
+    margin : float, optional (default is 0)
+        time tolerance (sec).
+    kinds : list[str], optional (default is None -> PAIRED_KINDS)
+        the kinds of record to pair with the monitor trends.
+
+    Returns
+    -------
+    pd.DataFrame
+        one row per monitor trend : 'monitor_trend', 'start', 'end' and for
+        each paired kind the filename, the offset (sec from the trend start,
+        NaN if no match) and the overlap (sec).
+    """
+    intervals = RecordIntervals(recordsdf)
+    trendsdf = intervals.records[intervals.records.kind == "monitor_trend"]
+    return pd.DataFrame(
+        [
+            pair_record(intervals, record, kinds or PAIRED_KINDS, margin)
+            for record in trendsdf.itertuples()
+        ]
+    )
+
+
+def find_paired_records(
+    filename: str, dirname: Optional[str] = None, margin: float = 0
+) -> dict[str, Any]:
+    """
+    Find the records paired with a monitor trend file.
+
+    Parameters
+    ----------
+    filename : str
+        the monitor trend fullname.
+    dirname : str, optional (default is None -> the file folder)
+        the archive to search (indexed and refreshed).
+    margin : float, optional (default is 0)
+        time tolerance (sec).
+
+    Returns
+    -------
+    dict
+        the pair_records row ({} if the file is not an indexed monitor trend).
+    """
+    filename = os.path.abspath(filename)
+    if dirname is None:
+        dirname = os.path.dirname(filename)
+    with ArchiveIndex(dirname) as index:
+        index.refresh()
+        recordsdf = index.query(kind=None)
+    intervals = RecordIntervals(recordsdf)
+    found = intervals.records[intervals.records.path == filename]
+    if found.empty:
+        return {}
+    return pair_record(intervals, found.iloc[0], PAIRED_KINDS, margin)
@@ -15,11 +15,10 @@ from typing import Any, Optional
 
 import matplotlib.pyplot as plt
 from matplotlib import rcParams
-from PyQt5.QtWidgets import QApplication
 
 import anesplot.loadrec.dialogs as dlg
 import anesplot.plot.trend_plot as tplot
-import anesplot.record_main as rec
+from anesplot.config.load_recordrc import build_paths
 from anesplot.loadrec.loadmonitor_trendrecord import loadmonitor_trenddata
 from anesplot.loadrec.loadtaph_trendrecord import (
     list_taph_recordings,
@@ -34,21 +33,11 @@ plt.ioff()
 
 # import get_file, get_directory
 
-paths = rec.paths
-
-app = QApplication.instance()
-logging.info(f"scanplot_directory.py : {__name__=}")
-if app is None:
-    logging.info("N0 QApplication instance -> creating one")
-    app = QApplication([])
-else:
-    logging.warning(f"QApplication instance already exists: {QApplication.instance()}")
-
 
 def get_directory() -> str:
     """Choose the directory to scan."""
     dirname = dlg.choose_directory(
-        dirname=paths["mon_data"],
+        dirname=build_paths()["mon_data"],
         title="choose the folder to scan",
     )
     return dirname
@@ -226,7 +215,7 @@ def main(apath: Optional[str] = None) -> list[str]:
 if __name__ == "__main__":
     import matplotlib.pyplot as plt
 
-    main(paths["mon_data"])
+    main(build_paths()["mon_data"])
     plt.show()
     # plt.draw()
     # plt.pause(0.001)
@@ -11,24 +11,26 @@ build the objects for the slow_waves ('trends'):
 """
 import logging
 import os
+import sqlite3
 
 # import sys
 from datetime import datetime, timedelta
-from typing import Any, Optional
+from typing import Any, Callable, Optional
 
 import matplotlib.pyplot as plt
 import pandas as pd
-from PyQt5.QtWidgets import QApplication
 
 # import anesplot.plot.t_agg_plot as tagg
 import anesplot.base
 
 # import anesplot
 import anesplot.loadrec.dialogs as dlg
+import anesplot.loadrec.follow_load as follow_load
 import anesplot.loadrec.loadmonitor_trendrecord as lmt
 
 # import anesplot.loadrec.agg_load
 import anesplot.loadrec.loadtaph_trendrecord as ltt
+import anesplot.plot.live_plot
 import anesplot.plot.t_agg_plot
 
 # from anesplot.base import _Waves
@@ -45,18 +47,9 @@ import anesplot.treatrec.manage_events
 # from anesplot.loadrec.agg_load import choosefile_gui
 from anesplot.treatrec.clean_data import clean_trenddata
 
-app = QApplication.instance()
-logging.info(f"slow_waves.py : {__name__=}")
-if app is None:
-    logging.info("N0 QApplication instance - - - - - - - - - - - - - > creating one")
-    app = QApplication([])
-else:
-    logging.warning(f"QApplication instance already exists: {QApplication.instance()}")
 
 # from anesplot.loadrec.dialogs import get_file
 
-paths = build_paths()
-
 
 # +++++++
 class _SlowWave(anesplot.base.Waves):
@@ -76,11 +69,63 @@ class _SlowWave(anesplot.base.Waves):
         clean the data
     show_graphs : external
         plot clinical main plots
+    follow, refresh : external
+        tail-follow loading of a record that is still written
+    live_plot : external
+        debrief plots updated with the appended rows
     """
 
     def __init__(self) -> None:
         super().__init__()
         self.name: str
+        self.follower: Optional[follow_load.TrendFollower] = None
+        self.callbacks: list[Callable[[pd.DataFrame], Any]] = []
+
+    def register_callback(self, func: Callable[[pd.DataFrame], Any]) -> None:
+        """Register a function called with the new rows after each refresh."""
+        if func not in self.callbacks:
+            self.callbacks.append(func)
+
+    def follow(self) -> pd.DataFrame:
+        """
+        Load the record in tail-follow mode (cf refresh).
+
+        Returns
+        -------
+        pd.DataFrame
+            the data (self.data).
+        """
+        self.follower = follow_load.TrendFollower(self.filename)
+        datadf, anotdf = self.follower.read_new()
+        self.data = datadf
+        if isinstance(self, MonitorTrend):
+            self.anotations = anotdf
+        return self.data
+
+    def refresh(self) -> pd.DataFrame:
+        """
+        Append the rows written since the previous refresh (or follow).
+
+        The registered callbacks are called with the new rows.
+
+        Returns
+        -------
+        pd.DataFrame
+            the new rows (empty if nothing was appended).
+        """
+        if self.follower is None:
+            self.follow()
+            newdf = self.data
+        else:
+            newdf, anotdf = self.follower.read_new()
+            self.data = self.follower.append(self.data, newdf)
+            if isinstance(self, MonitorTrend) and not anotdf.empty:
+                self.anotations = pd.concat([self.anotations, anotdf])
+        if newdf.empty:
+            return newdf
+        for func in self.callbacks:
+            func(newdf)
+        return newdf
 
     def clean_trend(self) -> pd.DataFrame:
         """
@@ -105,6 +150,35 @@ class _SlowWave(anesplot.base.Waves):
             self.append_to_figures(fig_dico)
         return fig_dico
 
+    def live_plot(
+        self,
+        names: Optional[list[str]] = None,
+        interval: float = 5.0,
+        start: bool = True,
+    ) -> anesplot.plot.live_plot.LivePlot:
+        """
+        Build the debrief plots once and update them with the new rows.
+
+        Parameters
+        ----------
+        names : list[str], optional (default is None -> show_graphs plots)
+            the trend_plot functions to use.
+        interval : float, optional (default is 5)
+            the refresh period (sec).
+        start : bool, optional (default is True)
+            start the periodic refresh (else call self.refresh()).
+
+        Returns
+        -------
+        LivePlot
+            the controller (.stop() to end the refresh).
+        """
+        live = anesplot.plot.live_plot.LivePlot(self, names, interval=interval)
+        self.append_to_figures(live.figures)
+        if start:
+            live.start()
+        return live
+
     def plot_trend(self) -> tuple[plt.Figure, str]:
         """Choose the graph to use from a pulldown menu."""
         # TODO add a preset if self.name is defined
@@ -225,7 +299,7 @@ class MonitorTrend(_SlowWave):
         """
         super().__init__()
         if filename is None:
-            filename = self.get_filename(paths["mon_data"])
+            filename = self.get_filename(build_paths()["mon_data"])
         self.filename = filename
         self.param["filename"] = filename
         self.param["file"] = os.path.basename(filename)
@@ -263,7 +337,7 @@ class MonitorTrend(_SlowWave):
 
         """
         filename = dlg.choose_file(
-            paths["mon_data"], title="choose a trendfile", filtre="*.csv"
+            build_paths()["mon_data"], title="choose a trendfile", filtre="*.csv"
         )
         # filename = dlg.choose_file(paths['mon_data'], filtre="*.csv")
         if "Wave" in os.path.basename(filename):
@@ -274,15 +348,39 @@ class MonitorTrend(_SlowWave):
             filename = ""
         return filename
 
-    def wavename(self) -> str:
-        """Build supposed wavename."""
+    def wavename(self, pair: bool = False) -> str:
+        """
+        Build supposed wavename.
+
+        Parameters
+        ----------
+        pair : bool, optional (default is False)
+            if the supposed file doesn't exist, search the overlapping wave
+            record of the folder (cf record_pairing, indexes the folder).
+
+        Returns
+        -------
+        str
+            the wave record fullname.
+        """
         wavename = self.filename.split(".")[0] + "Wave.csv"
+        if pair and not os.path.isfile(wavename) and os.path.isfile(self.filename):
+            # pylint: disable=import-outside-toplevel
+            from anesplot.record_pairing import find_paired_records
+
+            try:
+                paired = find_paired_records(self.filename).get("monitor_wave")
+            except (OSError, sqlite3.Error) as error:
+                logging.warning(f"unable to pair the records ({error})")
+                paired = None
+            if paired:
+                wavename = paired
         return wavename
 
     def merge_with_other_record(self) -> None:
         """Merge the recording with the next one (in case of crash and reload)."""
         # next_filename = anesplot.loadrec.agg_load.choosefile_gui(paths["mon_data"])
-        next_filename = lmt.choosefile_gui(paths["mon_data"])
+        next_filename = lmt.choosefile_gui(build_paths()["mon_data"])
 
         next_file = os.path.basename(next_filename)
         self.filename = "_+_".join([self.filename, next_file])
@@ -317,6 +415,8 @@ class TaphTrend(_SlowWave):
             the detected events over time
         ventil_drive_df : pd.DataFrame
             a summary of the user interaction with the ventilator
+        (actions, events, dt_events_df and ventil_drive_df are computed on
+        first access, and reset when the data or the datetime changes)
         fig : plt.Figure
             the current figure
         roi : dict
@@ -354,10 +454,13 @@ class TaphTrend(_SlowWave):
         load : bool, optional (default is True)
             indication to load the data
         """
+        # the event attributes (lazy, cf _get_event)
+        self._events: dict[str, Any] = {}
+        self._events_shift_min: Optional[int] = None
         super().__init__()
         # breakpoint()
         if filename is None:
-            path_totaph = ltt.get_taph_filelocation(paths)
+            path_totaph = ltt.get_taph_filelocation(build_paths())
             filename = ltt.choose_taph_record(path_totaph, monitorname)
             # filename = anesplot.loadrec.dialogs.get_file(
             #    "choose monitor recording", paths["taph_data"], "*.csv"
@@ -379,35 +482,95 @@ class TaphTrend(_SlowWave):
         self.param["source"] = "taphTrend"
         # self.param["source_abbr"] = "t"
         self.param["sampling_freq"] = None
-        self.extract_events()
+
+    @property
+    def data(self) -> pd.DataFrame:
+        """The recorded data (a new data resets the events)."""
+        return self._data
+
+    @data.setter
+    def data(self, datadf: pd.DataFrame) -> None:
+        self._data = datadf
+        self.invalidate_events()
+
+    def invalidate_events(self) -> None:
+        """Reset the event attributes (recomputed on next access)."""
+        self._events = {}
+
+    def _get_event(self, name: str) -> Any:
+        """Return an event attribute, compute it on first access."""
+        if name not in self._events:
+            manage_events = anesplot.treatrec.manage_events
+            if name == "dt_events_df":
+                dt_events_df = manage_events.build_event_dataframe(self.data)
+                if self._events_shift_min is not None:
+                    shift = timedelta(minutes=self._events_shift_min)
+                    dt_events_df.index = dt_events_df.index + shift
+                self._events[name] = dt_events_df
+            elif name in ["actions", "events"]:
+                actions, events = manage_events.extract_taphmessages(
+                    self.dt_events_df
+                )
+                self._events.update(actions=actions, events=events)
+            elif name == "ventil_drive_df":
+                # removed actions to be able to plot everything that arrives
+                # (not only actions ie include the preset values)
+                self._events[name] = manage_events.extract_ventilation_drive(
+                    self.dt_events_df
+                )
+        return self._events[name]
+
+    @property
+    def dt_events_df(self) -> pd.DataFrame:
+        """The detected events over time (lazy)."""
+        return self._get_event("dt_events_df")
+
+    @dt_events_df.setter
+    def dt_events_df(self, dteventsdf: pd.DataFrame) -> None:
+        self._events["dt_events_df"] = dteventsdf
+
+    @property
+    def actions(self) -> set[str]:
+        """A summary of the operator actions (lazy)."""
+        return self._get_event("actions")
+
+    @actions.setter
+    def actions(self, actions: set[str]) -> None:
+        self._events["actions"] = actions
+
+    @property
+    def events(self) -> set[str]:
+        """The detected events (lazy)."""
+        return self._get_event("events")
+
+    @events.setter
+    def events(self, events: set[str]) -> None:
+        self._events["events"] = events
+
+    @property
+    def ventil_drive_df(self) -> pd.DataFrame:
+        """A summary of the user interaction with the ventilator (lazy)."""
+        return self._get_event("ventil_drive_df")
+
+    @ventil_drive_df.setter
+    def ventil_drive_df(self, ventildrivedf: pd.DataFrame) -> None:
+        self._events["ventil_drive_df"] = ventildrivedf
 
     def extract_events(self, shift_min: Optional[int] = None) -> None:
         """
         Decode the taph messages, build events, actions and ventil_drive.
 
+        (not required : the attributes are computed on first access)
+
         Attributes
         ----------
         shift_min : int
             the minute to shift the record to fit with monitor dates
         """
-        dt_events_df = anesplot.treatrec.manage_events.build_event_dataframe(self.data)
-        if shift_min is not None:
-            shift = timedelta(minutes=shift_min)
-            dt_events_df.index = dt_events_df.index + shift
-
-        self.dt_events_df = dt_events_df
-
-        actions, events = anesplot.treatrec.manage_events.extract_taphmessages(
-            self.dt_events_df
-        )
-        self.actions = actions
-        self.events = events
-        # removed actions to be able to plot everything that arrives
-        # (not only actions ie include the preset values)
-        ventil_drive_df = anesplot.treatrec.manage_events.extract_ventilation_drive(
-            dt_events_df
-        )
-        self.ventil_drive_df = ventil_drive_df
+        self.invalidate_events()
+        self._events_shift_min = shift_min
+        for name in ["dt_events_df", "actions", "ventil_drive_df"]:
+            self._get_event(name)
 
     def plot_ventil_drive(self, all_traces: bool = False) -> plt.Figure:
         """Plot the ventilation commands that have been used.
@@ -491,8 +654,10 @@ class TaphTrend(_SlowWave):
 
         """
         self.data = ltt.shift_dtime(self.data, minutes)
-        # recompute events extractions, ventildrive, ...
-        self.extract_events(minutes)
+        # events extractions, ventildrive, ... : recomputed on next access
+        # (the message times are not shifted by shift_dtime)
+        self._events_shift_min = (self._events_shift_min or 0) + minutes
+        self.invalidate_events()
 
     def shift_etime(self, minutes: int) -> None:
         """
@@ -526,6 +691,7 @@ class TaphTrend(_SlowWave):
 
         """
         ltt.sync_elapsed_time(datetime0, self.data)
+        self.invalidate_events()
 
 
 # %%
@@ -5,7 +5,7 @@ Created on Fri May  6 12:03:55 2022
 
 @author: cdesbois
 
-- ekg_func, arterial_func, manage_events, wave_func:
+- ekg_func, arterial_func, manage_events, wave_func, wavelet_func, hr_to_hrv:
     collection of modules containing functions to treat the recorded data:
 
 - extract_hypotension: a script to analyse hypotension in the last years
@@ -31,7 +31,10 @@ from anesplot.treatrec.wave_func import fix_baseline_wander
 
 
 def get_peaks(
-    ser: pd.Series, upp: bool = True, annotations: bool = False
+    ser: pd.Series,
+    upp: bool = True,
+    annotations: bool = False,
+    detrended: Optional[pd.Series] = None,
 ) -> pd.DataFrame:
     """
     Extract a peak location from an arterial time series.
@@ -44,6 +47,9 @@ def get_peaks(
         extraction of the 'up' peaks. (false -> 'down peaks')
     annotations : bool, optional (default is False)
         plot annotations peak and indications.
+    detrended : pd.Series, optional (default is None)
+        the baseline corrected ser (eg _FastWave.get_roi_filtered),
+        if None it is computed (fix_baseline_wander).
 
     Returns
     -------
@@ -58,7 +64,10 @@ def get_peaks(
     low_width = 45  # to remove the artefacts (narrow peaks)
     # replaced in the code by 80* of median width value
 
-    ser_detrended = fix_baseline_wander(ser, 300)
+    if detrended is not None and len(detrended) == len(ser):
+        ser_detrended = detrended
+    else:
+        ser_detrended = fix_baseline_wander(ser, 300)
     height = ser_detrended.quantile(q=quantile)
     # find the (up) peaks
     peaksdf = pd.DataFrame()
@@ -142,6 +151,239 @@ def compute_systolic_variation(ser: pd.Series) -> float:
     return float(var)
 
 
+def segment_variation(values: np.ndarray, boundaries: np.ndarray) -> np.ndarray:
+    """
+    Compute the (maxi - mini) / mean variation between consecutive boundaries.
+
+    the segments go from a boundary to the next one (both included),
+    each value gets the variation of the segment that begins at or before it
+    (vectorized version of the original loop over the local maxima)
+
+    Parameters
+    ----------
+    values : np.ndarray
+        the beat values (eg the systolic pressures, no NaN).
+    boundaries : np.ndarray
+        boolean, the segments limits (eg local_max).
+
+    Returns
+    -------
+    np.ndarray
+        the variation (one value per beat).
+    """
+    values = np.asarray(values, dtype=float)
+    num = len(values)
+    if num == 0:
+        return np.empty(0)
+    starts = np.flatnonzero(boundaries)
+    if len(starts) == 0 or starts[0] != 0:
+        starts = np.concatenate(([0], starts))
+    lengths = np.diff(np.append(starts, num))
+    maxi = np.maximum.reduceat(values, starts)
+    mini = np.minimum.reduceat(values, starts)
+    total = np.add.reduceat(values, starts)
+    count = lengths.astype(float)
+    # the next boundary belongs also to the segment
+    nexts = values[starts[1:]]
+    maxi[:-1] = np.maximum(maxi[:-1], nexts)
+    mini[:-1] = np.minimum(mini[:-1], nexts)
+    total[:-1] += nexts
+    count[:-1] += 1
+    variation = (maxi - mini) / (total / count)
+    return np.repeat(variation, lengths)
+
+
+def rolling_median_filter(
+    ser: pd.Series, window: int = 50, num_std: float = 3, spread: str = "std"
+) -> pd.Series:
+    """
+    Remove the values far from the rolling median (vectorized median_filter).
+
+    Parameters
+    ----------
+    ser : pd.Series
+        a beat based series (eg sys_var, i_pr).
+    window : int, optional (default is 50)
+        number of beats in the (trailing) window.
+    num_std : float, optional (default is 3)
+        the accepted distance from the median (in spread units).
+    spread : str, optional (default is "std")
+        'std' (as median_filter) or 'mad' (scaled median absolute deviation).
+
+    Returns
+    -------
+    pd.Series
+        the values, NaN for the outliers and the incomplete windows.
+    """
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    values = ser.to_numpy(dtype=float)
+    filtered = np.full(len(values), np.nan)
+    if len(values) >= window:
+        view = sliding_window_view(values, window)
+        median = np.median(view, axis=1)
+        if spread == "mad":
+            dev = 1.4826 * np.median(np.abs(view - median[:, None]), axis=1)
+        else:
+            dev = view.std(axis=1)
+        last = values[window - 1 :]
+        inside = (median - num_std * dev <= last) & (last <= median + num_std * dev)
+        filtered[window - 1 :] = np.where(inside, last, np.nan)
+    return pd.Series(filtered, index=ser.index, name=ser.name)
+
+
+def pair_peaks(up_ploc: np.ndarray, down_ploc: np.ndarray) -> np.ndarray:
+    """
+    Return for each up peak the position (in down_ploc) of the preceding down peak.
+
+    Parameters
+    ----------
+    up_ploc : np.ndarray
+        the (sorted) point locations of the systolic peaks.
+    down_ploc : np.ndarray
+        the (sorted) point locations of the diastolic troughs.
+
+    Returns
+    -------
+    np.ndarray
+        indices in down_ploc, -1 if no trough since the previous systolic peak.
+    """
+    up_ploc = np.asarray(up_ploc)
+    down_ploc = np.asarray(down_ploc)
+    pairs = np.searchsorted(down_ploc, up_ploc, side="left") - 1
+    # the trough must be after the previous up peak (no shared trough)
+    previous = np.concatenate(([-1], up_ploc[:-1]))
+    valid = pairs >= 0
+    valid[valid] = down_ploc[pairs[valid]] > previous[valid]
+    return np.where(valid, pairs, -1)
+
+
+def pair_peak_tables(updf: pd.DataFrame, downdf: pd.DataFrame) -> pd.DataFrame:
+    """
+    Pair the systolic peaks with their preceding diastolic troughs.
+
+    Parameters
+    ----------
+    updf : pd.DataFrame
+        the systolic peaks (get_peaks(upp=True)).
+    downdf : pd.DataFrame
+        the diastolic troughs (get_peaks(upp=False)).
+
+    Returns
+    -------
+    pd.DataFrame
+        one row per systolic peak, columns '<name>_up' & '<name>_dwn'
+        (NaN if no trough), 'delta' = peak_heights_up - peak_heights_dwn.
+    """
+    pairs = pair_peaks(updf.ploc.to_numpy(), downdf.ploc.to_numpy())
+    dwn = downdf.reset_index(drop=True).reindex(pairs)  # -1 -> NaN row
+    dwn.index = updf.index
+    pp_df = pd.concat([updf.add_suffix("_up"), dwn.add_suffix("_dwn")], axis=1)
+    pp_df["delta"] = pp_df.peak_heights_up - pp_df.peak_heights_dwn
+    return pp_df
+
+
+def systolic_variation_table(
+    peakdf: pd.DataFrame,
+    troughdf: Optional[pd.DataFrame] = None,
+    window: int = 50,
+    num_std: float = 3,
+) -> pd.DataFrame:
+    """
+    Compute the beat based systolic variation table (no plot).
+
+    Parameters
+    ----------
+    peakdf : pd.DataFrame
+        the systolic peaks (get_peaks(upp=True) or MonitorWave.get_peaks()).
+    troughdf : pd.DataFrame, optional (default is None)
+        the diastolic troughs (get_peaks(upp=False)), for the pulse pressure.
+    window : int, optional (default is 50)
+        number of beats for the rolling median filter.
+    num_std : float, optional (default is 3)
+        outlier limit of the rolling median filter.
+
+    Returns
+    -------
+    pd.DataFrame
+        peakdf +
+        'sys_var' : (max - min) / mean of the systolic pressure between local maxima
+        'sys_var_filt' : sys_var without the outliers (rolling_median_filter)
+        'i_pr' : instantaneous pulse rate (bpm)
+        'pulse_pressure' & 'pp_var' : systolic - preceding diastolic pressure
+        and its variation (if troughdf is provided)
+    """
+    df = peakdf.copy()
+    df["sys_var"] = segment_variation(df.wap.to_numpy(), df.local_max.to_numpy())
+    df["sys_var_filt"] = rolling_median_filter(df.sys_var, window, num_std)
+    df["i_pr"] = (1 / (df.sloc - df.sloc.shift(1))) * 60
+    if troughdf is not None:
+        pairs = pair_peaks(df.ploc.to_numpy(), troughdf.ploc.to_numpy())
+        diastolic = np.where(pairs >= 0, troughdf.wap.to_numpy()[pairs], np.nan)
+        df["pulse_pressure"] = df.wap.to_numpy() - diastolic
+        paired = df.pulse_pressure.notna().to_numpy()
+        df["pp_var"] = np.nan
+        df.loc[paired, "pp_var"] = segment_variation(
+            df.pulse_pressure.to_numpy()[paired], df.local_max.to_numpy()[paired]
+        )
+    return df
+
+
+def respiratory_variation_table(beatdf: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compute the systolic and pulse pressure variations per respiratory cycle.
+
+    a cycle goes from a systolic local maximum to the next one (excluded),
+    the incomplete cycles (record boundaries) are dropped
+
+    Parameters
+    ----------
+    beatdf : pd.DataFrame
+        the beat table (systolic_variation_table with the troughs).
+
+    Returns
+    -------
+    pd.DataFrame
+        one row per cycle : 'start' & 'end' (sec), 'beats',
+        'sys_max', 'sys_min', 'spv' (mmHg), 'sys_var' ((max - min) / mean),
+        'pp_max', 'pp_min', 'ppv' ((max - min) / ((max + min) / 2))
+    """
+    columns = ["start", "end", "beats", "sys_max", "sys_min", "spv", "sys_var"]
+    columns += ["pp_max", "pp_min", "ppv"]
+    starts = np.flatnonzero(beatdf.local_max.to_numpy())
+    if len(starts) < 2:
+        return pd.DataFrame(columns=columns)
+    stop = starts[-1]
+    starts = starts[:-1]
+    sysp = beatdf.wap.to_numpy(dtype=float)[:stop]
+    if "pulse_pressure" in beatdf.columns:
+        pulse = beatdf.pulse_pressure.to_numpy(dtype=float)[:stop]
+    else:
+        pulse = np.full(stop, np.nan)
+    sloc = beatdf.sloc.to_numpy(dtype=float)
+    cycledf = pd.DataFrame(
+        {
+            "start": sloc[starts],
+            "end": sloc[np.append(starts[1:], stop)],
+            "beats": np.diff(np.append(starts, stop)),
+            "sys_max": np.maximum.reduceat(sysp, starts),
+            "sys_min": np.minimum.reduceat(sysp, starts),
+        }
+    )
+    cycledf["spv"] = cycledf.sys_max - cycledf.sys_min
+    cycledf["sys_var"] = cycledf.spv / (
+        np.add.reduceat(sysp, starts) / cycledf.beats
+    )
+    with np.errstate(invalid="ignore"):
+        # fmax / fmin : the unpaired beats (NaN) are ignored
+        cycledf["pp_max"] = np.fmax.reduceat(pulse, starts)
+        cycledf["pp_min"] = np.fmin.reduceat(pulse, starts)
+    cycledf["ppv"] = (cycledf.pp_max - cycledf.pp_min) / (
+        (cycledf.pp_max + cycledf.pp_min) / 2
+    )
+    return cycledf[columns]
+
+
 def plot_roi_systolic_pressure_variation(
     mwave: Any,
     teach: bool = False,
@@ -175,10 +417,9 @@ def plot_roi_systolic_pressure_variation(
             return float((maxi - mini) / med)
         return float((maxi - mini) / mean)
 
-    datadf = mwave.data[["etimesec", "wap"]].dropna().copy()
     if lims is None:
         lims = mwave.roi["sec"]
-    datadf = datadf.set_index("etimesec").loc[lims[0] : lims[1]]
+    datadf = mwave.get_roi_data(["wap"], lims).dropna()
 
     # plot the arterial pressure data
     fig = plt.figure()
@@ -188,9 +429,10 @@ def plot_roi_systolic_pressure_variation(
         ax.spines[spine].set_visible(False)
     ax.set_ymargin(0.1)
 
-    # find the (up) peaks
+    # find the (up) peaks (the record is filtered once, cf _FastWave.get_filtered)
     ser = datadf.wap.dropna()
-    peak_df = get_peaks(ser, upp=True, annotations=annotations)
+    detrended = mwave.get_roi_filtered("wap", lims)
+    peak_df = get_peaks(ser, upp=True, annotations=annotations, detrended=detrended)
     systolic_variation = deltavar(peak_df.wap, median=True)
     sys_var = f"{systolic_variation = :.2f}"
     print(sys_var)
@@ -208,14 +450,9 @@ def plot_roi_systolic_pressure_variation(
         )
 
     # compute delta_PP
-    peak_df_dwn = get_peaks(ser, upp=False)
-    peak_df_dwn.columns = [_ + "_dwn" for _ in peak_df_dwn.columns]
-
-    pp_df = peak_df.copy()
-    pp_df.columns = [_ + "_up" for _ in pp_df.columns]
-    pp_df = pd.concat([pp_df, peak_df_dwn], axis=1)
-    pp_df["delta"] = pp_df.peak_heights_up - pp_df.peak_heights_dwn
-    delta_variation = deltavar(pp_df.delta, median=False)
+    peak_df_dwn = get_peaks(ser, upp=False, detrended=detrended)
+    pp_df = pair_peak_tables(peak_df, peak_df_dwn)
+    delta_variation = deltavar(pp_df.delta.dropna(), median=False)
     delta_var = f"{delta_variation = :.2f}"
     print(delta_var)
 
@@ -342,29 +579,16 @@ def plot_record_systolic_variation(
     if "wap" not in mwave.data.columns:
         print("please provide a MonitorWave object that contains an arterial record")
         return plt.figure(), pd.DataFrame()
-    ap_ser = mwave.data.set_index("sec").wap.dropna()
+    ap_ser = mwave.data.set_index("etimesec").wap.dropna()
     # TODO filtering process?
     # ser = ser.rolling(10).apply(median_filter(num_std=3), raw=True)
-    df = get_peaks(ap_ser, annotations=annotations)
+    if annotations:
+        df = get_peaks(ap_ser, annotations=annotations)
+    else:
+        df = mwave.get_peaks("wap")  # cached
     # df = get_peaks(mwave.data.set_index("sec").wap.dropna())
 
-    df["sys_var"] = np.nan
-    # fs = int(mwaves.param["sampling_freq"])
-    # start = df.index.min()
-    end = df.index.max()
-    indexes = list(df.loc[df.local_max].index)
-    for bb1, bb2 in zip(
-        [
-            0,
-        ]
-        + indexes,
-        indexes
-        + [
-            end,
-        ],
-    ):
-        df.loc[bb1:bb2, "sys_var"] = compute_systolic_variation(df.loc[bb1:bb2, "wap"])
-    df["i_pr"] = (1 / (df.sloc - df.sloc.shift(1))) * 60
+    df = systolic_variation_table(df)
 
     fig = plt.figure()
     fig.suptitle("systolic variation over time")
@@ -375,15 +599,11 @@ def plot_record_systolic_variation(
         ax.plot(df.set_index("sloc").wap, "og")
     ax_t = ax.twinx()
     # heart rate
-    ser = (
-        df.set_index("sloc").i_pr.rolling(10).apply(median_filter(num_std=3), raw=True)
-    )
     ser = df.set_index("sloc").i_pr
     ser = ser.fillna(method="bfill").fillna(method="ffill")
     ax_t.plot(ser.rolling(10, center=True).mean(), ":k", linewidth=2)
     # sys_var
-    ser = df.set_index("sloc").sys_var * 100
-    ser = ser.rolling(50).apply(median_filter(num_std=3), raw=True)
+    ser = df.set_index("sloc").sys_var_filt * 100
     ser = ser.fillna(method="bfill").fillna(method="ffill")
     ax_t.plot(ser.dropna().rolling(10).mean(), "-b", label="sys_var med_rolmean")
     ax.set_ylim(50, 150)
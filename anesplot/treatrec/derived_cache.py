@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Created on Sun Oct 18 16:02:31 2026
+
+@author: cdesbois
+
+in memory cache of the signals derived from a record
+(baseline corrected traces, detected beats, peak tables):
+    - the key contains the trace name, the parameters and the data version
+    - least recently used items are dropped above a memory limit
+
+typical use (cf _FastWave.get_filtered)::
+
+    key = ("filtered", "wekg", "ndimage", self.data_version)
+    ser = self.derived.get_or_compute(key, lambda: fix_baseline_wander(...))
+
+"""
+
+import logging
+import sys
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+import numpy as np
+import pandas as pd
+
+
+def estimate_nbytes(obj: Any) -> int:
+    """Return the (approximative) memory size of a cached object."""
+    if isinstance(obj, (pd.Series, pd.DataFrame)):
+        return int(np.sum(obj.memory_usage(index=True, deep=False)))
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    return sys.getsizeof(obj)
+
+
+class DerivedCache:
+    """
+    Least recently used cache with a memory limit.
+
+    Attributes
+    ----------
+    maxbytes : int
+        the memory limit (bytes).
+    nbytes : int
+        the memory used by the cached items.
+    hits, misses : int
+        the cache statistics.
+    """
+
+    def __init__(self, maxbytes: int = 256 * 2**20) -> None:
+        self.maxbytes = maxbytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._items
+
+    def __repr__(self) -> str:
+        return (
+            f"DerivedCache({len(self)} items, {self.nbytes / 2**20:.1f} MB"
+            f" / {self.maxbytes / 2**20:.0f} MB, {self.hits=}, {self.misses=})"
+        )
+
+    def get_or_compute(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """
+        Return the cached value or compute (and store) it.
+
+        Parameters
+        ----------
+        key : Hashable
+            the key (name, trace, parameters, data version).
+        func : Callable[[], Any]
+            the function to compute the value.
+
+        Returns
+        -------
+        Any
+            the value (shared : don't modify it in place).
+        """
+        if key in self._items:
+            self.hits += 1
+            self._items.move_to_end(key)
+            return self._items[key][0]
+        self.misses += 1
+        value = func()
+        self.put(key, value)
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store a value (the least recently used items are dropped if required)."""
+        self.pop(key)
+        size = estimate_nbytes(value)
+        if size > self.maxbytes:
+            logging.info(f"{key} not cached ({size} bytes > {self.maxbytes})")
+            return
+        self._items[key] = (value, size)
+        self.nbytes += size
+        while self.nbytes > self.maxbytes:
+            _, (_, dropped) = self._items.popitem(last=False)
+            self.nbytes -= dropped
+
+    def pop(self, key: Hashable) -> Any:
+        """Remove an item, return its value (None if absent)."""
+        if key not in self._items:
+            return None
+        value, size = self._items.pop(key)
+        self.nbytes -= size
+        return value
+
+    def clear(self) -> None:
+        """Remove all the items."""
+        self._items.clear()
+        self.nbytes = 0
@@ -17,7 +17,6 @@ import numpy as np
 # import scipy.signal as sg
 
 from anesplot.treatrec.ekg_to_hr import detect_beats
-from anesplot.treatrec.wave_func import fix_baseline_wander
 
 # %%
 
@@ -40,14 +39,14 @@ def plot_roi_ekgbeat_overlap(
     fig : plt.Figure
         the matplotlib figure.
     """
-    ekgdf = mwave.data[["etimesec", "wekg"]].dropna().copy()  # pd.DataFrame
     if lims is None:
         lims = mwave.roi["sec"]
         # lims = (df.iloc[0].sec, df.iloc[0].sec + 60)
-    ekgdf = ekgdf.set_index("etimesec").loc[lims[0] : lims[1]]  # type: ignore
+    # only the roi is extracted (cf _FastWave.get_roi_data)
+    ekgdf = mwave.get_roi_data(["wekg"], lims).dropna()
 
-    # find the R peaks
-    ekgser = fix_baseline_wander(ekgdf.wekg, mwave.param["sampling_freq"])
+    # find the R peaks (the record is filtered once, cf _FastWave.get_filtered)
+    ekgser = mwave.get_roi_filtered("wekg", lims)
 
     beatloc_df = detect_beats(ekgser.dropna(), threshold=threshold)
     # beatloc_df["x_loc"] = ekgdf.index[beatloc_df.p_loc]
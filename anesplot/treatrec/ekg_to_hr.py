@@ -65,6 +65,8 @@ you can execute line by line in a file the following process
     ekg_df['wekg_lowpass'] = fix_baseline_wander(ekg_df.wekg,
                                                         waves.param['sampling_freq'])
     beatloc_df = tohr.detect_beats(ekg_df.wekg_lowpass, threshold=-1)
+    # or for a long record (same result, bounded memory)
+    beatloc_df = tohr.detect_beats_blocks(ekg_df.wekg_lowpass, threshold=-1, workers=4)
 
 3. perform the manual adjustments required:
 -------------------------------------------
@@ -117,16 +119,18 @@ you can execute line by line in a file the following process
 #   tohr.save_trends_data(mtrends.data, savename=name, dirpath='data')
 #    tohr.save_waves_data(mwaves.data, savename=name, dirpath='data')
 """
+from __future__ import annotations
+
 import os
-from typing import Any, Optional
+from typing import TYPE_CHECKING, Any, Callable, Optional
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
 # import pyperclip
-import scipy.signal as sg
-from scipy.interpolate import interp1d
+
+if TYPE_CHECKING:  # pyplot is imported when a plot is required
+    import matplotlib.pyplot as plt
 
 # import anesthPlot.treatrec.wave_func as wf
 # TODO import the paths construction
@@ -136,16 +140,14 @@ from scipy.interpolate import interp1d
 # %%
 
 
-def detect_beats(
-    ser: pd.Series, fs: int = 300, species: str = "horse", threshold: float = -1
-) -> pd.DataFrame:
+def beat_detection_params(
+    fs: int = 300, species: str = "horse", threshold: float = -1
+) -> dict[str, float]:
     """
-    Detect the peak locations of the beats.
+    Return the find_peaks parameters used to detect the beats.
 
     Parameters
     ----------
-    ser : pd.Series
-        the EKG time series.
     fs : int, optional (default is 300)
         sampling frequency.
     species : str, optional (default is "horse")
@@ -155,10 +157,9 @@ def detect_beats(
 
     Returns
     -------
-    df : pandas.DataFrame
+    dict
+        {height, distance, prominence, sign}, empty if the species is not parametrised.
     """
-    beatlocdf = pd.DataFrame()
-    # fs = param.get('fs', 300)
     if species == "horse":
         height = 1.0  # mini
         hr_max = 120  # bpm
@@ -168,15 +169,19 @@ def detect_beats(
         #    plateau_size= 1
     else:
         print("no parametrisation performed ... to be done")
-        return beatlocdf
+        return {}
     # correcttion
     height *= abs(threshold)
     prominence *= abs(threshold)
-    # detect
     sign = threshold / abs(threshold)  # +1 or -1 to invert the signal
-    ploc, beats_params = sg.find_peaks(
-        ser * sign, height=height, distance=distance, prominence=prominence
-    )
+    return dict(height=height, distance=distance, prominence=prominence, sign=sign)
+
+
+def build_beatlocdf(
+    ser: pd.Series, ploc: np.ndarray, beats_params: dict[str, np.ndarray]
+) -> pd.DataFrame:
+    """Build the beat location dataframe from the find_peaks output."""
+    beatlocdf = pd.DataFrame()
     beatlocdf["p_loc"] = ploc
     beatlocdf["x_loc"] = ser.index[beatlocdf.p_loc]
     for key in beats_params.keys():
@@ -187,6 +192,162 @@ def detect_beats(
     return beatlocdf
 
 
+def detect_beats(
+    ser: pd.Series, fs: int = 300, species: str = "horse", threshold: float = -1
+) -> pd.DataFrame:
+    """
+    Detect the peak locations of the beats.
+
+    Parameters
+    ----------
+    ser : pd.Series
+        the EKG time series.
+    fs : int, optional (default is 300)
+        sampling frequency.
+    species : str, optional (default is "horse")
+        the species.
+    threshold : float, optional (default is -1)
+        correction for qRs amplitude. (positive means higher than, negative means lower than)
+
+    Returns
+    -------
+    df : pandas.DataFrame
+    """
+    params = beat_detection_params(fs, species, threshold)
+    if not params:
+        return pd.DataFrame()
+    # detect
+    import scipy.signal as sg  # (slow import)
+
+    ploc, beats_params = sg.find_peaks(
+        ser * params["sign"],
+        height=params["height"],
+        distance=params["distance"],
+        prominence=params["prominence"],
+    )
+    return build_beatlocdf(ser, ploc, beats_params)
+
+
+def _block_candidates(
+    block: np.ndarray, start: int, stop: int, height: float
+) -> tuple[np.ndarray, np.ndarray]:
+    """Return the local maxima (higher than height) of block[start:stop]."""
+    import scipy.signal as sg  # (slow import)
+
+    peaks, props = sg.find_peaks(block, height=height)
+    # each peak belongs to one block only (no duplicate at the seams)
+    keep = (peaks >= start) & (peaks < stop)
+    return peaks[keep], props["peak_heights"][keep]
+
+
+def _select_by_distance(
+    peaks: np.ndarray, priority: np.ndarray, distance: float
+) -> np.ndarray:
+    """Remove the peaks closer than distance from a higher one (as find_peaks)."""
+    distance = int(np.ceil(distance))
+    keep = np.ones(len(peaks), dtype=bool)
+    for j in np.argsort(priority)[::-1]:
+        if not keep[j]:
+            continue
+        lower = np.searchsorted(peaks, peaks[j] - distance, side="right")
+        upper = np.searchsorted(peaks, peaks[j] + distance, side="left")
+        keep[lower:j] = False
+        keep[j + 1 : upper] = False
+    return keep
+
+
+def detect_beats_blocks(
+    ser: pd.Series,
+    fs: int = 300,
+    species: str = "horse",
+    threshold: float = -1,
+    blocksize: Optional[int] = None,
+    workers: int = 1,
+    processes: bool = False,
+) -> pd.DataFrame:
+    """
+    Detect the peak locations of the beats, the record being processed by blocks.
+
+    same output as detect_beats, but find_peaks is applied on overlapping blocks
+    (the intermediate arrays are bounded by the blocksize), then the refractory
+    distance and the prominence are applied on the (few) candidates.
+
+    Parameters
+    ----------
+    ser : pd.Series
+        the EKG time series.
+    fs : int, optional (default is 300)
+        sampling frequency.
+    species : str, optional (default is "horse")
+        the species.
+    threshold : float, optional (default is -1)
+        correction for qRs amplitude. (positive means higher than, negative means lower than)
+    blocksize : int, optional (default is None -> 10 minutes)
+        number of points per block.
+    workers : int, optional (default is 1)
+        number of threads (or processes) used to scan the blocks.
+    processes : bool, optional (default is False)
+        use a process pool instead of a thread pool.
+
+    Returns
+    -------
+    df : pandas.DataFrame
+    """
+    params = beat_detection_params(fs, species, threshold)
+    if not params:
+        return pd.DataFrame()
+    import scipy.signal as sg  # (slow import)
+
+    values = np.asarray(ser, dtype=float) * params["sign"]
+    if blocksize is None:
+        blocksize = fs * 600
+    # overlap = the refractory distance (the plateaus are preserved)
+    margin = int(np.ceil(params["distance"]))
+    blocksize = max(blocksize, margin)
+    blocks = []
+    for start in range(0, len(values), blocksize):
+        stop = min(start + blocksize, len(values))
+        first = max(0, start - margin)
+        # (view, core start, core stop, offset)
+        blocks.append(
+            (values[first : stop + margin], start - first, stop - first, first)
+        )
+    if workers > 1 and len(blocks) > 1:
+        # pylint: disable=import-outside-toplevel
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+        pool_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        with pool_class(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_block_candidates, block, start, stop, params["height"])
+                for block, start, stop, _ in blocks
+            ]
+            results = [future.result() for future in futures]
+    else:
+        results = [
+            _block_candidates(block, start, stop, params["height"])
+            for block, start, stop, _ in blocks
+        ]
+    results = [
+        (peaks + block[3], heights)
+        for (peaks, heights), block in zip(results, blocks)
+    ]
+    peaks = np.concatenate([_[0] for _ in results] + [np.empty(0, dtype=np.intp)])
+    heights = np.concatenate([_[1] for _ in results] + [np.empty(0)])
+    # refractory distance, then prominence (as find_peaks)
+    keep = _select_by_distance(peaks, heights, params["distance"])
+    peaks, heights = peaks[keep], heights[keep]
+    prominences, left_bases, right_bases = sg.peak_prominences(values, peaks)
+    keep = prominences >= params["prominence"]
+    beats_params = {
+        "peak_heights": heights[keep],
+        "prominences": prominences[keep],
+        "left_bases": left_bases[keep],
+        "right_bases": right_bases[keep],
+    }
+    return build_beatlocdf(ser, peaks[keep], beats_params)
+
+
 # ekg_df.wekg_lowpass, beat_df)
 def plot_beats(ekgdf: pd.DataFrame, beatlocdf: pd.DataFrame) -> plt.Figure:
     """
@@ -203,6 +364,8 @@ def plot_beats(ekgdf: pd.DataFrame, beatlocdf: pd.DataFrame) -> plt.Figure:
     -------
     fig : plt.Figure
     """
+    import matplotlib.pyplot as plt
+
     fig = plt.figure(figsize=(13, 5))
     fig.suptitle("verify the accuracy of the beat detection")
     ax0 = fig.add_subplot(211)
@@ -546,7 +709,77 @@ def point_to_time_rr(beatlocdf: pd.DataFrame, fs: Optional[int] = None) -> pd.Da
     return beatlocdf
 
 
-def interpolate_rr(beatlocdf: pd.DataFrame, kind: Optional[str] = None) -> pd.DataFrame:
+RR_COLUMNS = {
+    "rrInterpol": "rr",
+    "rrInterpolDiff": "rrDiff",
+    "rrInterpolSqDiff": "rrSqDiff",
+}
+
+
+def build_rr_interpolator(
+    beatlocdf: pd.DataFrame, kind: Optional[str] = None
+) -> Callable[[Any], pd.DataFrame]:
+    """
+    Fit the rr values (one spline per series) to evaluate them on demand.
+
+    Parameters
+    ----------
+    beatlocdf : pd.DataFrame
+        beat position (point based location : p_locs) and rr values
+        (cf point_to_time_rr).
+    kind : str, optional (default is None -> "cubic")
+        interpolation (in ['linear', 'cubic']
+
+    Returns
+    -------
+    Callable
+        func(points) -> pd.DataFrame (index = points,
+        columns = 'rrInterpol', 'rrInterpolDiff' & 'rrInterpolSqDiff'),
+        NaN outside the beats [first beat, last interval).
+    """
+    if kind is None:
+        kind = "cubic"
+    if kind not in ["linear", "cubic"]:
+        raise ValueError(f"{kind=} should be in ['linear', 'cubic']")
+    # prepare = sorting and removing possible duplicates
+    beatlocdf = beatlocdf.sort_values(by="p_loc")
+    beatlocdf = beatlocdf.drop_duplicates("p_loc")
+    rrx = beatlocdf.p_loc[:-1].to_numpy(dtype=float)  # rr locations
+    if kind == "cubic":
+        from scipy.interpolate import make_interp_spline  # (slow import)
+
+        # same spline as interp1d(kind="cubic")
+        splines = {
+            name: make_interp_spline(rrx, beatlocdf[col][:-1].to_numpy(), k=3)
+            for name, col in RR_COLUMNS.items()
+        }
+    else:
+        rrys = {
+            name: beatlocdf[col][:-1].to_numpy() for name, col in RR_COLUMNS.items()
+        }
+
+    def interpolator(points: Any) -> pd.DataFrame:
+        points = np.asarray(points)
+        inside = (points >= rrx[0]) & (points < rrx[-1])
+        rrdf = pd.DataFrame(index=points)
+        for name in RR_COLUMNS:
+            values = np.full(len(points), np.nan)
+            if kind == "cubic":
+                values[inside] = splines[name](points[inside])
+            else:
+                values[inside] = np.interp(points[inside], rrx, rrys[name])
+            rrdf[name] = values
+        return rrdf
+
+    return interpolator
+
+
+def interpolate_rr(
+    beatlocdf: pd.DataFrame,
+    kind: Optional[str] = None,
+    rate: Optional[float] = None,
+    fs: int = 300,
+) -> pd.DataFrame:
     """
     Interpolate the beat_df (pt -> time values).
 
@@ -556,39 +789,28 @@ def interpolate_rr(beatlocdf: pd.DataFrame, kind: Optional[str] = None) -> pd.Da
         beat position (point based location : p_locs).
     kind : str, optional (default is None -> "cubic")
         interpolation (in ['linear', 'cubic']
+    rate : float, optional (default is None -> every point)
+        the output rate (Hz), eg 4 for a hrv analysis.
+    fs : int, optional (default is 300)
+        the sampling frequency of the beat locations.
 
     Returns
     -------
     ahr_df : pd.DataFrame
         evenly spaced data with 'espts' = evenly spaced points & 'rrInterpol' = interpolated rr
     """
-    if kind is None:
-        kind = "cubic"
-    ahr_df = pd.DataFrame()
     # prepare = sorting and removing possible duplicates
     beatlocdf = beatlocdf.sort_values(by="p_loc")
     beatlocdf = beatlocdf.drop_duplicates("p_loc")
 
     first_beat_pt = int(beatlocdf.iloc[0].p_loc)
     last_beat_pt = int(beatlocdf.iloc[-2].p_loc)  # last interval
-    newx = np.arange(first_beat_pt, last_beat_pt)
-    # interpolate rr
-    rrx = beatlocdf.p_loc[:-1].values  # rr locations
-    rry = beatlocdf.rr[:-1].values  # rr values
-    interp = interp1d(rrx, rry, kind=kind)
-    newy = interp(newx)
-    ahr_df["espts"] = newx
-    ahr_df["rrInterpol"] = newy
-    # interpolate rrDiff
-    rry = beatlocdf.rrDiff[:-1].values
-    interp = interp1d(rrx, rry, kind=kind)
-    newy = interp(newx)
-    ahr_df["rrInterpolDiff"] = newy
-    # interpolate rrSqrDiff
-    rry = beatlocdf.rrSqDiff[:-1].values
-    interp = interp1d(rrx, rry, kind=kind)
-    newy = interp(newx)
-    ahr_df["rrInterpolSqDiff"] = newy
+    if rate is None:
+        newx = np.arange(first_beat_pt, last_beat_pt)
+    else:
+        newx = np.arange(first_beat_pt, last_beat_pt, fs / rate)
+    ahr_df = build_rr_interpolator(beatlocdf, kind)(newx).reset_index(drop=True)
+    ahr_df.insert(0, "espts", newx)
     return ahr_df
 
 
@@ -612,6 +834,8 @@ def plot_rr(
     """
     fs = param["sampling_freq"]
 
+    import matplotlib.pyplot as plt
+
     fig = plt.figure(figsize=(13, 5))
     ax = fig.add_subplot(211)
     ax.set_title("RR duration")
@@ -657,7 +881,11 @@ def plot_rr(
 # TOTO = correct wave.datetime (multiple repetitions of the same value)
 
 
-def append_rr_and_ihr_to_wave(ekgdf: pd.DataFrame, ahrdf: pd.DataFrame) -> pd.DataFrame:
+def append_rr_and_ihr_to_wave(
+    ekgdf: pd.DataFrame,
+    ahrdf: Optional[pd.DataFrame] = None,
+    beatlocdf: Optional[pd.DataFrame] = None,
+) -> pd.DataFrame:
     """
     Append rr and ihr to the waves based on pt value (ie index).
 
@@ -665,15 +893,24 @@ def append_rr_and_ihr_to_wave(ekgdf: pd.DataFrame, ahrdf: pd.DataFrame) -> pd.Da
     ----------
     ekgdf : pd.DataFrame
         waves data
-    ahrdf : pd.DataFrame
-        evenly spaced interpolated data.
+    ahrdf : pd.DataFrame, optional (default is None)
+        evenly spaced interpolated data (interpolate_rr).
+    beatlocdf : pd.DataFrame, optional (default is None)
+        the beats (point_to_time_rr) : the rr values are evaluated directly
+        on ekgdf.index (no intermediate ahrdf, no concatenation)
 
     Returns
     -------
     df : pd.DataFrame
         added iHR to ekgdf.
     """
-    df = pd.concat([ekgdf, ahrdf.set_index("espts")], axis=1)
+    if beatlocdf is not None:
+        df = ekgdf.copy()
+        rrdf = build_rr_interpolator(beatlocdf)(df.index.to_numpy())
+        for col in rrdf.columns:
+            df[col] = rrdf[col].to_numpy()
+    else:
+        df = pd.concat([ekgdf, ahrdf.set_index("espts")], axis=1)
     df["ihr"] = 1 / df.rrInterpol * 60 * 1000
     print("added instantaneous heart rate to a Wave dataframe")
     return df
@@ -681,6 +918,8 @@ def append_rr_and_ihr_to_wave(ekgdf: pd.DataFrame, ahrdf: pd.DataFrame) -> pd.Da
 
 def plot_agreement(trenddf: pd.DataFrame) -> plt.Figure:
     """Plot ip1HR & ihr to check agreement."""
+    import matplotlib.pyplot as plt
+
     fig = plt.figure()
     ax = fig.add_subplot(111)
     ax.plot(trenddf.hr)
@@ -691,7 +930,10 @@ def plot_agreement(trenddf: pd.DataFrame) -> plt.Figure:
 
 
 def append_ihr_to_trend(
-    trenddf: pd.DataFrame, wavedf: pd.DataFrame, ekgdf: pd.DataFrame
+    trenddf: pd.DataFrame,
+    wavedf: pd.DataFrame,
+    ekgdf: Optional[pd.DataFrame] = None,
+    beatlocdf: Optional[pd.DataFrame] = None,
 ) -> pd.DataFrame:
     """
     Append 'ihr' (instataneous heart rate) to the trends.
@@ -702,8 +944,11 @@ def append_ihr_to_trend(
         a monitor trend recording data (typically a MonitorTrend.data).
     wavedf : pd.DataFrame
         a monitor wave recording data (typillay a MonitorWave.data).
-    ekgdf : pd.DataFrame
-        the ekg dataframe.
+    ekgdf : pd.DataFrame, optional (default is None)
+        the ekg dataframe (with 'rrInterpol') -> median over the trend interval.
+    beatlocdf : pd.DataFrame, optional (default is None)
+        the beats (point_to_time_rr) -> rr evaluated at the middle of each
+        trend interval (no wave based array).
 
     Returns
     -------
@@ -712,12 +957,19 @@ def append_ihr_to_trend(
     """
     # build a new index
     ratio = len(wavedf) / len(trenddf)
-    ser = (wavedf.index.to_series() / ratio).astype(int)
-    # fill the data
-    ihrdf = pd.DataFrame()
-    ihrdf["ihr"] = 1 / ekgdf.rrInterpol * 60 * 1000
-    # downsample
-    ihrdf = ihrdf["ihr"].groupby(ser).median()
+    if beatlocdf is not None:
+        points = wavedf.index[0] + (np.arange(len(trenddf)) + 0.5) * ratio
+        rrdf = build_rr_interpolator(beatlocdf)(points)
+        ihrdf = pd.Series(
+            1 / rrdf.rrInterpol.to_numpy() * 60 * 1000, index=trenddf.index, name="ihr"
+        )
+    else:
+        ser = (wavedf.index.to_series() / ratio).astype(int)
+        # fill the data
+        ihrdf = pd.DataFrame()
+        ihrdf["ihr"] = 1 / ekgdf.rrInterpol * 60 * 1000
+        # downsample
+        ihrdf = ihrdf["ihr"].groupby(ser).median()
     # concatenate
     if "ihr" in trenddf.columns:
         trenddf.drop("ihr", axis=1, inplace=True)
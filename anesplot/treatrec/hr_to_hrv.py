@@ -4,10 +4,29 @@ Created on Wed Jul 31 16:05:29 2019
 
 @author: cdesbois
 
-rr to hrv ... to be continued (see Yann work)
+rr to hrv:
+    - time domain indices (sdnn, rmssd, pnn)
+    - frequency domain band powers (welch on the resampled rr, lomb-scargle on
+      the beats), for the whole record or over sliding windows
+    - time resolved band powers from the (batched) wavelet transform
+
+typical use::
+
+    beatlocdf = tohr.point_to_time_rr(beatloc_df)
+    indices = time_domain_indices(beatlocdf)
+    bandsdf = sliding_band_powers(beatlocdf, spec="horse", window=300, step=30)
 
 """
-from typing import Any
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy import signal
+from scipy.integrate import trapezoid
+
+from anesplot.treatrec.ekg_to_hr import interpolate_rr
+from anesplot.treatrec.wavelet_func import morlet_cwt
 
 
 def build_hrv_limits(spec: str = "horse") -> dict[str, Any]:
@@ -34,6 +53,332 @@ def build_hrv_limits(spec: str = "horse") -> dict[str, Any]:
     return dico
 
 
+def rr_series(beatlocdf: pd.DataFrame, fs: int = 300) -> pd.Series:
+    """
+    Return the rr intervals (ms) indexed by the beat time (sec).
+
+    Parameters
+    ----------
+    beatlocdf : pd.DataFrame
+        the beats (cf ekg_to_hr.point_to_time_rr : 'p_loc' & 'rr').
+    fs : int, optional (default is 300)
+        the sampling frequency of the beat locations.
+
+    Returns
+    -------
+    pd.Series
+        the rr values (the last beat, without a following one, is dropped).
+    """
+    beatlocdf = beatlocdf.sort_values(by="p_loc").drop_duplicates("p_loc")
+    rrser = pd.Series(
+        beatlocdf.rr.to_numpy()[:-1],
+        index=beatlocdf.p_loc.to_numpy()[:-1] / fs,
+        name="rr",
+    )
+    rrser.index.name = "sec"
+    return rrser.dropna()
+
+
+def time_domain_indices(
+    beatlocdf: pd.DataFrame, fs: int = 300, pnn: float = 50
+) -> pd.Series:
+    """
+    Compute the time domain hrv indices.
+
+    Parameters
+    ----------
+    beatlocdf : pd.DataFrame
+        the beats (cf ekg_to_hr.point_to_time_rr).
+    fs : int, optional (default is 300)
+        the sampling frequency of the beat locations.
+    pnn : float, optional (default is 50)
+        the successive differences threshold (ms).
+
+    Returns
+    -------
+    pd.Series
+        beats, mean_rr (ms), mean_hr (bpm), sdnn (ms), rmssd (ms), pnn (%).
+    """
+    rr = rr_series(beatlocdf, fs).to_numpy()
+    diff = np.diff(rr)
+    return pd.Series(
+        {
+            "beats": len(rr),
+            "mean_rr": rr.mean(),
+            "mean_hr": 60_000 / rr.mean(),
+            "sdnn": rr.std(ddof=1),
+            "rmssd": np.sqrt(np.mean(diff**2)),
+            "pnn": 100 * np.mean(np.abs(diff) > pnn),
+        },
+        name=f"pnn{pnn:g}",
+    )
+
+
+def band_powers(
+    freqs: np.ndarray, psd: np.ndarray, spec: str = "horse"
+) -> pd.DataFrame:
+    """
+    Integrate the spectral densities over the hrv bands.
+
+    Parameters
+    ----------
+    freqs : np.ndarray
+        the frequencies (Hz).
+    psd : np.ndarray
+        the power spectral densities (ms**2/Hz), one row per spectrum.
+    spec : str, optional (default is "horse")
+        the species (cf build_hrv_limits).
+
+    Returns
+    -------
+    pd.DataFrame
+        'VLF', 'LF', 'HF', 'total' (ms**2) and 'lf_hf' (ratio), one row per spectrum.
+    """
+    psd = np.atleast_2d(psd)
+    bandsdf = pd.DataFrame(index=range(len(psd)))
+    for band, (low, high) in build_hrv_limits(spec).items():
+        mask = (freqs >= low) & (freqs < high)
+        bandsdf[band] = trapezoid(psd[:, mask], freqs[mask], axis=-1)
+    bandsdf["total"] = bandsdf[["VLF", "LF", "HF"]].sum(axis=1)
+    bandsdf["lf_hf"] = bandsdf.LF / bandsdf.HF
+    return bandsdf
+
+
+def resample_rr(beatlocdf: pd.DataFrame, rate: float = 4, fs: int = 300) -> pd.Series:
+    """
+    Evenly resample the rr intervals (cubic spline, cf ekg_to_hr.interpolate_rr).
+
+    Parameters
+    ----------
+    beatlocdf : pd.DataFrame
+        the beats (cf ekg_to_hr.point_to_time_rr).
+    rate : float, optional (default is 4)
+        the output rate (Hz).
+    fs : int, optional (default is 300)
+        the sampling frequency of the beat locations.
+
+    Returns
+    -------
+    pd.Series
+        the rr values (ms) indexed by the time (sec).
+    """
+    ahrdf = interpolate_rr(beatlocdf, rate=rate, fs=fs)
+    rrser = pd.Series(
+        ahrdf.rrInterpol.to_numpy(), index=ahrdf.espts.to_numpy() / fs, name="rr"
+    )
+    rrser.index.name = "sec"
+    return rrser
+
+
+def lomb_psd(times: np.ndarray, values: np.ndarray, freqs: np.ndarray) -> np.ndarray:
+    """
+    Lomb-Scargle power spectral density (ms**2/Hz) of unevenly spaced values.
+
+    Parameters
+    ----------
+    times : np.ndarray
+        the beat times (sec).
+    values : np.ndarray
+        the rr values (ms).
+    freqs : np.ndarray
+        the frequencies (Hz).
+
+    Returns
+    -------
+    np.ndarray
+        one sided psd (a sinusoid of amplitude A -> A**2/2 once integrated).
+    """
+    values = values - values.mean()
+    pgram = signal.lombscargle(times, values, 2 * np.pi * freqs)
+    # schuster periodogram -> psd (mean sampling rate = n / duration)
+    duration = times[-1] - times[0]
+    return 2 * pgram * duration / len(times)
+
+
+def lomb_frequencies(
+    times: np.ndarray, spec: str = "horse", oversampling: int = 4
+) -> np.ndarray:
+    """
+    Return an evenly spaced frequency grid covering the hrv bands.
+
+    Parameters
+    ----------
+    times : np.ndarray
+        the beat times (sec).
+    spec : str, optional (default is "horse")
+        the species (cf build_hrv_limits).
+    oversampling : int, optional (default is 4)
+        the number of frequencies per spectral resolution (1 / duration).
+
+    Returns
+    -------
+    np.ndarray
+        the frequencies (Hz), up to the mean beat nyquist frequency
+        (the higher ones are aliases).
+    """
+    limits = build_hrv_limits(spec)
+    duration = times[-1] - times[0]
+    fmax = min(limits["HF"][1], len(times) / duration / 2)
+    return np.arange(limits["VLF"][0], fmax, 1 / (oversampling * duration))
+
+
+def spectral_indices(
+    beatlocdf: pd.DataFrame,
+    spec: str = "horse",
+    method: str = "welch",
+    fs: int = 300,
+    rate: float = 4,
+    nperseg: Optional[int] = None,
+) -> pd.Series:
+    """
+    Compute the frequency domain hrv indices over the whole beat table.
+
+    Parameters
+    ----------
+    beatlocdf : pd.DataFrame
+        the beats (cf ekg_to_hr.point_to_time_rr).
+    spec : str, optional (default is "horse")
+        the species (cf build_hrv_limits).
+    method : str, optional (default is "welch")
+        in ['welch', 'lomb'].
+    fs : int, optional (default is 300)
+        the sampling frequency of the beat locations.
+    rate : float, optional (default is 4)
+        the rr resampling rate (Hz, welch method).
+    nperseg : int, optional (default is None -> half of the points)
+        the welch segment length.
+
+    Returns
+    -------
+    pd.Series
+        'VLF', 'LF', 'HF', 'total' (ms**2) and 'lf_hf'.
+    """
+    if method == "welch":
+        rr = resample_rr(beatlocdf, rate, fs).to_numpy()
+        if nperseg is None:
+            nperseg = len(rr) // 2
+        freqs, psd = signal.welch(rr, fs=rate, nperseg=nperseg)
+    elif method == "lomb":
+        rrser = rr_series(beatlocdf, fs)
+        freqs = lomb_frequencies(rrser.index.to_numpy(), spec)
+        psd = lomb_psd(rrser.index.to_numpy(), rrser.to_numpy(), freqs)
+    else:
+        raise ValueError(f"{method=} should be in ['welch', 'lomb']")
+    return band_powers(freqs, psd, spec).iloc[0]
+
+
+def sliding_band_powers(
+    beatlocdf: pd.DataFrame,
+    spec: str = "horse",
+    method: str = "welch",
+    window: float = 300,
+    step: float = 30,
+    fs: int = 300,
+    rate: float = 4,
+) -> pd.DataFrame:
+    """
+    Compute the hrv band powers over sliding windows.
+
+    Parameters
+    ----------
+    beatlocdf : pd.DataFrame
+        the beats (cf ekg_to_hr.point_to_time_rr).
+    spec : str, optional (default is "horse")
+        the species (cf build_hrv_limits).
+    method : str, optional (default is "welch")
+        in ['welch', 'lomb'].
+    window : float, optional (default is 300)
+        the window duration (sec).
+    step : float, optional (default is 30)
+        the window shift (sec).
+    fs : int, optional (default is 300)
+        the sampling frequency of the beat locations.
+    rate : float, optional (default is 4)
+        the rr resampling rate (Hz, welch method).
+
+    Returns
+    -------
+    pd.DataFrame
+        'VLF', 'LF', 'HF', 'total', 'lf_hf', indexed by the window center (sec).
+    """
+    if method == "welch":
+        rrser = resample_rr(beatlocdf, rate, fs)
+        winpts = int(window * rate)
+        steppts = max(int(step * rate), 1)
+        if len(rrser) < winpts:
+            return pd.DataFrame(columns=["VLF", "LF", "HF", "total", "lf_hf"])
+        # all the windows at once (views, no copy)
+        windows = sliding_window_view(rrser.to_numpy(), winpts)[::steppts]
+        freqs, psd = signal.welch(windows, fs=rate, nperseg=winpts // 2, axis=-1)
+        bandsdf = band_powers(freqs, psd, spec)
+        starts = rrser.index[0] + np.arange(len(windows)) * steppts / rate
+    elif method == "lomb":
+        rrser = rr_series(beatlocdf, fs)
+        times = rrser.index.to_numpy()
+        starts = np.arange(times[0], times[-1] - window, step)
+        if not len(starts):
+            return pd.DataFrame(columns=["VLF", "LF", "HF", "total", "lf_hf"])
+        lows = np.searchsorted(times, starts)
+        highs = np.searchsorted(times, starts + window)
+        freqs = lomb_frequencies(times[lows[0] : highs[0]], spec)
+        psd = np.array(
+            [
+                lomb_psd(times[low:high], rrser.to_numpy()[low:high], freqs)
+                for low, high in zip(lows, highs)
+            ]
+        ).reshape(-1, len(freqs))
+        bandsdf = band_powers(freqs, psd, spec)
+    else:
+        raise ValueError(f"{method=} should be in ['welch', 'lomb']")
+    bandsdf.index = pd.Index(starts + window / 2, name="sec")
+    return bandsdf
+
+
+def wavelet_band_powers(
+    beatlocdf: pd.DataFrame,
+    spec: str = "horse",
+    fs: int = 300,
+    rate: float = 4,
+    nfreq: int = 16,
+) -> pd.DataFrame:
+    """
+    Time resolved hrv band powers (morlet wavelet transform, all scales at once).
+
+    Parameters
+    ----------
+    beatlocdf : pd.DataFrame
+        the beats (cf ekg_to_hr.point_to_time_rr).
+    spec : str, optional (default is "horse")
+        the species (cf build_hrv_limits).
+    fs : int, optional (default is 300)
+        the sampling frequency of the beat locations.
+    rate : float, optional (default is 4)
+        the rr resampling rate (Hz).
+    nfreq : int, optional (default is 16)
+        the number of (log spaced) frequencies per band.
+
+    Returns
+    -------
+    pd.DataFrame
+        'VLF', 'LF', 'HF' : mean power (amplitude**2 / 2, ms**2) of the band
+        frequencies, indexed by the time (sec).
+    """
+    rrser = resample_rr(beatlocdf, rate, fs)
+    rr = rrser.to_numpy() - rrser.mean()
+    limits = build_hrv_limits(spec)
+    # (the frequencies above nyquist are not reachable)
+    bands = {
+        band: np.geomspace(low, min(high, rate / 2), nfreq, endpoint=False)
+        for band, (low, high) in limits.items()
+    }
+    coefs = morlet_cwt(rr, np.concatenate(list(bands.values())), 1 / rate)
+    powers = np.abs(coefs) ** 2 / 2
+    bandsdf = pd.DataFrame(index=rrser.index)
+    for i, band in enumerate(bands):
+        bandsdf[band] = powers[i * nfreq : (i + 1) * nfreq].mean(axis=0)
+    return bandsdf
+
+
 # %%
 if __name__ == "__main__":
     hrv_dico = build_hrv_limits("horse")
@@ -8,9 +8,9 @@ functions ued to extract the events from the taphonius files
 
 """
 import logging
-from datetime import datetime, timedelta
+import re
 from math import ceil
-from typing import Any, Optional, Tuple, Union
+from typing import Any, Iterable, Optional, Tuple
 
 import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
@@ -74,6 +74,30 @@ def extract_taphmessages(df: pd.DataFrame, display: bool = False) -> Tuple[Any,
     return acts, content
 
 
+# line breaks (as str.splitlines)
+LINE_BREAKS = r"\r\n|[\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]"
+# 'hh:mm:ss(.ms)' event times (most of the messages)
+TIME_OF_DAY = r"^\d{1,2}:\d{2}:\d{2}(?:\.\d+)?$"
+
+
+def parse_time_of_day(txt: str) -> Any:
+    """Return the time of the day (pd.Timedelta) of an event time (NaT if not valid)."""
+    if " am" in txt:
+        txt = txt.replace(" am", "") + " am"
+    if " pm" in txt:
+        txt = txt.replace(" pm", "") + " pm"
+    try:
+        eventtime = pd.to_datetime(txt).time()
+    except (pd.errors.OutOfBoundsDatetime, pd.errors.ParserError, ValueError):
+        return pd.NaT
+    return pd.Timedelta(
+        hours=eventtime.hour,
+        minutes=eventtime.minute,
+        seconds=eventtime.second,
+        microseconds=eventtime.microsecond,
+    )
+
+
 def build_event_dataframe(datadf: pd.DataFrame) -> pd.DataFrame:
     """
     Build a pandas datafame with a countinuous datetime:event pairs.
@@ -87,84 +111,134 @@ def build_event_dataframe(datadf: pd.DataFrame) -> pd.DataFrame:
     -------
     dteventsdf : pd.DataFrame
         dataframe with index=datetime.
+
+    NB : messages sharing the same time in a record line -> the last one is kept,
+    messages sharing the time of previous lines -> shifted by 1 ms per previous.
     """
     dteventsdf = pd.DataFrame(columns=["events"])
     if datadf.empty:
         logging.warning("empty dataframe")
         return dteventsdf
-    df = datadf[["events", "dtime"]].dropna().set_index("dtime")
-    df.events = df.events.apply(
-        lambda st: [_.strip("[").strip("]") for _ in st.splitlines()]
-    )
-    if df.events.dropna().empty:
+    df = datadf[["events", "dtime"]].dropna().reset_index(drop=True)
+    if df.empty:
         logging.warning("no events in the recording")
         return dteventsdf
-    # linearize the events
-    events_ser = pd.Series(name="events", dtype=str)
-    events_ser.flags.allows_duplicate_labels = False
-    for index, line in df.events.iteritems():
-        # break if injection event eg
-        # SD2015MAR1-5_58_19.csv
-        t_event = {
-            (_.split("-")[0].strip().lower(), _.split("-")[-1].strip().lower())
-            for _ in line
-            if _
+    # linearize the events : one row per message line
+    lines = df.events.astype(str).str.split(LINE_BREAKS).explode()
+    lines = lines.str.strip("[").str.strip("]")
+    # (row = the record line)
+    eventdf = pd.DataFrame(
+        {
+            "row": lines.index,
+            "dtime": df.dtime.to_numpy()[lines.index],
+            "line": lines.to_numpy(),
         }
-        dico = {}
-        indexdate = index.date()
-        indextime = index.time()
-        for time, event in t_event:
-            if len(time) >= 16:
-                event = time.split("]")[-1].strip()
-                time = time.split("]")[0]
-            if " am" in time:
-                time = time.replace(" am", "") + " am"
-            if " pm" in time:
-                time = time.replace(" pm", "") + " pm"
-            try:
-                eventtime = pd.to_datetime(time).time()
-            except pd.errors.OutOfBoundsDatetime:
-                eventtime = index.time()
-            except pd.errors.ParserError:
-                eventtime = index.time()
-            except ValueError:
-                eventtime = index.time()
-            # TODO - to be improved for speed
-            themoment = datetime.combine(indexdate, eventtime)
-            # check overlap minutes/day around midnight
-            moment_minus_index = themoment - datetime.combine(indexdate, indextime)
-            if moment_minus_index.total_seconds() / 60 > 60:
-                themoment = themoment - timedelta(days=1)
-            dico[themoment] = event
-
-        batch = pd.Series(dico, dtype="object", name="events")
-        #        if batch.index.values in events_ser.index.values:
-        if set(batch.index.values) & set(events_ser.index.values):
-            # two events at the same index -> index has to be shifted
-            newtimes = []
-            for datet in batch.index:
-                if datet in events_ser:
-                    datet = datet + timedelta(milliseconds=1)
-                newtimes.append(datet)
-                logging.warning(f"{newtimes}")
-            batch = batch.set_axis(newtimes)
-        events_ser = pd.concat([events_ser, batch])
-    dteventsdf = pd.DataFrame(events_ser)
-    dteventsdf = dteventsdf.sort_index()
-    dteventsdf.index = pd.to_datetime(dteventsdf.index)
+    )
+    eventdf = eventdf.loc[eventdf.line.str.len() > 0]
+    # eg "07:19:04.429 - preset loaded: chris"
+    parts = eventdf.line.str.split("-")
+    times = parts.str[0].str.strip().str.lower()
+    events = parts.str[-1].str.strip().str.lower()
+    # eg "16 april 2021 07:19:09] records started"
+    dated = times.str.len() >= 16
+    events = events.mask(dated, times.str.split("]").str[-1].str.strip())
+    times = times.mask(dated, times.str.split("]").str[0])
+    eventdf["events"] = events
+    # time of the day : vectorized for 'hh:mm:ss', one parse per other value
+    clocks = times.str.match(TIME_OF_DAY)
+    tods = pd.Series(pd.NaT, index=times.index, dtype="timedelta64[ns]")
+    tods[clocks] = pd.to_timedelta(times[clocks], errors="coerce")
+    others = times[~clocks]
+    tods[~clocks] = others.map(
+        {txt: parse_time_of_day(txt) for txt in others.unique()}
+    ).astype("timedelta64[ns]")
+    tods = tods.where(tods < pd.Timedelta(days=1))
+    # the moments (record line time if not parsable), day rollover
+    moments = eventdf.dtime.dt.normalize() + tods
+    moments = moments.fillna(eventdf.dtime)
+    overday = moments - eventdf.dtime > pd.Timedelta(minutes=60)
+    eventdf["moment"] = moments.mask(overday, moments - pd.Timedelta(days=1))
+    # one message per moment in a record line
+    eventdf = eventdf.drop_duplicates(subset=["row", "moment"], keep="last")
+    # two events at the same moment -> the following ones are shifted (1 ms each)
+    shifts = eventdf.groupby("moment").cumcount()
+    if shifts.any():
+        logging.warning(f"{(shifts > 0).sum()} event(s) shifted by 1 ms")
+        eventdf["moment"] += pd.to_timedelta(shifts, unit="ms")
+    dteventsdf = pd.DataFrame(
+        {"events": eventdf.events.to_numpy()},
+        index=pd.DatetimeIndex(eventdf.moment.to_numpy()),
+    )
+    dteventsdf = dteventsdf.sort_index(kind="stable")
     return dteventsdf
 
 
+# the ventilation actions (columns of the ventilation drive)
+VENTIL_ACTS = [
+    "cpap value changed",
+    "mwpl value changed",
+    "rr changed",
+    "tidal volume changed",
+    "buffer vol",
+    "it",
+    "ip",
+]
+# nb in the taphonius, the default setings are not included in the recorded data
+DEFAULT_CHRIS = {
+    "tidal": 7,
+    "rr": 8,
+    "it": 2,
+    "ip": 10,
+    "mwpl": 55,
+    "cpap": 5,
+    "buffer": 10,
+}
+
+
+def end_of_line_to_float(line: str) -> float:
+    """Return the float value of the last word, else NaN."""
+    line = line.split(" ")[-1].replace("s", "")
+    try:
+        val = float(line)
+    except ValueError:
+        try:
+            # old files
+            val = float(line.replace(",", "."))
+        except ValueError:
+            val = np.nan
+    return val
+
+
+def end_of_lines_to_floats(lines: pd.Series) -> pd.Series:
+    """Vectorized end_of_line_to_float."""
+    words = lines.str.extract(r"([^ ]*)$", expand=False)
+    words = words.str.replace("s", "", regex=False)
+    vals = pd.to_numeric(words, errors="coerce")
+    # old files
+    commas = pd.to_numeric(words.str.replace(",", ".", regex=False), errors="coerce")
+    return vals.fillna(commas).astype(float)
+
+
+def act_pattern(act: str) -> str:
+    """Return the regex of an action (a single word is surrounded by spaces)."""
+    if len(act.split(" ")) > 1:
+        return re.escape(act)
+    return re.escape(" " + act + " ")
+
+
 def extract_ventilation_drive(
-    dteventsdf: pd.DataFrame, acts: Optional[set[Any]] = None
+    dteventsdf: pd.DataFrame, acts: Optional[Iterable[str]] = None
 ) -> pd.DataFrame:
     """Extract a dataframe containing the ventilatory management.
 
+    one pass over the events : all the actions (and the run states) are
+    matched by a single regex alternation (overlapping matches included)
+
     Parameters
     ----------
     dteventsdf : pd.DataFrame
         a container for taph generated events (dtime as index, event as column).
-    acts : set, optional (default is None)
+    acts : iterable, optional (default is None -> VENTIL_ACTS)
         container for action messages.
 
     Returns
@@ -174,93 +248,62 @@ def extract_ventilation_drive(
     if dteventsdf.empty:
         logging.warning("extract_ventilation_drive: dt_event_df is empty")
         return pd.DataFrame()
-
-    if acts is None:
-        acts = {
-            "cpap value changed",
-            "mwpl value changed",
-            "rr changed",
-            "tidal volume changed",
-            "buffer vol",
-            "it",
-            "ip",
-        }
-    # nb in the taphonius, the default setings are not included in the recorded data
-    default_chris = {
-        "tidal": 7,
-        "rr": 8,
-        "it": 2,
-        "ip": 10,
-        "mwpl": 55,
-        "cpap": 5,
-        "buffer": 10,
-    }
-    runs = {"ventilate": True, "standby": False}
-
-    def end_of_line_to_float(line: str) -> Union[float, None]:
-        """Return float value else None."""
-        line = line.split(" ")[-1].replace("s", "")
-        try:
-            val = float(line)
-        except ValueError:
-            try:
-                # old files
-                val = float(line.replace(",", "."))
-            except ValueError:
-                # print(f"end_of_line_to_float: fix me for '{line}'")
-                val = np.nan
-        return val
+    acts = VENTIL_ACTS if acts is None else list(acts)
 
     assert (
         dteventsdf.index.is_unique
     ), "extract_ventilation_drive: check unicity for dteventsdf.index"
 
     dteventsdf = dteventsdf.replace("NAN", np.nan)
-    # extract the ventilation period -> ventilation True or False
-    dteventsdf["ventil"] = np.nan
-    dteventsdf.iloc[0, dteventsdf.columns.get_loc("ventil")] = False
-    runs = {"ventilate": True, "standby": False}
-    for k, bol in runs.items():
-        for datet, event in dteventsdf.events.iteritems():
-            if k in event:
-                dteventsdf.loc[datet, ["ventil"]] = bol
-    dteventsdf.ventil = dteventsdf.ventil.ffill()
-
+    events = dteventsdf.events.fillna("").astype(str)
+    # classify : one named group per pattern, lookahead -> all the matches
+    patterns = {f"g{i}": act_pattern(act) for i, act in enumerate(acts)}
+    patterns.update({"ventilate": "ventilate", "standby": "standby"})
+    names = dict(zip(patterns, acts + ["ventilate", "standby"]))
+    regex = "|".join(f"(?P<{name}>{pat})" for name, pat in patterns.items())
+    # (most of the events are not concerned)
+    candidates = events.reset_index(drop=True)
+    candidates = candidates[candidates.str.contains("|".join(patterns.values()))]
+    matches = candidates.str.extractall(re.compile(f"(?={regex})"))
+    found = matches.notna().groupby(level=0).any()
+    found = found.reindex(range(len(events)), fill_value=False)
+    found.columns = [names[col] for col in found.columns]
+    found.index = dteventsdf.index
+
+    # the ventilation period -> ventilation True or False (standby first)
+    ventil = pd.Series(np.nan, index=dteventsdf.index, dtype=object)
+    ventil.iloc[0] = False
+    ventil[found.ventilate] = True
+    ventil[found.standby] = False
+    dteventsdf["ventil"] = ventil.ffill().astype(bool)
+
+    # the 'to' values (action messages only)
+    actions = found[acts].any(axis=1)
+    to_vals = end_of_lines_to_floats(events[actions]).reindex(events.index)
     for act in acts:
-        if len(act.split(" ")) > 1:
-            # two words in act
-            mask = dteventsdf.events.str.contains(act)
-        else:
-            mask = dteventsdf.events.str.contains(" " + act + " ")
-        dteventsdf[act] = np.nan
-        if len(mask.unique()) > 1:
-            # fill with change messages
-            dteventsdf.loc[mask, [act]] = dteventsdf.events
-            # replace first line with the first 'changed from ...'
-            first_message = dteventsdf.loc[mask, [act]].iloc[0][act]
+        mask = found[act]
+        default = DEFAULT_CHRIS.get(act.split(" ")[0], np.nan)
+        if mask.nunique() > 1:
+            values = to_vals.where(mask)
+            # first line : the first 'changed from ...' value
+            first_message = events[mask].iloc[0]
             from_message = first_message.split("to")[0].strip(" ")
-            if default_chris[act.split(" ")[0]] == end_of_line_to_float(from_message):
-                dteventsdf.iloc[0, dteventsdf.columns.get_loc(act)] = from_message
-            else:
+            from_value = end_of_line_to_float(from_message)
+            if default != from_value:
                 # replace the from extracted value by the defauls one
                 # taph bug : first message ie cpap value changed from 0, not preset 5)
                 logging.warning(
                     f"first value is differant from default_settings for '{act}'"
                 )
                 logging.warning(f"replaced '{from_message}'")
-                logging.warning(
-                    f"by '{default_chris[act.split(' ')[0]]}' (as initial '{act}' value)"
-                )
-                dteventsdf.iloc[0, dteventsdf.columns.get_loc(act)] = str(
-                    default_chris[act.split(" ")[0]]
-                )
-            # to values extraction and fill
-            dteventsdf[act] = dteventsdf[act].dropna().apply(end_of_line_to_float)
-            dteventsdf[act] = dteventsdf[act].ffill()
+                logging.warning(f"by '{default}' (as initial '{act}' value)")
+                from_value = end_of_line_to_float(str(default))
+            values.iloc[0] = from_value
+            values = values.ffill()
         else:
-            dteventsdf[act] = default_chris.get(act.split(" ")[0], np.nan)
+            values = pd.Series(default, index=dteventsdf.index, dtype=float)
         # remove non ventilate values
-        dteventsdf.loc[~dteventsdf.ventil, [act]] = np.nan
+        dteventsdf[act] = values.where(dteventsdf.ventil)
 
     return dteventsdf.dropna(how="all", axis=1)
 
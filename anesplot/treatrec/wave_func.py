@@ -7,18 +7,92 @@ Created on Fri Dec  8 12:46:41 2017
 functions to be used with the waves recording
 
 """
-from typing import Any, Optional
+from __future__ import annotations
 
-import matplotlib.pyplot as plt
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, Optional
 
 # import os
 import numpy as np
 import pandas as pd
-from scipy.signal import medfilt
+
+if TYPE_CHECKING:  # pyplot is imported when a plot is required
+    import matplotlib.pyplot as plt
 
 
 # //////////////////////////////////////////////// cardio
-def fix_baseline_wander(ekg_ser: pd.Series, fs: int = 300) -> pd.Series:
+BASELINE_METHODS = ["ndimage", "medfilt", "decimate"]
+
+
+def baseline_kernels(fs: float = 300) -> tuple[int, int]:
+    """Return the (odd) median kernel sizes : 0.2 sec and 0.6 sec."""
+    kernels = []
+    for duration in [0.2, 0.6]:
+        winsize = int(round(duration * fs))
+        if winsize % 2 == 0:
+            winsize += 1
+        kernels.append(winsize)
+    return kernels[0], kernels[1]
+
+
+def compute_baseline(
+    ekg_array: np.ndarray, fs: float = 300, method: str = "ndimage"
+) -> np.ndarray:
+    """
+    Compute the baseline : two cascaded running medians (0.2 and 0.6 sec).
+
+    Parameters
+    ----------
+    ekg_array : np.ndarray
+        the wave values.
+    fs : float, optional (default is 300)
+        the sampling frequency.
+    method : str, optional (default is "ndimage")
+        - 'ndimage' : scipy.ndimage.median_filter (same result as medfilt)
+        - 'medfilt' : scipy.signal.medfilt (the original implementation)
+        - 'decimate' : medians on a decimated trace, linearly interpolated
+          (approximation, faster on long traces)
+
+    Returns
+    -------
+    np.ndarray
+        the baseline.
+    """
+    kernels = baseline_kernels(fs)
+    values = np.asarray(ekg_array, dtype=float)
+    if method == "medfilt":
+        from scipy.signal import medfilt  # (slow import)
+
+        for kernel in kernels:
+            values = medfilt(values, kernel_size=kernel)
+        return values
+    # pylint: disable=import-outside-toplevel
+    from scipy.ndimage import median_filter  # (slow import)
+
+    if method == "ndimage":
+        # zero padding at the edges, as medfilt
+        for kernel in kernels:
+            values = median_filter(values, size=kernel, mode="constant", cval=0)
+        return values
+    if method == "decimate":
+        step = max(1, kernels[0] // 15)
+        if step == 1 or len(values) < 2 * step:
+            return compute_baseline(values, fs, "ndimage")
+        nblocks = len(values) // step
+        blocks = np.median(values[: nblocks * step].reshape(nblocks, step), axis=1)
+        if len(values) > nblocks * step:
+            blocks = np.append(blocks, np.median(values[nblocks * step :]))
+        for kernel in kernels:
+            kernel = max(1, kernel // step) | 1
+            blocks = median_filter(blocks, size=kernel, mode="constant", cval=0)
+        centers = np.arange(len(blocks)) * step + (step - 1) / 2
+        centers[-1] = min(centers[-1], len(values) - 1)
+        return np.interp(np.arange(len(values)), centers, blocks)
+    raise ValueError(f"{method=} should be in {BASELINE_METHODS}")
+
+
+def fix_baseline_wander(
+    ekg_ser: pd.Series, fs: int = 300, method: str = "ndimage"
+) -> pd.Series:
     """
     BaselineWanderRemovalMedian from ecg-kit.
 
@@ -33,6 +107,8 @@ def fix_baseline_wander(ekg_ser: pd.Series, fs: int = 300) -> pd.Series:
         the wave recording.
     fs : int, optional (default is 300)
         The sampling frequency.
+    method : str, optional (default is "ndimage")
+        the running median implementation (cf compute_baseline).
 
     Returns
     -------
@@ -47,21 +123,60 @@ def fix_baseline_wander(ekg_ser: pd.Series, fs: int = 300) -> pd.Series:
     # print("https://bitbucket.org/atpage/baselinewanderremoval/src/master/")
 
     ekg_array = ekg_ser.values
-    winsize = int(round(0.2 * fs))
-    # delayBLR = round((winsize-1)/2)
-    if winsize % 2 == 0:
-        winsize += 1
-    baseline_array = medfilt(ekg_array, kernel_size=winsize)
-    winsize = int(round(0.6 * fs))
-    # delayBLR = delayBLR + round((winsize-1)/2)
-    if winsize % 2 == 0:
-        winsize += 1
-    baseline_array = medfilt(baseline_array, kernel_size=winsize)
+    baseline_array = compute_baseline(ekg_array, fs, method)
     ekg_filtered = ekg_array - baseline_array
     # return ecg_blr.tolist()
     return pd.Series(data=ekg_filtered, index=ekg_ser.index)
 
 
+def iter_fix_baseline_wander(
+    chunks: Iterable[pd.Series], fs: int = 300, method: str = "ndimage"
+) -> Iterator[pd.Series]:
+    """
+    Remove the baseline wander of a chunked trace (eg iter_wave_chunks).
+
+    the chunks are processed with the overlap required by the two medians,
+    ('ndimage' and 'medfilt' -> same result as fix_baseline_wander on the
+    whole trace)
+
+    Parameters
+    ----------
+    chunks : Iterable[pd.Series]
+        the consecutive parts of the wave recording.
+    fs : int, optional (default is 300)
+        The sampling frequency.
+    method : str, optional (default is "ndimage")
+        the running median implementation (cf compute_baseline).
+
+    Yields
+    ------
+    pd.Series
+        the ekg filtered series (same index as the input), lagging of
+        the filters half widths.
+    """
+    # points required on each side to compute an exact value
+    half = sum((kernel - 1) // 2 for kernel in baseline_kernels(fs))
+    values = np.empty(0)
+    index: Optional[pd.Index] = None
+    done = 0  # the first points of the buffer are the left context
+    for chunk in chunks:
+        values = np.concatenate((values, np.asarray(chunk.values, dtype=float)))
+        index = chunk.index if index is None else index.append(chunk.index)
+        ready = len(values) - half
+        if ready <= done:
+            continue
+        baseline = compute_baseline(values, fs, method)
+        yield pd.Series(
+            values[done:ready] - baseline[done:ready], index=index[done:ready]
+        )
+        keep = max(0, ready - half)
+        values, index = values[keep:], index[keep:]
+        done = ready - keep
+    if index is not None and len(values) > done:
+        baseline = compute_baseline(values, fs, method)
+        yield pd.Series(values[done:] - baseline[done:], index=index[done:])
+
+
 def rol_mean(ser: pd.Series, win_lengh: int = 1, fs: int = 500) -> pd.Series:
     """
     Return a rolling mean of a RR serie.
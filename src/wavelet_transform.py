@@ -1,5 +1,4 @@
 import numpy as np
-from scipy import signal
 
 
 ### MORLET WAVELET, definition, properties and normalization
@@ -40,18 +39,8 @@ def norm_constant_th(freq, dt, w0=6.0):
 def my_cwt(data, frequencies, dt, w0=6.0):
     """
     wavelet transform with normalization to catch the amplitude of a sinusoid
+    (cf anesplot.treatrec.wavelet_func.morlet_cwt, all the scales at once)
     """
-    output = np.zeros([len(frequencies), len(data)], dtype=np.complex)
-
-    for ind, freq in enumerate(frequencies):
-        wavelet_data = np.conj(get_Morlet_of_right_size(freq, dt, w0=w0))
-        sliding_mean = signal.convolve(
-            data, np.ones(len(wavelet_data)) / len(wavelet_data), mode="same"
-        )
-        # the final convolution
-        wavelet_data_norm = norm_constant_th(freq, dt, w0=w0)
-        output[ind, :] = (
-            signal.convolve(data - sliding_mean + 0.0 * 1j, wavelet_data, mode="same")
-            / wavelet_data_norm
-        )
-    return output
+    from anesplot.treatrec.wavelet_func import morlet_cwt
+
+    return morlet_cwt(data, frequencies, dt, w0=w0)
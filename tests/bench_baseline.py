@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Created on Sun Oct 18 15:12:44 2026
+
+@author: cdesbois
+
+baseline wander removal benchmark:
+    the compute_baseline methods (and the chunked iter_fix_baseline_wander)
+    are compared with the original scipy.signal.medfilt implementation
+    (duration and maximal difference)
+
+use::
+
+    python tests/bench_baseline.py [--hours 2] [--wavefile <a monitor wave file>]
+
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from anesplot.treatrec import wave_func
+
+
+def build_trace(hours: float, fs: int = 300) -> pd.Series:
+    """Build a synthetic ekg like trace (spikes + wander + noise)."""
+    rng = np.random.default_rng(0)
+    times = np.arange(int(hours * 3600 * fs)) / fs
+    values = (
+        np.sin(2 * np.pi * 0.2 * times)
+        + 3 * (np.mod(times, 0.8) < 0.03)
+        + rng.normal(0, 0.05, len(times))
+    )
+    return pd.Series(values)
+
+
+def main() -> None:
+    """Print the durations and the differences with medfilt."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[2])
+    parser.add_argument("--hours", type=float, default=2)
+    parser.add_argument("--wavefile", default=None, help="use the wekg of a record")
+    parser.add_argument("--chunk", type=int, default=300 * 600, help="chunk size")
+    args = parser.parse_args()
+    fs = 300
+    if args.wavefile:
+        # pylint: disable=import-outside-toplevel
+        from anesplot.loadrec.loadmonitor_waverecord import loadmonitor_wavedata
+
+        ser = loadmonitor_wavedata(args.wavefile).wekg.fillna(0)
+    else:
+        ser = build_trace(args.hours, fs)
+    print(f"{len(ser)} points ({len(ser) / fs / 3600:.2f} h at {fs} Hz)")
+    start = time.perf_counter()
+    reference = wave_func.compute_baseline(ser.values, fs, "medfilt")
+    print(f"{'medfilt (reference)':25} {time.perf_counter() - start:7.2f} s")
+    for method in wave_func.BASELINE_METHODS[::-1]:
+        if method == "medfilt":
+            continue
+        start = time.perf_counter()
+        baseline = wave_func.compute_baseline(ser.values, fs, method)
+        duration = time.perf_counter() - start
+        diff = np.abs(baseline - reference).max()
+        print(f"{method:25} {duration:7.2f} s   max diff {diff:.3g}")
+    chunks = (ser.iloc[i : i + args.chunk] for i in range(0, len(ser), args.chunk))
+    start = time.perf_counter()
+    filtered = pd.concat(list(wave_func.iter_fix_baseline_wander(chunks, fs)))
+    duration = time.perf_counter() - start
+    diff = np.abs(ser.values - filtered.values - reference).max()
+    print(f"{'ndimage (chunked)':25} {duration:7.2f} s   max diff {diff:.3g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Created on Sun Oct 18 11:02:37 2026
+
+@author: cdesbois
+
+import time benchmark (headless):
+    each module is imported in a fresh interpreter (no DISPLAY),
+    the median wall time and the imported Qt / pyplot modules are reported
+
+use::
+
+    python tests/bench_import.py [--repeat 5] [--root <an anesthPlot checkout>]
+
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+MODULES = [
+    "anesplot.loadrec.loadmonitor_trendrecord",
+    "anesplot.loadrec.loadmonitor_waverecord",
+    "anesplot.loadrec.loadtaph_trendrecord",
+    "anesplot.treatrec.ekg_to_hr",
+    "anesplot.treatrec.wave_func",
+    "anesplot.fast_waves",
+    "anesplot.record_main",
+]
+
+CHECK = (
+    "import sys, {module}; "
+    "print(','.join(sorted({{_.split('.')[0] + '.' + _.split('.')[1] "
+    "for _ in sys.modules if _.startswith(('PyQt5.', 'matplotlib.pyplot'))}})))"
+)
+
+
+def time_import(module: str, root: str, repeat: int = 5) -> tuple[float, str]:
+    """
+    Import a module in fresh interpreters.
+
+    Parameters
+    ----------
+    module : str
+        the module to import.
+    root : str
+        the directory to put in PYTHONPATH.
+    repeat : int, optional (default is 5)
+        number of imports.
+
+    Returns
+    -------
+    median : float
+        the median duration (sec).
+    loaded : str
+        the Qt / pyplot modules present after the import.
+    """
+    env = dict(os.environ, PYTHONPATH=root, QT_QPA_PLATFORM="offscreen")
+    env.pop("DISPLAY", None)
+    durations = []
+    loaded = ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-c", CHECK.format(module=module)],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=False,
+            cwd=os.path.expanduser("~"),
+        )
+        durations.append(time.perf_counter() - start)
+        if proc.returncode:
+            return float("nan"), "import failed"
+        loaded = proc.stdout.strip().splitlines()[-1] if proc.stdout.strip() else ""
+    return statistics.median(durations), loaded
+
+
+def main() -> None:
+    """Print the import durations."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[2])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--root",
+        default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        help="the anesthPlot checkout to use",
+    )
+    args = parser.parse_args()
+    baseline, _ = time_import("numpy, pandas", args.root, args.repeat)
+    print(f"{'numpy + pandas (reference)':45} {baseline:6.2f} s")
+    for module in MODULES:
+        duration, loaded = time_import(module, args.root, args.repeat)
+        print(f"{module:45} {duration:6.2f} s   {loaded or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Created on Sun Oct 18 20:05:12 2026
+
+@author: cdesbois
+
+memory footprint of the loaded trends:
+    the compact dtypes (ctes_load.mon_trend_schema, taph_trend_schema)
+    are compared with the previous ones (float64, object),
+    and extrapolated to an archive
+
+use::
+
+    python tests/bench_memory.py [--dirname example_files] [--records 1000]
+
+"""
+
+import argparse
+import time
+
+import pandas as pd
+
+from anesplot.batch import discover_records
+from anesplot.loadrec.loadmonitor_trendrecord import loadmonitor_trenddata
+from anesplot.loadrec.loadtaph_trendrecord import loadtaph_trenddata
+
+
+def upcast(datadf: pd.DataFrame) -> pd.DataFrame:
+    """Return the data with the previous dtypes (float64, object)."""
+    dtypes = {}
+    for col in datadf.columns:
+        if pd.api.types.is_float_dtype(datadf[col]):
+            dtypes[col] = "float64"
+        elif not pd.api.types.is_datetime64_any_dtype(datadf[col]):
+            dtypes[col] = object
+    return datadf.astype(dtypes)
+
+
+def deep_size(datadf: pd.DataFrame) -> int:
+    """Return the memory used by a dataframe (bytes, with the strings)."""
+    return int(datadf.memory_usage(deep=True).sum())
+
+
+def main() -> None:
+    """Print the memory used by each record and the archive extrapolation."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[2])
+    parser.add_argument("--dirname", default="example_files")
+    parser.add_argument(
+        "--records", type=int, default=1000, help="number of records (archive)"
+    )
+    args = parser.parse_args()
+    loaders = {
+        "monitor_trend": lambda name: loadmonitor_trenddata(name, use_cache=False)[0],
+        "taph_trend": lambda name: loadtaph_trenddata(name, use_cache=False),
+    }
+    totals = {"legacy": 0, "compact": 0}
+    count = 0
+    for kind, filename in discover_records(args.dirname, list(loaders)):
+        start = time.perf_counter()
+        datadf = loaders[kind](filename)
+        duration = time.perf_counter() - start
+        if datadf.empty:
+            continue
+        compact = deep_size(datadf)
+        legacy = deep_size(upcast(datadf))
+        totals["legacy"] += legacy
+        totals["compact"] += compact
+        count += 1
+        print(
+            f"{kind:15} {len(datadf):6} rows {legacy / 2**20:8.2f} MB"
+            f" -> {compact / 2**20:8.2f} MB ({compact / legacy:5.1%})"
+            f" loaded in {duration:.2f} s"
+        )
+    if not count:
+        print(f"no trend record in {args.dirname}")
+        return
+    ratio = args.records / count
+    print(
+        f"{args.records} records archive:"
+        f" {totals['legacy'] * ratio / 2**30:.2f} GB"
+        f" -> {totals['compact'] * ratio / 2**30:.2f} GB"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -7,10 +7,14 @@ Created on Wed Jun  1 10:32:17 2022
 """
 
 import os
+import subprocess
+import sys
 from random import choices
 from typing import Any, Callable, Optional
 
+import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 import pyperclip
 
@@ -21,8 +25,22 @@ import pyperclip
 import anesplot.slow_waves
 import anesplot.fast_waves
 import anesplot.plot.trend_plot
+import anesplot.plot.live_plot
 import anesplot.plot.wave_plot
+import anesplot.loadrec.cache_load
 import anesplot.loadrec.loadmonitor_waverecord
+import anesplot.loadrec.time_norm
+import anesplot.batch
+import anesplot.archive_index
+import anesplot.record_pairing
+import anesplot.extract_hypotension
+import anesplot.treatrec.arterial_func
+import anesplot.treatrec.ekg_to_hr
+import anesplot.treatrec.hr_to_hrv
+import anesplot.treatrec.manage_events
+import anesplot.treatrec.wave_func
+import anesplot.treatrec.wavelet_func
+from anesplot.treatrec.derived_cache import DerivedCache
 
 from anesplot.config.load_recordrc import build_paths
 
@@ -196,3 +214,697 @@ def test_wave_plot() -> None:
         figure, _ = anesplot.plot.wave_plot.plot_wave(data_df, trace_keys)
         assert isinstance(figure, plt.Figure)
     plt.close("all")
+
+
+def test_build_wave_dtime() -> None:
+    """test the wave datetime reconstruction (over midnight)"""
+    stamps = ["23:59:59"] + [None] * 299 + ["00:00:00"] + [None] * 299 + ["00:00:01"]
+    time_ser = pd.Series(stamps, dtype=object)
+    dtime = anesplot.loadrec.loadmonitor_waverecord.build_wave_dtime(
+        time_ser, "16-4-2021"
+    )
+    assert dtime.notna().all()
+    assert dtime.is_monotonic_increasing
+    assert dtime.iloc[0] == pd.Timestamp("2021-04-16 23:59:59")
+    assert dtime.iloc[-1].date() == pd.Timestamp("2021-04-17").date()
+
+
+def write_wave_file(dirname: str, num: int = 3000) -> str:
+    """write a small synthetic monitor wave file, return the filename"""
+    header = [
+        "Date,16-4-2021",
+        "Version,6.1",
+        "Patient Name,Anonymous",
+        "Patient ID,None",
+        "Sex,Female",
+        "Age,9",
+        "Weight,0",
+        "Height,0",
+        "Procedure,test",
+        "Data Rate (ms),5",
+        "Equipment,AS3",
+        "Other,",
+        ",,1,2,3,4,5",
+        ",,~ECG1,~INVP1,~INVP2,~CO.2,~AWP",
+        ",,mv,mmHg,mmHg,%,cmH2O",
+    ]
+    lines = []
+    for i in range(num):
+        stamp = ""
+        if i % 300 == 0:
+            sec = 23 * 3600 + 59 * 60 + 55 + i // 300
+            sec = sec % 86400
+            stamp = f"{sec // 3600:02d}:{sec // 60 % 60:02d}:{sec % 60:02d}"
+        vals = [i % 7 - 3, 80 + i % 50, 10, (i % 100) / 20, i % 13]
+        lines.append(f"{stamp},," + ",".join(str(_) for _ in vals))
+    filename = os.path.join(dirname, "M2021_4_16-23_59_50Wave.csv")
+    with open(filename, "w", encoding="iso-8859-1") as file:
+        file.write("\n".join(header + lines) + "\n")
+    return filename
+
+
+def test_iter_wave_chunks(tmp_path: Any) -> None:
+    """test the chunked wave loading"""
+    file_name = write_wave_file(str(tmp_path))
+    data_df = anesplot.loadrec.loadmonitor_waverecord.loadmonitor_wavedata(file_name)
+    for chunksize in [200, 1000]:
+        chunks = list(
+            anesplot.loadrec.loadmonitor_waverecord.iter_wave_chunks(
+                file_name, chunksize=chunksize
+            )
+        )
+        assert len(chunks) > 1
+        pd.testing.assert_frame_equal(pd.concat(chunks), data_df)
+
+
+def test_cache_load(tmp_path: Any) -> None:
+    """test the binary cache of the loaders"""
+    file_name = write_wave_file(str(tmp_path))
+    ref_df = anesplot.loadrec.loadmonitor_waverecord.loadmonitor_wavedata(
+        file_name, use_cache=False
+    )
+    assert anesplot.loadrec.cache_load.load_from_cache(file_name, "monitor_wave") is None
+    for _ in range(2):  # build then read the cache
+        data_df = anesplot.loadrec.loadmonitor_waverecord.loadmonitor_wavedata(
+            file_name
+        )
+        pd.testing.assert_frame_equal(ref_df, data_df)
+    assert anesplot.loadrec.cache_load.load_from_cache(file_name, "monitor_wave")
+    anesplot.loadrec.cache_load.invalidate_cache(file_name)
+    assert anesplot.loadrec.cache_load.load_from_cache(file_name, "monitor_wave") is None
+
+
+def test_cache_text_columns(tmp_path: Any) -> None:
+    """the text columns are cached without pickle, a pickled file is a miss"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    cache = anesplot.loadrec.cache_load
+    lmt = anesplot.loadrec.loadmonitor_trendrecord
+    ltt = anesplot.loadrec.loadtaph_trendrecord
+    for name in ["M2021_4_16-8_44_38.csv", "SD2021APR16-7_19_4.csv"]:
+        with open(os.path.join(root, "example_files", name), "rb") as source:
+            (tmp_path / name).write_bytes(source.read())
+    filename = str(tmp_path / "M2021_4_16-8_44_38.csv")
+    ref_df, _ = lmt.loadmonitor_trenddata(filename, use_cache=False)
+    ref_anot = pd.DataFrame(
+        {"dtime": ["08:00:05", "08:00:10"], "text": ["induction", np.nan]},
+        index=[3, 7],
+    )
+    assert cache.save_to_cache(filename, "monitor_trend", [ref_df, ref_anot])
+    data_df, anot_df = cache.load_from_cache(filename, "monitor_trend")
+    pd.testing.assert_frame_equal(data_df, ref_df)
+    pd.testing.assert_frame_equal(anot_df, ref_anot)
+    taphname = str(tmp_path / "SD2021APR16-7_19_4.csv")
+    ref_df = ltt.loadtaph_trenddata(taphname, use_cache=False)
+    assert cache.save_to_cache(taphname, "taph_trend", [ref_df])
+    (data_df,) = cache.load_from_cache(taphname, "taph_trend")
+    pd.testing.assert_frame_equal(data_df, ref_df)
+    # a planted object array is not loaded
+    entry_dir = cache.get_entry_dir(filename, "monitor_trend")
+    np.save(
+        os.path.join(entry_dir, "frame_0", "col_0.npy"),
+        np.array([{"a": 1}], dtype=object),
+        allow_pickle=True,
+    )
+    assert cache.load_from_cache(filename, "monitor_trend") is None
+
+
+def test_wave_store(tmp_path: Any) -> None:
+    """test the memory mapped wave store"""
+    file_name = write_wave_file(str(tmp_path))
+    ref_df = anesplot.loadrec.loadmonitor_waverecord.loadmonitor_wavedata(
+        file_name, use_cache=False
+    )
+    store = anesplot.loadrec.loadmonitor_waverecord.loadmonitor_wavestore(
+        file_name, chunksize=700
+    )
+    assert store is not None
+    assert len(store) == len(ref_df)
+    data_df = store.frame()
+    assert list(data_df.columns) == list(ref_df.columns)
+    pd.testing.assert_series_equal(data_df.dtime, ref_df.dtime)
+    pd.testing.assert_frame_equal(
+        data_df.drop(columns="dtime"),
+        ref_df.drop(columns="dtime"),
+        check_dtype=False,
+        atol=1e-4,
+    )
+    # zero copy roi
+    roi = store.view("wekg", 1000, 1300)
+    assert np.shares_memory(roi, store.traces["wekg"])
+    roi_df = store.frame(["wap"], 1000, 1300, time_cols=["etimesec"])
+    assert roi_df.index[0] == 1000
+    assert roi_df.etimesec.iloc[0] == ref_df.etimesec.loc[1000]
+    assert store.sec_to_point([ref_df.etimesec.loc[1000]]) == [1000]
+    assert store.dtime_to_point([ref_df.dtime.loc[1000]]) == [1000]
+
+
+def test_headless_import() -> None:
+    """the loaders and the treatrec functions import without Qt nor pyplot"""
+    code = (
+        "import sys\n"
+        "import anesplot.loadrec.loadmonitor_trendrecord\n"
+        "import anesplot.loadrec.loadmonitor_waverecord\n"
+        "import anesplot.loadrec.loadtaph_trendrecord\n"
+        "import anesplot.treatrec.ekg_to_hr\n"
+        "import anesplot.treatrec.wave_func\n"
+        "mods = [_ for _ in sys.modules if _.startswith(('PyQt5', 'matplotlib.pyplot'))]\n"
+        "assert not mods, mods\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=root)
+    env.pop("DISPLAY", None)
+    proc = subprocess.run(
+        [sys.executable, "-c", code], env=env, capture_output=True, check=False
+    )
+    assert proc.returncode == 0, proc.stderr.decode()
+
+
+def test_batch(tmp_path: Any) -> None:
+    """the batch process keeps going past a failing record"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    example = os.path.join(root, "example_files", "M2021_4_16-8_44_38.csv")
+    os.makedirs(tmp_path / "sub")
+    with open(example, "rb") as source:
+        (tmp_path / "sub" / os.path.basename(example)).write_bytes(source.read())
+    (tmp_path / "M2021_1_1-1_1_1.csv").write_text("not a record\n")
+    write_wave_file(str(tmp_path))
+    records = anesplot.batch.discover_records(str(tmp_path))
+    assert [kind for kind, _ in records] == [
+        "monitor_trend",
+        "monitor_wave",
+        "monitor_trend",
+    ]
+    # the caller backend is kept
+    backend = plt.get_backend()
+    plt.switch_backend("svg")
+    try:
+        report = anesplot.batch.run_batch(
+            str(tmp_path), pipeline="hypotension", jobs=1
+        )
+        assert plt.get_backend() == "svg"
+    finally:
+        plt.switch_backend(backend)
+    assert list(report.status) == ["failed", "ok"]
+    outdir = tmp_path / "anesplot_batch" / "hypotension"
+    assert (outdir / anesplot.batch.REPORT_NAME).exists()
+    episodes = pd.read_csv(outdir / "hypotension_episodes.csv")
+    assert set(episodes.file) == {os.path.basename(example)}
+
+
+def test_batch_worker_killed(tmp_path: Any, monkeypatch: Any) -> None:
+    """a killed worker -> a failed row, the other records are processed"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    example = os.path.join(root, "example_files", "M2021_4_16-8_44_38.csv")
+    with open(example, "rb") as source:
+        content = source.read()
+    for day in [16, 17, 18]:
+        (tmp_path / f"M2021_4_{day}-8_44_38.csv").write_bytes(content)
+    load_record = anesplot.batch.load_record
+
+    def crashing_load(kind: str, filename: str) -> Any:
+        if "4_18" in filename:
+            os._exit(1)  # eg killed by the OS (out of memory)
+        return load_record(kind, filename)
+
+    # inherited by the (forked) workers
+    monkeypatch.setattr(anesplot.batch, "load_record", crashing_load)
+    report = anesplot.batch.run_batch(str(tmp_path), pipeline="hypotension", jobs=2)
+    assert list(report.status) == ["ok", "ok", "failed"]
+    assert "BrokenProcessPool" in report.error[2]
+    outdir = tmp_path / "anesplot_batch" / "hypotension"
+    assert (outdir / anesplot.batch.REPORT_NAME).exists()
+
+
+def test_extract_hypotension(tmp_path: Any) -> None:
+    """hypotension episodes : run length encoding and folder table"""
+    data_df = pd.DataFrame(
+        {
+            "dtime": pd.date_range("2021-04-16 08:00", periods=12, freq="5S"),
+            "etimemin": np.arange(12) / 12,
+            "ip1m": [80, 60, 50, -1, 65, 90, 95, 40, np.nan, 45, 80, 55],
+        }
+    )
+    durdf = anesplot.extract_hypotension.extract_hypotension(data_df)
+    # the last episode is not finished -> dropped
+    assert list(durdf.down) == list(data_df.dtime[[1, 7]])
+    assert list(durdf.up) == list(data_df.dtime[[5, 10]])
+    assert list(durdf.ip1med) == [60, 42.5]
+    assert list(durdf.hypo_dur) == [20 / 60, 15 / 60]
+    # folder
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    example = os.path.join(root, "example_files", "M2021_4_16-8_44_38.csv")
+    with open(example, "rb") as source:
+        content = source.read()
+    for name in ["M2021_4_16-8_44_38.csv", "M2021_4_17-8_44_38.csv"]:
+        (tmp_path / name).write_bytes(content)
+    (tmp_path / "note.csv").write_text("not a record\n")
+    table = anesplot.extract_hypotension.extract_folder_hypotension(
+        str(tmp_path), jobs=2
+    )
+    assert table.file.value_counts().to_dict() == {
+        "M2021_4_16-8_44_38.csv": 6,
+        "M2021_4_17-8_44_38.csv": 6,
+    }
+
+
+def test_fix_baseline_wander() -> None:
+    """the running median methods and the chunked mode"""
+    wave_func = anesplot.treatrec.wave_func
+    rng = np.random.default_rng(0)
+    ser = pd.Series(
+        np.cumsum(rng.normal(size=20000)), index=pd.RangeIndex(500, 20500)
+    )
+    ref = wave_func.fix_baseline_wander(ser, method="medfilt")
+    for method in ["ndimage", "decimate"]:
+        res = wave_func.fix_baseline_wander(ser, method=method)
+        assert res.index.equals(ser.index)
+    pd.testing.assert_series_equal(
+        wave_func.fix_baseline_wander(ser, method="ndimage"), ref
+    )
+    chunks = [ser.iloc[i : i + 777] for i in range(0, len(ser), 777)]
+    res = pd.concat(list(wave_func.iter_fix_baseline_wander(chunks)))
+    pd.testing.assert_series_equal(res, ref, atol=1e-9)
+
+
+def test_derived_cache(tmp_path: Any) -> None:
+    """lru cache and derived signals of a wave record"""
+    cache = DerivedCache(maxbytes=2500)
+    for i in range(3):
+        cache.get_or_compute(i, lambda: np.zeros(100))  # 800 bytes
+    cache.get_or_compute(0, lambda: np.ones(100))  # hit -> most recent
+    cache.put(3, np.zeros(100))
+    assert 1 not in cache and 0 in cache
+    assert cache.nbytes <= cache.maxbytes
+    # wave record
+    mwave = anesplot.fast_waves.MonitorWave(write_wave_file(str(tmp_path)))
+    mwave.param["sampling_freq"] = 300
+    lims = (2.0, 6.0)
+    roi = mwave.get_roi_filtered("wekg", lims)
+    ref = anesplot.treatrec.wave_func.fix_baseline_wander(
+        mwave.data.wekg.dropna(), 300
+    )
+    ref.index = mwave.data.etimesec.loc[ref.index]
+    np.testing.assert_allclose(roi.values, ref.loc[lims[0] : lims[1]].values)
+    assert mwave.get_roi_filtered("wekg", (3.0, 5.0)).index[0] == 3.0
+    assert mwave.derived.hits == 1 and len(mwave.derived) == 1
+    # a new data -> new version
+    mwave.data = mwave.data.assign(wekg=0.0)
+    assert len(mwave.derived) == 0
+    assert (mwave.get_roi_filtered("wekg", lims) == 0).all()
+
+
+def test_detect_beats_blocks() -> None:
+    """the block wise beat detection is identical to detect_beats"""
+    tohr = anesplot.treatrec.ekg_to_hr
+    rng = np.random.default_rng(0)
+    times = np.arange(300 * 120) / 300
+    values = -3 * (np.mod(times, 1.1) < 0.02) + rng.normal(0, 0.3, len(times))
+    ser = pd.Series(np.round(values, 1), index=pd.RangeIndex(10, 10 + len(times)))
+    ref = tohr.detect_beats(ser)
+    assert len(ref) > 100
+    for kwargs in [{}, {"blocksize": 997}, {"blocksize": 3000, "workers": 3}]:
+        pd.testing.assert_frame_equal(tohr.detect_beats_blocks(ser, **kwargs), ref)
+
+
+def test_systolic_variation_table() -> None:
+    """segment variation, trough pairing and rolling filter"""
+    arterial = anesplot.treatrec.arterial_func
+    peakdf = pd.DataFrame(
+        {
+            "sloc": [1.0, 2.0, 3.0, 4.0, 5.0],
+            "ploc": [300, 600, 900, 1200, 1500],
+            "wap": [100.0, 120.0, 110.0, 90.0, 100.0],
+            "local_max": [False, True, False, False, False],
+        }
+    )
+    # troughs : none before the first peak, two before the third one
+    troughdf = pd.DataFrame(
+        {"ploc": [450, 700, 800, 1100, 1400], "wap": [60.0, 70, 65, 50, 60]}
+    )
+    table = arterial.systolic_variation_table(peakdf, troughdf, window=3)
+    # segments [0, 1] & [1, 4]
+    np.testing.assert_allclose(
+        table.sys_var, [20 / 110] * 1 + [30 / 105] * 4, rtol=1e-12
+    )
+    np.testing.assert_allclose(table.i_pr, [np.nan, 60, 60, 60, 60])
+    np.testing.assert_allclose(table.pulse_pressure, [np.nan, 60, 45, 40, 40])
+    assert table.sys_var_filt.isna().sum() == 2
+    assert list(arterial.pair_peaks([300, 600, 900], [100, 200, 700])) == [1, -1, 2]
+    # per respiratory cycle (local max -> next local max)
+    table.loc[3, "local_max"] = True
+    cycles = arterial.respiratory_variation_table(table)
+    assert len(cycles) == 1
+    values = cycles.iloc[0][["beats", "spv", "pp_max", "pp_min"]].tolist()
+    assert values == [2, 10, 60, 45]
+    np.testing.assert_allclose(cycles.ppv, [15 / 52.5])
+    # paired tables (a missing trough doesn't shift the following beats)
+    troughdf["peak_heights"] = -troughdf.wap
+    peakdf["peak_heights"] = peakdf.wap
+    pp_df = arterial.pair_peak_tables(peakdf, troughdf)
+    assert pp_df.ploc_dwn.isna().tolist() == [True, False, False, False, False]
+    assert pp_df.ploc_dwn.iloc[2] == 800
+
+
+def test_rr_interpolator() -> None:
+    """on demand rr evaluation vs the per point interpolation"""
+    tohr = anesplot.treatrec.ekg_to_hr
+    rng = np.random.default_rng(0)
+    ploc = np.cumsum(rng.integers(200, 300, 50))
+    beatlocdf = tohr.point_to_time_rr(pd.DataFrame({"p_loc": ploc, "y_loc": 1.0}))
+    ahrdf = tohr.interpolate_rr(beatlocdf)
+    assert len(ahrdf) == ploc[-2] - ploc[0]
+    # same values, evaluated only where required
+    interpolator = tohr.build_rr_interpolator(beatlocdf)
+    points = ahrdf.espts.to_numpy()[::97]
+    rrdf = interpolator(points)
+    np.testing.assert_allclose(rrdf.rrInterpol, ahrdf.rrInterpol.iloc[::97])
+    assert interpolator([ploc[0] - 1, ploc[-2]]).rrInterpol.isna().all()
+    # 4 Hz output
+    hrvdf = tohr.interpolate_rr(beatlocdf, rate=4, fs=300)
+    assert np.allclose(np.diff(hrvdf.espts), 75)
+    # beats -> trend
+    wavedf = pd.DataFrame({"wekg": np.zeros(ploc[-1])})
+    trenddf = pd.DataFrame({"hr": np.zeros(len(wavedf) // 300)})
+    trenddf = tohr.append_ihr_to_trend(trenddf, wavedf, beatlocdf=beatlocdf)
+    assert trenddf.ihr.between(60, 90).sum() > 0.9 * len(trenddf)
+
+
+def test_hrv() -> None:
+    """time domain, spectral & wavelet hrv indices"""
+    tohr = anesplot.treatrec.ekg_to_hr
+    hrv = anesplot.treatrec.hr_to_hrv
+    # rr = 1700 ms, modulated at 0.05 Hz (horse LF band), amplitude 50 ms
+    fs, time, locs = 300, 0.0, []
+    while time < 1200:
+        locs.append(round(time * fs))
+        time += 1.7 + 0.05 * np.sin(2 * np.pi * 0.05 * time)
+    beatlocdf = tohr.point_to_time_rr(pd.DataFrame({"p_loc": locs, "y_loc": 1.0}))
+    indices = hrv.time_domain_indices(beatlocdf)
+    np.testing.assert_allclose(indices.mean_hr, 60 / 1.7, rtol=0.01)
+    np.testing.assert_allclose(indices.sdnn, 50 / np.sqrt(2), rtol=0.05)
+    for method in ["welch", "lomb"]:
+        bands = hrv.spectral_indices(beatlocdf, method=method)
+        np.testing.assert_allclose(bands.LF, 50**2 / 2, rtol=0.1)
+        assert bands.LF > 0.9 * bands.total
+        slidingdf = hrv.sliding_band_powers(beatlocdf, method=method, window=300)
+        assert (slidingdf.LF > 0.8 * slidingdf.total).all()
+        # record shorter than the window
+        shortdf = hrv.sliding_band_powers(beatlocdf.iloc[:100], method=method)
+        assert shortdf.empty and "lf_hf" in shortdf.columns
+    waveletdf = hrv.wavelet_band_powers(beatlocdf)
+    assert waveletdf.LF.median() > 10 * waveletdf.HF.median()
+    # amplitude normalisation
+    sinus = 3 * np.sin(2 * np.pi * 10 * np.arange(2000) / 200)
+    coefs = anesplot.treatrec.wavelet_func.morlet_cwt(sinus, [10], 1 / 200)
+    np.testing.assert_allclose(np.abs(coefs[0, 500:1500]), 3, rtol=0.1)
+
+
+def test_cwt(tmp_path: Any) -> None:
+    """chunked fft wavelet transform and wave record method"""
+    cwt = anesplot.treatrec.wavelet_func.morlet_cwt
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=5000) + 2
+    freqs = [1, 5, 20]
+    ref = cwt(data, freqs, 1 / 300, chunksize=0)
+    np.testing.assert_allclose(cwt(data, freqs, 1 / 300, chunksize=700), ref)
+    single = cwt(data, freqs, 1 / 300, dtype=np.complex64, chunksize=1000)
+    assert single.dtype == np.complex64
+    np.testing.assert_allclose(single, ref, atol=1e-5)
+    # wave record
+    mwave = anesplot.fast_waves.MonitorWave(write_wave_file(str(tmp_path)))
+    mwave.param["sampling_freq"] = 300
+    coefdf = mwave.get_cwt("wap", lims=(2.0, 6.0))
+    assert coefdf.shape[1] == 32 and coefdf.index[0] == 2.0
+    assert mwave.get_cwt("wap", lims=[2.0, 6.0]) is coefdf
+
+
+def test_build_event_dataframe() -> None:
+    """vectorized taphonius events parsing"""
+    manage_events = anesplot.treatrec.manage_events
+    datadf = pd.DataFrame(
+        {
+            "dtime": pd.to_datetime(
+                ["2021-04-16 23:59:58", "2021-04-17 00:00:03", "2021-04-17 00:00:08"]
+            ),
+            "events": [
+                "[23:59:57.100 - Init Requested]\n"
+                "[16 April 2021 23:59:58] Records Started - Tafonius",
+                "[23:59:57.100 - ARTEMA - No water trap fitted.]\n"
+                "[00:00:01.500 - RR changed from 8 to 10]",
+                "nan",
+            ],
+        }
+    )
+    dteventsdf = manage_events.build_event_dataframe(datadf)
+    assert dteventsdf.index.is_unique and dteventsdf.index.is_monotonic_increasing
+    assert dteventsdf.events.tolist() == [
+        "init requested",
+        "no water trap fitted.",  # same time as the previous line -> + 1 ms
+        "records started",
+        "rr changed from 8 to 10",
+        "nan",
+    ]
+    times = dteventsdf.index.strftime("%d %H:%M:%S.%f").tolist()
+    assert times[1] == "16 23:59:57.101000"  # (day rollover)
+    assert times[3:] == ["17 00:00:01.500000", "17 00:00:08.000000"]
+
+
+def test_extract_ventilation_drive() -> None:
+    """single pass ventilation drive extraction"""
+    manage_events = anesplot.treatrec.manage_events
+    events = [
+        "preset loaded: chris",
+        "ventilate",
+        "rr changed from 8 to 12",
+        "cpap value changed from 0 to 7,5",  # != default (5), old file comma
+        "standby",
+        "rr changed from 12 to 10",
+        "ventilate",
+    ]
+    dteventsdf = pd.DataFrame(
+        {"events": events}, index=pd.date_range("2021-04-16", periods=7, freq="min")
+    )
+    ventildf = manage_events.extract_ventilation_drive(dteventsdf)
+    assert ventildf.ventil.tolist() == [False, True, True, True, False, False, True]
+    np.testing.assert_array_equal(
+        ventildf["rr changed"], [np.nan, 8, 12, 12, np.nan, np.nan, 10]
+    )
+    np.testing.assert_array_equal(
+        ventildf["cpap value changed"], [np.nan, 5, 5, 7.5, np.nan, np.nan, 7.5]
+    )
+    assert (ventildf["tidal volume changed"].dropna() == 7).all()
+    assert list(ventildf.columns[:3]) == ["events", "ventil", "cpap value changed"]
+
+
+def test_taph_lazy_events() -> None:
+    """the taphonius events are extracted on first access"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    filename = os.path.join(root, "example_files", "SD2021APR16-7_19_4.csv")
+    ttrends = anesplot.slow_waves.TaphTrend(filename)
+    assert not ttrends._events
+    first = ttrends.dt_events_df.index[0]
+    assert set(ttrends._events) == {"dt_events_df"}
+    assert "rr changed" in ttrends.ventil_drive_df.columns
+    # a datetime shift -> recomputed (the message times are shifted too)
+    ttrends.shift_datetime(60)
+    assert not ttrends._events
+    assert ttrends.dt_events_df.index[0] - first == pd.Timedelta(minutes=60)
+    ttrends.data = ttrends.data.iloc[:10]
+    assert len(ttrends.dt_events_df) < 30
+
+
+def test_trend_dtypes() -> None:
+    """the trends are loaded with the compact dtypes"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    filename = os.path.join(root, "example_files", "M2021_4_16-8_44_38.csv")
+    datadf, _ = anesplot.loadrec.loadmonitor_trendrecord.loadmonitor_trenddata(
+        filename, use_cache=False
+    )
+    assert datadf.etimesec.dtype == "float64"
+    assert datadf.etimemin.dtype == "float32"
+    assert datadf.hr.dtype == "float32"
+    assert isinstance(datadf.aaLabel.dtype, pd.CategoricalDtype)
+    assert datadf.aaLabel.value_counts().index[0] in ["iso", "sevo"]
+    filename = os.path.join(root, "example_files", "SD2021APR16-7_19_4.csv")
+    datadf = anesplot.loadrec.loadtaph_trendrecord.loadtaph_trenddata(
+        filename, use_cache=False
+    )
+    assert datadf.events.dtype == "string"
+    numerical = datadf.drop(columns=["etimesec"]).select_dtypes("number")
+    assert (numerical.dtypes == "float32").all()
+
+
+def test_remove_txt_messages() -> None:
+    """the annotations are extracted in a (dtime, text) table"""
+    recorddf = pd.DataFrame(
+        {
+            "Time": ["08:00:00", "08:00:05", "08:00:10", "08:00:15"],
+            "IP1_S": ["120", "induction", "118", "117.5"],
+            "IP1PR": [80.0, np.nan, 82.0, 81.0],
+            "T1": ["37", "38", "intubation", "37"],
+        }
+    )
+    lmt = anesplot.loadrec.loadmonitor_trendrecord
+    recorddf, messagesdf = lmt.remove_txt_messages(recorddf)
+    assert messagesdf.dtime.tolist() == ["08:00:05", "08:00:10"]
+    assert messagesdf.text.tolist() == ["induction 38", "118 82.0 intubation"]
+    assert recorddf.loc[[1, 2]].isna().all().all()
+    np.testing.assert_array_equal(recorddf.IP1_S, [120, np.nan, np.nan, 117.5])
+    assert recorddf.T1.dtype == "float64"
+
+
+def test_time_norm() -> None:
+    """vectorized day rollover and elapsed times (same as the previous loaders)"""
+    time_norm = anesplot.loadrec.time_norm
+    times = pd.Series(["23:59:50", "23:59:55", "00:00:00", "00:00:05", "00:00:05"])
+    datadf = pd.DataFrame({"dtime": time_norm.clock_to_datetime(times, "2021_4_16")})
+    normdf = time_norm.normalize_time(datadf)
+    assert normdf.dtime.iloc[2] == pd.Timestamp("2021-04-17 00:00:00")
+    np.testing.assert_array_equal(normdf.etimesec, [0, 5, 10, 15, 15])
+    assert normdf.etimemin.dtype == "float32"
+    assert len(time_norm.normalize_time(datadf, duplicates="first")) == 4
+    # the loaded files
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    filename = os.path.join(root, "example_files", "M2021_4_16-8_44_38.csv")
+    datadf, _ = anesplot.loadrec.loadmonitor_trendrecord.loadmonitor_trenddata(
+        filename, use_cache=False
+    )
+    assert list(datadf.columns[-2:]) == ["etimesec", "etimemin"]
+    assert datadf.dtime.iloc[0] == pd.Timestamp("2021-04-16 08:44:54")
+    etimesec = datadf.dtime - datadf.dtime.iloc[0]
+    etimesec = etimesec.apply(lambda dt: dt.total_seconds())
+    np.testing.assert_array_equal(datadf.etimesec, etimesec)
+    np.testing.assert_array_equal(datadf.etimemin, (etimesec / 60).astype("float32"))
+
+
+def test_archive_index(tmp_path: Any) -> None:
+    """header only archive index, incremental refresh"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for name in ["M2021_4_16-8_44_38.csv", "SD2021APR16-7_19_4.csv", "Patient.csv"]:
+        with open(os.path.join(root, "example_files", name), "rb") as source:
+            (tmp_path / name).write_bytes(source.read())
+    wavename = write_wave_file(str(tmp_path))
+    with anesplot.archive_index.ArchiveIndex(str(tmp_path)) as index:
+        assert index.refresh()["added"] == 3
+        casesdf = index.query(year=2021, traces=["ip1m"])
+        assert casesdf.stem.tolist() == ["M2021_4_16-8_44_38"]
+        assert casesdf.start[0] == pd.Timestamp("2021-04-16 08:44:54")
+        assert casesdf.end[0] == pd.Timestamp("2021-04-16 10:47:14")
+        assert casesdf.procedure[0] == "Colique"
+        assert index.query(with_wave=True).empty
+        assert index.query(year=2020).empty
+        taphdf = index.query(kind="taph_trend")
+        assert "ip1m" in taphdf.traces[0] and "events" not in taphdf.traces[0]
+        # the wave file of the trend record (over midnight time stamps)
+        os.rename(wavename, tmp_path / "M2021_4_16-8_44_38Wave.csv")
+        counts = index.refresh()
+        assert (counts["added"], counts["removed"], counts["unchanged"]) == (1, 1, 2)
+        assert len(index.query(with_wave=True)) == 1
+        wavedf = index.query(kind="monitor_wave")
+        assert wavedf.end[0] - wavedf.start[0] == pd.Timedelta(seconds=9)
+
+
+def test_record_pairing(tmp_path: Any) -> None:
+    """overlapping records of a case and time offsets"""
+    recordsdf = pd.DataFrame(
+        {
+            "path": ["M1.csv", "M1Wave.csv", "M2Wave.csv", "SD1.csv", "M2.csv"],
+            "kind": ["monitor_trend", "monitor_wave", "monitor_wave"]
+            + ["taph_trend", "monitor_trend"],
+            "stem": ["M1", "M1", "M2", "SD1", "M2"],
+            "start": ["08:00", "08:01", "08:00", "07:30", "10:00"],
+            "end": ["09:00", "08:30", "11:00", "09:30", "11:00"],
+        }
+    )
+    for col in ["start", "end"]:
+        recordsdf[col] = pd.to_datetime("2021-04-16 " + recordsdf[col])
+    pairsdf = anesplot.record_pairing.pair_records(recordsdf)
+    assert pairsdf.monitor_trend.tolist() == ["M1.csv", "M2.csv"]
+    # same record name first (the M2 wave overlaps M1 more than M1Wave)
+    assert pairsdf.monitor_wave.tolist() == ["M1Wave.csv", "M2Wave.csv"]
+    assert pairsdf.monitor_wave_offset.tolist() == [60, -7200]
+    assert pairsdf.taph_trend.tolist() == ["SD1.csv", None]
+    assert pairsdf.taph_trend_offset[0] == -1800
+    assert pairsdf.taph_trend_overlap[0] == 3600
+    # example files : the taphonius record started before the monitor
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for name in ["M2021_4_16-8_44_38.csv", "SD2021APR16-7_19_4.csv", "Patient.csv"]:
+        with open(os.path.join(root, "example_files", name), "rb") as source:
+            (tmp_path / name).write_bytes(source.read())
+    # no pairing (-> no index in the archive) by default
+    mtrends = anesplot.slow_waves.MonitorTrend(
+        str(tmp_path / "M2021_4_16-8_44_38.csv"), load=False
+    )
+    assert mtrends.wavename() == str(tmp_path / "M2021_4_16-8_44_38Wave.csv")
+    assert not (tmp_path / ".anesplot_cache").exists()
+    assert mtrends.wavename(pair=True) == mtrends.wavename()
+    pairs = anesplot.record_pairing.find_paired_records(
+        str(tmp_path / "M2021_4_16-8_44_38.csv")
+    )
+    assert os.path.basename(pairs["taph_trend"]) == "SD2021APR16-7_19_4.csv"
+    assert pairs["taph_trend_offset"] == -(85 * 60 + 45)
+    assert pairs["monitor_wave"] is None
+
+
+def test_follow_load(tmp_path: Any) -> None:
+    """tail-follow loading of a record that is still written"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    lmt = anesplot.loadrec.loadmonitor_trendrecord
+    ltt = anesplot.loadrec.loadtaph_trendrecord
+    for name in ["M2021_4_16-8_44_38.csv", "SD2021APR16-7_19_4.csv"]:
+        with open(os.path.join(root, "example_files", name), "rb") as source:
+            content = source.read()
+        filename = tmp_path / name
+        # the recording software stopped in the middle of a row
+        filename.write_bytes(content[: int(len(content) * 0.4)])
+        if name.startswith("SD"):
+            trends: Any = anesplot.slow_waves.TaphTrend(str(filename), load=False)
+        else:
+            trends = anesplot.slow_waves.MonitorTrend(str(filename), load=False)
+        received: list[int] = []
+        trends.register_callback(lambda newdf: received.append(len(newdf)))
+        nrows = len(trends.follow())
+        assert trends.refresh().empty
+        filename.write_bytes(content)
+        newdf = trends.refresh()
+        assert received == [len(newdf)]
+        assert newdf.index[0] == nrows
+        if name.startswith("SD"):
+            datadf = ltt.loadtaph_trenddata(str(filename), use_cache=False)
+        else:
+            datadf, anotdf = lmt.loadmonitor_trenddata(str(filename), use_cache=False)
+            pd.testing.assert_frame_equal(trends.anotations, anotdf)
+        pd.testing.assert_frame_equal(trends.data, datadf)
+
+
+def test_live_plot(tmp_path: Any) -> None:
+    """the debrief plots are built once and updated with the new rows"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    name = "M2021_4_16-8_44_38.csv"
+    with open(os.path.join(root, "example_files", name), "rb") as source:
+        content = source.read()
+    filename = tmp_path / name
+    filename.write_bytes(content[: len(content) // 2])
+    mtrends = anesplot.slow_waves.MonitorTrend(str(filename), load=False)
+    live = mtrends.live_plot(start=False)
+    figures = dict(live.figures)
+    line, col, scale = live._lines["plot_ventil"][0]
+    calib = anesplot.plot.ctes_plot.ctes_dico["tvinsp"]["calib"]
+    assert col == "tvInsp" and np.isclose(scale, 1 / calib)
+    filename.write_bytes(content)
+    mtrends.refresh()
+    assert live.figures == figures
+    for name, lines in live._lines.items():
+        for line, col, scale in lines:
+            np.testing.assert_allclose(line.get_ydata(), mtrends.data[col] * scale)
+    # the limits include the new rows
+    ax = live._lines["plot_cardiovasc"][0][0].axes
+    assert ax.get_xlim()[1] >= mdates.date2num(mtrends.data.dtime.iloc[-1])
+    coll, edges, col = live._hists["hist_cardio"][0]
+    ser = anesplot.plot.pfunc.remove_outliers(mtrends.data, col)
+    heights = [path.vertices[1, 1] for path in coll.get_paths()]
+    np.testing.assert_array_equal(heights, np.histogram(ser, bins=edges)[0])
+    live.stop()
+    assert not mtrends.callbacks and not line.get_animated()
+    for fig in live.figures.values():
+        plt.close(fig)